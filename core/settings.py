@@ -53,6 +53,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # Removes itself unless PROFILING_ENABLED is set.
+    "subscriptions.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -92,6 +94,95 @@ DATABASES = {
 }
 
 
+# Caches. The default cache holds throttle buckets, revenue breakdowns and
+# the shared tier of the tiered cache (see subscriptions/caching.py). It is
+# per-process memory unless a shared backend is configured, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache with
+# CACHE_LOCATION=redis://127.0.0.1:6379/1 (requires redis).
+CACHES = {
+    "default": {
+        "BACKEND": config('CACHE_BACKEND', default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config('CACHE_LOCATION', default=""),
+        "TIMEOUT": config('CACHE_TIMEOUT', default=300, cast=int),
+    }
+}
+CACHE_TIMEOUT = CACHES["default"]["TIMEOUT"]
+
+# Tiered cache: the shared tier's alias, size of the in-process LRU tier and
+# how long its entries are trusted without checking the shared tier (the
+# bound on staleness after another process invalidates them), in seconds;
+# and how long a miss waits for a computation of the same key elsewhere.
+CACHE_ALIAS = config('CACHE_ALIAS', default='default')
+CACHE_LOCAL_MAX_ENTRIES = config('CACHE_LOCAL_MAX_ENTRIES', default=1000, cast=int)
+CACHE_LOCAL_TIMEOUT = config('CACHE_LOCAL_TIMEOUT', default=5, cast=float)
+CACHE_COALESCE_TIMEOUT = config('CACHE_COALESCE_TIMEOUT', default=10, cast=float)
+
+# Ad-hoc revenue breakdowns: maximum groups per query, longest allowed
+# start_date range, and how long results are cached.
+REVENUE_BREAKDOWN_MAX_GROUPS = config('REVENUE_BREAKDOWN_MAX_GROUPS', default=1000, cast=int)
+REVENUE_BREAKDOWN_MAX_DAYS = config('REVENUE_BREAKDOWN_MAX_DAYS', default=1096, cast=int)
+REVENUE_BREAKDOWN_CACHE_TIMEOUT = config('REVENUE_BREAKDOWN_CACHE_TIMEOUT', default=300, cast=int)
+
+# Longest monthly revenue series returned by the API, in months, and rows
+# each month's totals are spread over so concurrent writes rarely contend.
+MONTHLY_REVENUE_MAX_MONTHS = config('MONTHLY_REVENUE_MAX_MONTHS', default=120, cast=int)
+MONTHLY_REVENUE_SLOTS = config('MONTHLY_REVENUE_SLOTS', default=8, cast=int)
+
+# Analytics dashboard engine: "sql" aggregates the subscriptions table on
+# each request, "snapshot" reads the columnar snapshot maintained by
+# `manage.py refresh_analytics_snapshot` (requires NumPy) and falls back to
+# SQL when it is older than ANALYTICS_SNAPSHOT_MAX_AGE seconds.
+ANALYTICS_ENGINE = config('ANALYTICS_ENGINE', default="sql")
+ANALYTICS_SNAPSHOT_DIR = config('ANALYTICS_SNAPSHOT_DIR', default=str(BASE_DIR / "var" / "analytics_snapshot"))
+ANALYTICS_SNAPSHOT_MAX_AGE = config('ANALYTICS_SNAPSHOT_MAX_AGE', default=900, cast=int)
+
+# Most user ids accepted by the bulk user summaries endpoint.
+USER_SUMMARY_MAX_IDS = config('USER_SUMMARY_MAX_IDS', default=1000, cast=int)
+
+# Reject subscription updates without an If-Match header (428) instead of
+# applying them unconditionally.
+SUBSCRIPTION_REQUIRE_IF_MATCH = config('SUBSCRIPTION_REQUIRE_IF_MATCH', default=False, cast=bool)
+
+# Subscription events are read in id order, but ids are assigned before
+# commit: an event following a gap in the ids is only handed out once it is
+# this many seconds old, so writes committing within it are never skipped.
+SUBSCRIPTION_EVENT_SETTLE_SECONDS = config('SUBSCRIPTION_EVENT_SETTLE_SECONDS', default=30, cast=int)
+
+# On-demand request profiling (see subscriptions/profiling.py). When
+# disabled the middleware is not loaded at all. Requests are profiled when
+# they send "X-Profile: <PROFILING_TOKEN>", match a profiling trigger created
+# in the admin, or are sampled at PROFILING_SAMPLE_RATE (0-1). SQL query
+# parameters and request query string values are only recorded with
+# PROFILING_RECORD_PARAMS, as they include tokens and password hashes.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=False, cast=bool)
+PROFILING_TOKEN = config('PROFILING_TOKEN', default="")
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_SAMPLE_INTERVAL = config('PROFILING_SAMPLE_INTERVAL', default=0.005, cast=float)
+PROFILING_DIR = config('PROFILING_DIR', default=str(BASE_DIR / "var" / "profiles"))
+PROFILING_MAX_PROFILES = config('PROFILING_MAX_PROFILES', default=200, cast=int)
+PROFILING_RECORD_PARAMS = config('PROFILING_RECORD_PARAMS', default=False, cast=bool)
+
+# Background report jobs run by `manage.py run_report_jobs` (see
+# subscriptions/reports.py): where result files are written, how many
+# worker processes run jobs in parallel, how long a running job may go
+# without progress before it is considered abandoned and queued again (in
+# seconds, up to REPORT_JOB_MAX_ATTEMPTS runs), and how many days finished
+# jobs and their files are kept.
+REPORTS_DIR = config('REPORTS_DIR', default=str(BASE_DIR / "var" / "reports"))
+REPORT_WORKERS = config('REPORT_WORKERS', default=2, cast=int)
+REPORT_JOB_STALE_AFTER = config('REPORT_JOB_STALE_AFTER', default=300, cast=int)
+REPORT_JOB_MAX_ATTEMPTS = config('REPORT_JOB_MAX_ATTEMPTS', default=3, cast=int)
+REPORT_RETENTION_DAYS = config('REPORT_RETENTION_DAYS', default=7, cast=int)
+
+# Where `manage.py loadtest` saves the results of its runs (see
+# subscriptions/loadtest.py) when no --output is given.
+LOADTEST_RESULTS_DIR = config('LOADTEST_RESULTS_DIR', default=str(BASE_DIR / "var" / "loadtest"))
+
+# Default granularity of `manage.py manage_partitions partition` (PostgreSQL
+# range partitioning of subscriptions by start_date): "monthly" or "yearly".
+USER_SUBSCRIPTION_PARTITIONING = config('USER_SUBSCRIPTION_PARTITIONING', default="")
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -111,6 +202,12 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Work factor for hashing raw passwords during bulk user provisioning.
+# Leave unset (0) to use the default hasher cost; lower values speed up large
+# imports and are upgraded to the default cost on each user's first login.
+PROVISIONING_HASHER_ITERATIONS = config('PROVISIONING_HASHER_ITERATIONS', default=0, cast=int)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -144,6 +241,25 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # Proxies in front of the app whose X-Forwarded-For entries are trusted
+    # for client IPs; with 0 the header is ignored and cannot be spoofed.
+    "NUM_PROXIES": config('NUM_PROXIES', default=0, cast=int),
+    "DEFAULT_THROTTLE_RATES": {
+        "login": config('THROTTLE_RATE_LOGIN', default="20/min"),
+        "login_username": config('THROTTLE_RATE_LOGIN_USERNAME', default="5/min"),
+        "analytics": config('THROTTLE_RATE_ANALYTICS', default="30/min"),
+    },
+}
+
+# Throttling settings
+# Token buckets live in the Django cache ("cache"), shared by all workers
+# when CACHE_BACKEND is a shared cache, or in process memory ("local").
+THROTTLE_BUCKET_STORE = config('THROTTLE_BUCKET_STORE', default="cache")
+
+# Maximum in-flight requests per worker process for expensive views.
+# Requests over the cap are rejected with 503 instead of queuing.
+CONCURRENCY_LIMITS = {
+    "analytics": config('CONCURRENCY_LIMIT_ANALYTICS', default=4, cast=int),
 }
 
 # drf-spectacular settings
@@ -152,3 +268,14 @@ SPECTACULAR_SETTINGS = {
     "DESCRIPTION": "RESTful API for managing users, subscriptions, and features with analytics",
     "VERSION": "1.0.0",
 }
+
+# Pre-built OpenAPI schema served at /api/schema/, rebuilt with
+# `manage.py build_openapi_schema`. With OPENAPI_SCHEMA_CACHED off (handy
+# while editing views) the schema is generated on every request.
+OPENAPI_SCHEMA_DIR = config('OPENAPI_SCHEMA_DIR', default=str(BASE_DIR / "core" / "openapi"))
+OPENAPI_SCHEMA_CACHED = config('OPENAPI_SCHEMA_CACHED', default=True, cast=bool)
+
+# Upper bound for importing core.wsgi (settings, app registry, models and
+# admin), in seconds, enforced by the test suite. Loose enough for a busy CI
+# runner; `manage.py measure_startup` shows the actual time.
+STARTUP_IMPORT_BUDGET = config('STARTUP_IMPORT_BUDGET', default=2.0, cast=float)
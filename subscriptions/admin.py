@@ -1,5 +1,23 @@
+from datetime import date
+
 from django.contrib import admin
-from .models import Feature, SubscriptionPlan, UserSubscription
+from django.urls import reverse
+from django.utils.html import format_html
+from django.db.models import Max, Min
+from .models import (
+    Feature,
+    SubscriptionPlan,
+    UserSubscription,
+    SubscriptionEvent,
+    WebhookEndpoint,
+    ArchivedUserSubscription,
+    PlanMigration,
+    ProfilingTrigger,
+    ReportJob,
+    RequestProfile,
+)
+from .paginators import EstimatedCountPaginator
+from .profiling import triggers
 
 
 @admin.register(Feature)
@@ -19,6 +37,60 @@ class SubscriptionPlanAdmin(admin.ModelAdmin):
     list_per_page = 50
 
 
+class BillingCycleFilter(admin.SimpleListFilter):
+    """
+    Filter on the plan's billing cycle through the indexed ``plan_id``
+    column, resolving the (few) matching plans first instead of joining.
+    """
+
+    title = "billing cycle"
+    parameter_name = "billing_cycle"
+
+    def lookups(self, request, model_admin):
+        return SubscriptionPlan.BillingCycle.choices
+
+    def queryset(self, request, queryset):
+        if self.value() not in SubscriptionPlan.BillingCycle.values:
+            return queryset
+        plan_ids = list(
+            SubscriptionPlan.objects
+            .filter(billing_cycle=self.value())
+            .values_list('id', flat=True)
+        )
+        return queryset.filter(plan_id__in=plan_ids)
+
+
+class StartYearFilter(admin.SimpleListFilter):
+    """
+    Year drill-down on ``start_date`` as a cheap replacement for
+    ``date_hierarchy``: the year range comes from an indexed MIN/MAX and the
+    filter is a plain range predicate.
+    """
+
+    title = "start year"
+    parameter_name = "start_year"
+
+    def lookups(self, request, model_admin):
+        bounds = UserSubscription.objects.aggregate(
+            first=Min('start_date'), last=Max('start_date')
+        )
+        if not bounds['first']:
+            return []
+        return [
+            (str(year), str(year))
+            for year in range(bounds['last'].year, bounds['first'].year - 1, -1)
+        ]
+
+    def queryset(self, request, queryset):
+        if not (self.value() or '').isdigit():
+            return queryset
+        year = int(self.value())
+        return queryset.filter(
+            start_date__gte=date(year, 1, 1),
+            start_date__lt=date(year + 1, 1, 1),
+        )
+
+
 @admin.register(UserSubscription)
 class UserSubscriptionAdmin(admin.ModelAdmin):
     list_display = [
@@ -29,8 +101,180 @@ class UserSubscriptionAdmin(admin.ModelAdmin):
         "end_date",
         "status"
     ]
-    list_filter = ["status", "start_date", "plan__billing_cycle"]
+    list_filter = ["status", StartYearFilter, "start_date", BillingCycleFilter]
     search_fields = ["user__username", "user__email", "plan__name"]
-    date_hierarchy = "start_date"
     list_per_page = 50
     autocomplete_fields = ["user", "plan"]
+    # Keep the changelist at a fixed number of queries on large tables:
+    # join user and plan for __str__, and skip the extra unfiltered COUNT.
+    list_select_related = ["user", "plan"]
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+@admin.register(SubscriptionEvent)
+class SubscriptionEventAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "subscription_id",
+        "event_type",
+        "status",
+        "plan_id",
+        "occurred_at"
+    ]
+    list_filter = ["event_type"]
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PlanMigration)
+class PlanMigrationAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "source_plan",
+        "target_plan",
+        "effective_date",
+        "status",
+        "total",
+        "migrated",
+        "skipped",
+        "created_at"
+    ]
+    list_filter = ["status"]
+    list_select_related = ["source_plan", "target_plan"]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ProfilingTrigger)
+class ProfilingTriggerAdmin(admin.ModelAdmin):
+    list_display = [
+        "path_prefix",
+        "method",
+        "mode",
+        "remaining",
+        "sample_rate",
+        "expires_at",
+        "is_active"
+    ]
+    list_filter = ["is_active", "mode"]
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Take effect immediately in this process; others re-read shortly.
+        triggers.clear()
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "method",
+        "path",
+        "status_code",
+        "trigger",
+        "duration_ms",
+        "query_count",
+        "sql_time_ms",
+        "download",
+        "created_at"
+    ]
+    list_filter = ["trigger", "mode"]
+
+    @admin.display(description="Artefact")
+    def download(self, obj):
+        return format_html(
+            '<a href="{}">zip</a>', reverse('requestprofile-download', args=[obj.pk])
+        )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "kind",
+        "status",
+        "progress",
+        "total",
+        "attempts",
+        "requested_by",
+        "download",
+        "created_at",
+        "finished_at"
+    ]
+    list_filter = ["kind", "status"]
+    list_select_related = ["requested_by"]
+
+    @admin.display(description="Result")
+    def download(self, obj):
+        if obj.status != ReportJob.Status.COMPLETED:
+            return "-"
+        return format_html(
+            '<a href="{}">csv</a>', reverse('reportjob-download', args=[obj.pk])
+        )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = [
+        "name",
+        "url",
+        "is_active",
+        "last_event_id",
+        "consecutive_failures",
+        "next_attempt_at"
+    ]
+    list_filter = ["is_active"]
+    search_fields = ["name", "url"]
+    readonly_fields = [
+        "consecutive_failures",
+        "next_attempt_at",
+        "last_error"
+    ]
+    list_per_page = 50
+
+
+@admin.register(ArchivedUserSubscription)
+class ArchivedUserSubscriptionAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "user_id",
+        "plan_id",
+        "plan_cost",
+        "start_date",
+        "end_date",
+        "status",
+        "archived_at"
+    ]
+    list_filter = ["status"]
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,274 @@
+import hashlib
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, FloatField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .caching import tiered_cache
+from .models import (
+    ArchivedRevenueRollup,
+    ArchivedUserRevenue,
+    MonthlyRevenue,
+    UserSubscription,
+    effectively_active,
+    month_start,
+)
+
+
+# Whitelisted group-by dimensions: name -> output columns and expressions
+# (``None`` selects the model column of the same name).
+DIMENSIONS = {
+    'plan': {'plan_id': None, 'plan_name': F('plan__name')},
+    'billing_cycle': {'billing_cycle': F('plan__billing_cycle')},
+    'status': {'status': None},
+    'start_month': {'start_month': TruncMonth('start_date')},
+    # Subscriptions count once per feature of their plan.
+    'feature': {'feature_id': F('plan__features__id'), 'feature_name': F('plan__features__name')},
+}
+
+METRICS = {
+    'sum': lambda: Sum('plan_cost'),
+    'avg': lambda: Avg('plan_cost'),
+    'count': lambda: Count('id'),
+}
+
+# Optional filters: name -> ORM lookup.
+FILTERS = {
+    'status': 'status',
+    'plan_id': 'plan_id',
+    'billing_cycle': 'plan__billing_cycle',
+    'feature_id': 'plan__features__id',
+}
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def dashboard_history(today):
+    """
+    The dashboard's monthly revenue history: ``month`` and ``total_revenue``
+    of the 12 months before the current one that have subscriptions, read
+    from the precomputed series.
+    """
+    current = month_start(today)
+    return [
+        {'month': row['month'], 'total_revenue': row['total_revenue']}
+        for row in monthly_revenue_series(add_months(current, -12), add_months(current, -1))
+        if row['subscription_count']
+    ]
+
+
+def monthly_revenue_series(first_month, last_month):
+    """
+    Revenue per start month from ``first_month`` to ``last_month`` inclusive,
+    read with a single range lookup on the precomputed series. Months without
+    subscriptions are filled with zeros; the current month is live.
+    """
+    first_month, last_month = month_start(first_month), month_start(last_month)
+    totals = {
+        row['month']: (row['count'], row['revenue'])
+        for row in MonthlyRevenue.objects
+        .filter(month__gte=first_month, month__lte=last_month)
+        .values('month')
+        .annotate(count=Sum('subscription_count'), revenue=Sum('total_revenue'))
+        .order_by()
+    }
+    series = []
+    month = first_month
+    while month <= last_month:
+        count, revenue = totals.get(month, (0, 0.0))
+        series.append({'month': month, 'total_revenue': revenue, 'subscription_count': count})
+        month = add_months(month, 1)
+    return series
+
+
+def backfill_monthly_revenue():
+    """
+    Recompute the monthly revenue series from live subscriptions and the
+    archive rollups. Returns the number of months written.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Block subscription writes (not reads) until the series is
+            # replaced, so no incremental update is lost in between.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'LOCK TABLE %s IN SHARE MODE'
+                    % connection.ops.quote_name(UserSubscription._meta.db_table)
+                )
+
+        totals = defaultdict(lambda: [0, 0.0])
+        sources = (
+            UserSubscription.objects.annotate(month=TruncMonth('start_date'))
+            .values('month')
+            .annotate(count=Count('id'), revenue=Sum('plan_cost')),
+            ArchivedRevenueRollup.objects.annotate(month=TruncMonth('start_date'))
+            .values('month')
+            .annotate(count=Sum('subscription_count'), revenue=Sum('total_cost')),
+        )
+        for rows in sources:
+            for row in rows.order_by():
+                month_totals = totals[row['month']]
+                month_totals[0] += row['count']
+                month_totals[1] += row['revenue']
+
+        # Everything goes to slot 0; writes spread over the others again.
+        MonthlyRevenue.objects.all().delete()
+        MonthlyRevenue.objects.bulk_create([
+            MonthlyRevenue(month=month, subscription_count=count, total_revenue=revenue)
+            for month, (count, revenue) in sorted(totals.items())
+        ])
+    return len(totals)
+
+
+def archived_totals():
+    """
+    Revenue totals of archived subscriptions, read from their rollups.
+    Archived subscriptions have ended, so they add no recurring revenue.
+    """
+    return ArchivedRevenueRollup.objects.aggregate(
+        total_cost=Coalesce(Sum('total_cost'), 0, output_field=FloatField()),
+        subscription_count=Coalesce(Sum('subscription_count'), 0),
+    )
+
+
+def combine_dashboard_metrics(live, archived, today):
+    """Merge live and archived totals into the dashboard response shape."""
+    subscription_count = live['subscription_count'] + archived['subscription_count']
+    return {
+        'total_recurring_revenue': live['total_recurring_revenue'],
+        'average_subscription_cost': (
+            (live['total_cost'] + archived['total_cost']) / subscription_count
+            if subscription_count else 0
+        ),
+        'monthly_revenue_history': dashboard_history(today),
+    }
+
+
+def dashboard_metrics(today):
+    """
+    Compute the analytics dashboard metrics with SQL aggregates.
+
+    Archived subscriptions are only read through their rollups.
+    """
+    revenue_stats = UserSubscription.objects.aggregate(
+        # Same single scan as the other totals; expired rows still marked
+        # active are excluded.
+        total_recurring_revenue=Coalesce(
+            Sum(
+                'plan_cost',
+                filter=effectively_active(today)
+            ),
+            0,
+            output_field=FloatField(),
+        ),
+        total_cost=Coalesce(Sum('plan_cost'), 0, output_field=FloatField()),
+        subscription_count=Count('id'),
+    )
+
+    metrics = combine_dashboard_metrics(revenue_stats, archived_totals(), today)
+
+    archived_user_value = ArchivedUserRevenue.objects.filter(
+        user_id=OuterRef('pk')
+    ).values('total_cost')
+    metrics['top_users'] = list(
+        User.objects
+        .annotate(
+            live_value=Sum('user_subscriptions__plan_cost'),
+            archived_value=Subquery(archived_user_value),
+        )
+        .filter(Q(live_value__isnull=False) | Q(archived_value__isnull=False))
+        .annotate(
+            total_subscription_value=(
+                Coalesce('live_value', 0, output_field=FloatField())
+                + Coalesce('archived_value', 0, output_field=FloatField())
+            )
+        )
+        .order_by('-total_subscription_value')
+        .values('id', 'username', 'email', 'total_subscription_value')[:5]
+    )
+    return metrics
+
+
+class TooManyGroups(Exception):
+    """Raised when a breakdown would return more than the allowed groups."""
+
+
+def revenue_breakdown(group_by, metrics, start_date_from, start_date_to,
+                      filters=None, max_groups=None):
+    """
+    Compile a whitelisted breakdown into a single GROUP BY query.
+
+    Results are kept in the tiered cache for
+    ``REVENUE_BREAKDOWN_CACHE_TIMEOUT`` seconds under a key derived from the
+    normalized query, so equivalent requests (e.g. with dimensions in
+    another order) share an entry. Returns ``(rows, cached)``.
+    """
+    group_by = sorted(set(group_by))
+    metrics = sorted(set(metrics))
+    filters = {name: value for name, value in sorted((filters or {}).items()) if value is not None}
+    max_groups = max_groups or settings.REVENUE_BREAKDOWN_MAX_GROUPS
+
+    normalized = {
+        'group_by': group_by,
+        'metrics': metrics,
+        'start_date_from': str(start_date_from),
+        'start_date_to': str(start_date_to),
+        'filters': filters,
+        'max_groups': max_groups,
+    }
+    key = 'revenue_breakdown:' + hashlib.sha256(
+        json.dumps(normalized, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    computed = []
+
+    def compute():
+        queryset = breakdown_queryset(group_by, metrics, start_date_from, start_date_to, filters)
+        # Fetch one extra row to detect an oversized result without counting.
+        rows = list(queryset[:max_groups + 1])
+        if len(rows) > max_groups:
+            raise TooManyGroups(f'Breakdown exceeds {max_groups} groups; narrow the filters or dimensions.')
+        computed.append(True)
+        return rows
+
+    # Concurrent identical requests share one computation.
+    rows = tiered_cache.get_or_set(key, compute, timeout=settings.REVENUE_BREAKDOWN_CACHE_TIMEOUT)
+    return rows, not computed
+
+
+def breakdown_queryset(group_by, metrics, start_date_from=None, start_date_to=None, filters=None):
+    """
+    The GROUP BY query behind a breakdown, ordered by its dimensions. Open
+    date bounds cover the whole history; no group limit is applied.
+
+    Only live subscriptions are aggregated. Archived ones are only kept in
+    rollups by start date and status, which cannot be grouped by plan or
+    feature, so they are left out rather than merged into some breakdowns.
+    """
+    bounds = {}
+    if start_date_from is not None:
+        bounds['start_date__gte'] = start_date_from
+    if start_date_to is not None:
+        bounds['start_date__lt'] = start_date_to
+    queryset = UserSubscription.objects.filter(
+        **bounds,
+        **{FILTERS[name]: value for name, value in (filters or {}).items() if value is not None}
+    )
+    columns = {}
+    for dimension in sorted(set(group_by)):
+        columns.update(DIMENSIONS[dimension])
+    return (
+        queryset
+        .values(
+            *[name for name, expression in columns.items() if expression is None],
+            **{name: expression for name, expression in columns.items() if expression is not None}
+        )
+        .annotate(**{metric: METRICS[metric]() for metric in sorted(set(metrics))})
+        .order_by(*columns)
+    )
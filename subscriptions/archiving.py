@@ -0,0 +1,127 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (
+    ARCHIVED_SUBSCRIPTION_FIELDS,
+    EVENT_LOOKUP_CHUNK_SIZE,
+    ArchivedRevenueRollup,
+    ArchivedUserRevenue,
+    ArchivedUserSubscription,
+    SubscriptionEvent,
+    UserSubscription,
+    UserSubscriptionSummary,
+)
+
+
+def archivable(horizon):
+    """
+    Subscriptions that ended, or were cancelled, before ``horizon``.
+
+    A row was cancelled when the latest of its ``cancelled`` or ``created``
+    events was logged, so later writes (a plan migration, a version bump)
+    do not postpone its archiving. Rows older than the event log fall back
+    to ``updated_at``.
+    """
+    cancelled_at = Subquery(
+        SubscriptionEvent.objects
+        .filter(
+            subscription_id=OuterRef('id'),
+            event_type__in=[SubscriptionEvent.EventType.CANCELLED, SubscriptionEvent.EventType.CREATED],
+        )
+        .order_by('-id')
+        .values('occurred_at')[:1]
+    )
+    return UserSubscription.objects.alias(cancelled_at=Coalesce(cancelled_at, 'updated_at')).filter(
+        Q(end_date__lt=horizon)
+        | Q(status=UserSubscription.Status.CANCELLED, cancelled_at__date__lt=horizon)
+    )
+
+
+def archive_batch(horizon, batch_size, after_id=0):
+    """
+    Move the next ``batch_size`` archivable rows with an id above
+    ``after_id`` into the archive, in one transaction.
+
+    Archived rows are removed from UserSubscription, so an interrupted run
+    simply resumes with the remaining rows. Returns ``(archived, last_id)``;
+    ``last_id`` is ``None`` when nothing was left to archive.
+    """
+    with transaction.atomic():
+        rows = list(
+            archivable(horizon)
+            .filter(id__gt=after_id)
+            .select_for_update()
+            .order_by('id')
+            .values(*ARCHIVED_SUBSCRIPTION_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0, None
+
+        ArchivedUserSubscription.objects.bulk_create(
+            [ArchivedUserSubscription(**row) for row in rows]
+        )
+        _add_to_rollups(rows)
+        UserSubscriptionSummary.apply_changes([(row, None) for row in rows], archived=True)
+        SubscriptionEvent.objects.bulk_create([
+            event
+            for row in rows
+            for event in SubscriptionEvent.for_change(None, row, archived=True)
+        ])
+        _delete([row['id'] for row in rows])
+
+    return len(rows), rows[-1]['id']
+
+
+def _delete(ids):
+    """
+    Delete archived rows with plain ``DELETE`` statements.
+
+    Deleting through the ORM would send post_delete, whose receiver logs
+    ``deleted`` events and takes the rows out of MonthlyRevenue and the user
+    summaries. Archiving logs ``archived`` events and updates the summaries
+    itself, and MonthlyRevenue keeps archived rows counted. Nothing
+    references subscriptions, so there is nothing to cascade.
+    """
+    table = connection.ops.quote_name(UserSubscription._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), EVENT_LOOKUP_CHUNK_SIZE):
+            chunk = ids[start:start + EVENT_LOOKUP_CHUNK_SIZE]
+            cursor.execute(f'DELETE FROM {table} WHERE id IN ({", ".join(["%s"] * len(chunk))})', chunk)
+
+
+def _add_to_rollups(rows):
+    """
+    Add archived rows to the rollups. Missing rollup rows are inserted
+    empty, ignoring conflicts, and then incremented, like MonthlyRevenue,
+    so concurrent batches never race to create the same row. Keys are
+    sorted so concurrent batches lock rows in the same order.
+    """
+    by_date = defaultdict(lambda: [0, 0.0])
+    by_user = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        for totals in (by_date[(row['start_date'], row['status'])], by_user[row['user_id']]):
+            totals[0] += 1
+            totals[1] += row['plan_cost']
+
+    ArchivedRevenueRollup.objects.bulk_create(
+        [ArchivedRevenueRollup(start_date=start_date, status=status) for start_date, status in sorted(by_date)],
+        ignore_conflicts=True,
+    )
+    for (start_date, status), (count, total) in sorted(by_date.items()):
+        ArchivedRevenueRollup.objects.filter(start_date=start_date, status=status).update(
+            subscription_count=F('subscription_count') + count,
+            total_cost=F('total_cost') + total,
+        )
+
+    ArchivedUserRevenue.objects.bulk_create(
+        [ArchivedUserRevenue(user_id=user_id) for user_id in sorted(by_user)],
+        ignore_conflicts=True,
+    )
+    for user_id, (count, total) in sorted(by_user.items()):
+        ArchivedUserRevenue.objects.filter(user_id=user_id).update(
+            subscription_count=F('subscription_count') + count,
+            total_cost=F('total_cost') + total,
+        )
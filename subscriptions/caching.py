@@ -0,0 +1,345 @@
+"""
+Two-tier cache for read-mostly data.
+
+Values are looked up in a small in-process LRU first, then in the shared
+Django cache (CACHE_ALIAS). Entries carry tags such as ``plan:12`` or
+``user:7``; invalidating a tag bumps its version in the shared cache, so
+every entry stored under the old version is a miss from then on, in every
+process. Writes invalidate tags through model signals (see signals.py) and
+the subscription write hooks, once right away and once more on commit, so
+an entry recomputed from not yet committed data does not outlive the write.
+
+The local tier trades freshness for speed: other processes' invalidations
+reach it only when its entries expire, after at most CACHE_LOCAL_TIMEOUT
+seconds. ``get_or_set`` coalesces concurrent misses of a key: one thread
+per process computes the value while the others wait for it, and across
+processes a short lock in the shared cache lets one compute while the rest
+poll for its result, for up to CACHE_COALESCE_TIMEOUT seconds.
+
+Values are shared between requests of a process and must not be mutated.
+"""
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from rest_framework.response import Response
+
+
+# Delay between polls for a value being computed by another process.
+COALESCE_POLL_INTERVAL = 0.05
+
+# Counters reported by TieredCache.stats(); coalesced counts lookups that
+# waited for another thread's computation, lock_waits misses that waited
+# for another process.
+STATS = ('local_hits', 'shared_hits', 'coalesced', 'misses', 'lock_waits', 'invalidations')
+
+MISSING = object()
+
+
+class LocalLRU:
+    """Thread-safe LRU of ``key -> value`` with per-entry expiry and tags."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tagged = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expires, tags = entry
+            if expires <= time.monotonic():
+                self._remove(key)
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout, tags):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, time.monotonic() + timeout, tags)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tagged.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+
+class _Flight:
+    """A value being computed by one thread for others waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = MISSING
+
+
+class TieredCache:
+    """Local LRU in front of a shared Django cache, with tags and coalescing."""
+
+    def __init__(self, alias=None, local_max_entries=None, local_timeout=None,
+                 coalesce_timeout=None, prefix='tiered'):
+        self.alias = alias or settings.CACHE_ALIAS
+        self.local = LocalLRU(local_max_entries or settings.CACHE_LOCAL_MAX_ENTRIES)
+        self.local_timeout = local_timeout if local_timeout is not None else settings.CACHE_LOCAL_TIMEOUT
+        self.coalesce_timeout = (
+            coalesce_timeout if coalesce_timeout is not None else settings.CACHE_COALESCE_TIMEOUT
+        )
+        self.prefix = prefix
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def _tag_key(self, tag):
+        return f'{self.prefix}:tag:{tag}'
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def get(self, key, default=None):
+        """The cached value of ``key``, or ``default``."""
+        value = self.local.get(key)
+        if value is not MISSING:
+            self._count('local_hits')
+            return value
+        value = self._get_shared(key, ())[0]
+        if value is MISSING:
+            self._count('misses')
+            return default
+        return value
+
+    def set(self, key, value, timeout=None, tags=()):
+        tags = tuple(tags)
+        self._set(key, value, timeout, tags, self._versions(tags))
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(self._key(key))
+
+    def get_or_set(self, key, compute, timeout=None, tags=()):
+        """
+        The cached value of ``key``, computing and storing it on a miss;
+        concurrent misses of ``key`` wait for a single computation.
+        """
+        value = self.local.get(key)
+        if value is not MISSING:
+            self._count('local_hits')
+            return value
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self._count('coalesced')
+            flight.done.wait(self.coalesce_timeout)
+            # The computing thread failed or is too slow: compute here.
+            return flight.value if flight.value is not MISSING else compute()
+
+        try:
+            flight.value = self._fill(key, compute, timeout, tuple(tags))
+            return flight.value
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _fill(self, key, compute, timeout, tags):
+        value, versions = self._get_shared(key, tags)
+        if value is not MISSING:
+            return value
+
+        lock = self._key(f'lock:{key}')
+        locked = self.shared.add(lock, 1, self.coalesce_timeout)
+        if not locked:
+            # Another process is computing the value; wait for it.
+            self._count('lock_waits')
+            deadline = time.monotonic() + self.coalesce_timeout
+            while time.monotonic() < deadline:
+                time.sleep(COALESCE_POLL_INTERVAL)
+                value, versions = self._get_shared(key, tags)
+                if value is not MISSING:
+                    return value
+
+        self._count('misses')
+        try:
+            # Versions read before computing: an invalidation while the
+            # value is computed makes the stored entry stale right away.
+            value = compute()
+            self._set(key, value, timeout, tags, versions)
+        finally:
+            if locked:
+                self.shared.delete(lock)
+        return value
+
+    def _get_shared(self, key, tags):
+        """
+        ``(value, versions of tags)`` from the shared tier, in one round trip
+        when the entry was stored with ``tags``; ``value`` is ``MISSING``
+        when ``key`` is absent or stale.
+        """
+        keys = [self._tag_key(tag) for tag in tags]
+        if key is not None:
+            keys.append(self._key(key))
+        found = self.shared.get_many(keys) if keys else {}
+        versions = self._versions(tags, found)
+
+        entry = found.get(self._key(key)) if key is not None else None
+        if entry is None:
+            return MISSING, versions
+        value, entry_versions, expires_at = entry
+        current = versions if set(entry_versions) == set(tags) else self._versions(entry_versions)
+        if entry_versions != current:
+            return MISSING, versions
+        self._count('shared_hits')
+        self.local.set(key, value, min(self.local_timeout, expires_at - time.time()), tuple(entry_versions))
+        return value, versions
+
+    def _versions(self, tags, found=None):
+        """
+        Current version of each tag, from ``found`` (a ``get_many`` result
+        covering the tags) or the shared cache. Tags never seen, or evicted,
+        get a new version.
+        """
+        if found is None:
+            found = self.shared.get_many([self._tag_key(tag) for tag in tags]) if tags else {}
+        versions = {}
+        for tag in tags:
+            version = found.get(self._tag_key(tag))
+            if version is None:
+                version = uuid.uuid4().hex
+                # add() keeps a version set concurrently by another process.
+                if not self.shared.add(self._tag_key(tag), version, None):
+                    version = self.shared.get(self._tag_key(tag), version)
+            versions[tag] = version
+        return versions
+
+    def _set(self, key, value, timeout, tags, versions):
+        timeout = timeout or settings.CACHE_TIMEOUT
+        self.shared.set(self._key(key), (value, versions, time.time() + timeout), timeout)
+        self.local.set(key, value, min(self.local_timeout, timeout), tags)
+
+    def invalidate_tags(self, *tags, using=None):
+        """
+        Make every entry tagged with one of ``tags`` a miss. Inside a
+        transaction the tags are invalidated again on commit.
+        """
+        tags = sorted(set(tags))
+        if not tags:
+            return
+        self._bump(tags)
+        if connections[using or 'default'].in_atomic_block:
+            transaction.on_commit(lambda: self._bump(tags), using=using)
+
+    def _bump(self, tags):
+        self.local.invalidate(tags)
+        self.shared.set_many({self._tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
+        self._count('invalidations', len(tags))
+
+    def clear(self):
+        """Empty the local tier and the whole shared cache."""
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {name: self._stats[name] for name in STATS}
+        lookups = sum(stats[name] for name in ('local_hits', 'shared_hits', 'coalesced', 'misses'))
+        hits = lookups - stats['misses']
+        stats.update(
+            local_entries=len(self.local),
+            hit_rate=hits / lookups if lookups else None,
+        )
+        return stats
+
+
+tiered_cache = TieredCache()
+
+
+class CachedReadMixin:
+    """
+    Serve ``list`` and ``retrieve`` of a model viewset from the tiered cache.
+    Lists are tagged ``cache_tag + 's'`` (e.g. ``plans``) and keyed by the
+    full URL; objects are tagged ``{cache_tag}:{pk}``.
+    """
+
+    cache_tag = None
+
+    def list(self, request, *args, **kwargs):
+        data = tiered_cache.get_or_set(
+            f'{self.cache_tag}s:{request.build_absolute_uri()}',
+            lambda: super(CachedReadMixin, self).list(request, *args, **kwargs).data,
+            tags=[f'{self.cache_tag}s'],
+        )
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not pk.isdigit() or pk != str(int(pk)):
+            # Only canonical ids match the tags invalidated on writes.
+            return super().retrieve(request, *args, **kwargs)
+        data = tiered_cache.get_or_set(
+            f'{self.cache_tag}:{pk}',
+            lambda: super(CachedReadMixin, self).retrieve(request, *args, **kwargs).data,
+            tags=[f'{self.cache_tag}:{pk}'],
+        )
+        return Response(data)
+
+
+class CachedRepresentationMixin:
+    """
+    Cache the representation of each instance of a model serializer in the
+    tiered cache, tagged ``{cache_tag}:{pk}``.
+    """
+
+    cache_tag = None
+
+    def to_representation(self, instance):
+        return tiered_cache.get_or_set(
+            f'{type(self).__name__}:{instance.pk}',
+            lambda: super(CachedRepresentationMixin, self).to_representation(instance),
+            tags=[f'{self.cache_tag}:{instance.pk}'],
+        )
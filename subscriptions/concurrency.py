@@ -0,0 +1,55 @@
+"""
+Optimistic locking for subscriptions over HTTP.
+
+The subscription ``version`` is exposed as a strong ETag. Clients send it
+back in ``If-Match`` and the version check becomes part of the UPDATE's
+WHERE clause, so it cannot race with the write. No lock is held between the
+client's read and its write; the write itself runs in a short transaction
+that also logs its events and updates the revenue series and summaries.
+"""
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The subscription was modified since it was read; fetch it again and retry.'
+    default_code = 'precondition_failed'
+
+
+class PreconditionRequired(APIException):
+    status_code = status.HTTP_428_PRECONDITION_REQUIRED
+    default_detail = 'Send the ETag of the subscription in an If-Match header.'
+    default_code = 'precondition_required'
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def matches(header, version, weak=False):
+    """Whether an ``If-Match`` / ``If-None-Match`` header lists ``version`` or is ``*``."""
+    if header is None:
+        return False
+    return header.strip() == '*' or version in parse_etags(header, weak)
+
+
+def parse_etags(header, weak=False):
+    """
+    Versions listed in an ``If-Match`` / ``If-None-Match`` header; ``None``
+    for ``*`` or a missing header. Weak tags only match with ``weak``
+    (``If-None-Match``); unparseable tags match nothing.
+    """
+    if not header or header.strip() == '*':
+        return None
+    versions = []
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            if not weak:
+                continue
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag.isdigit():
+            versions.append(int(tag))
+    return versions
@@ -0,0 +1,536 @@
+"""
+Load generator replaying a realistic traffic mix against a running server.
+
+A scenario file (YAML, see ``loadtest/mixed.yaml``) names the server, the
+number of concurrent clients, the run length and the relative weight of each
+action in ACTIONS. Every client logs in as one of the accounts seeded by
+``generate_data`` and then, until the run ends, picks actions at random by
+weight with an exponentially distributed think time in between. This is a
+closed model: load rises with the number of clients and falls as latency
+grows. Each client keeps one HTTP/1.1 keep-alive connection opened with
+asyncio streams, so no HTTP client library is needed.
+
+Clients start spread over the warmup, and requests started during it are not
+recorded. A run reports throughput, latency percentiles and a histogram, and
+the share of errors per action. 429 and 503 answers are load shedding by the
+throttles and are counted apart from errors. Runs are saved as JSON, and
+``compare`` lines two of them up.
+"""
+import asyncio
+import json
+import math
+import random
+import ssl
+from collections import Counter, defaultdict, deque
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+import yaml
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+
+DEFAULTS = {
+    'base_url': 'http://127.0.0.1:8000',
+    'duration': 60,
+    'warmup': 5,
+    'virtual_users': 20,
+    'think_time': 0.1,
+    'timeout': 30,
+    'forwarded_for': True,
+    'seed': None,
+    'accounts': {'count': 100, 'password': 'loadtest-password', 'usernames': None},
+    'admin': {'username': 'loadtest-admin', 'password': 'loadtest-password'},
+    'search_terms': ['Basic', 'Pro Yearly', 'Enterprise', 'user12', 'user345'],
+    'mix': {},
+}
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, math.inf)
+PERCENTILES = (50, 90, 95, 99)
+# Answers of the throttles and concurrency limits.
+SHED_STATUSES = (429, 503)
+# Subscription ids seen in list responses, read back by retrieves.
+SUBSCRIPTION_ID_POOL = 1000
+# Increase of the error rate reported as a regression by compare().
+ERROR_RATE_TOLERANCE = 0.01
+
+
+class ScenarioError(Exception):
+    pass
+
+
+def load_scenario(path, **overrides):
+    """The scenario in the YAML file ``path`` over DEFAULTS, validated."""
+    try:
+        with open(path) as file:
+            data = yaml.safe_load(file) or {}
+    except (OSError, yaml.YAMLError) as exc:
+        raise ScenarioError(f'Cannot read scenario {path}: {exc}')
+    if not isinstance(data, dict):
+        raise ScenarioError('A scenario must be a mapping.')
+    unknown = set(data) - set(DEFAULTS)
+    if unknown:
+        raise ScenarioError(f'Unknown scenario settings: {", ".join(sorted(unknown))}')
+
+    scenario = {**DEFAULTS, **data, **{name: value for name, value in overrides.items() if value is not None}}
+    for name in ('accounts', 'admin'):
+        scenario[name] = {**DEFAULTS[name], **(data.get(name) or {})}
+
+    mix = scenario['mix']
+    if not isinstance(mix, dict) or not mix:
+        raise ScenarioError(f'The mix must weigh some of: {", ".join(ACTIONS)}')
+    unknown = set(mix) - set(ACTIONS)
+    if unknown:
+        raise ScenarioError(f'Unknown actions in the mix: {", ".join(sorted(unknown))}')
+    if any(not isinstance(weight, (int, float)) or weight < 0 for weight in mix.values()) or not sum(mix.values()):
+        raise ScenarioError('Mix weights must be non-negative numbers, not all zero.')
+
+    for name, minimum in (('duration', 0), ('timeout', 0)):
+        if not scenario[name] > minimum:
+            raise ScenarioError(f'{name} must be positive.')
+    for name in ('warmup', 'think_time'):
+        if scenario[name] < 0:
+            raise ScenarioError(f'{name} must not be negative.')
+    if scenario['virtual_users'] < 1:
+        raise ScenarioError('virtual_users must be at least 1.')
+    if not scenario['search_terms']:
+        raise ScenarioError('search_terms must not be empty.')
+    return scenario
+
+
+def account_usernames(scenario):
+    """
+    Usernames clients log in as: those listed in the scenario, or the first
+    ``accounts.count`` active non-staff users.
+    """
+    if scenario['accounts']['usernames']:
+        return list(scenario['accounts']['usernames'])
+    users = User.objects.filter(is_active=True, is_staff=False).order_by('id')
+    return list(users.values_list('username', flat=True)[:scenario['accounts']['count']])
+
+
+def prepare_accounts(scenario):
+    """
+    Give the scenario's accounts their password and create or update its
+    staff account, which reads plans. Returns the account usernames.
+    """
+    usernames = account_usernames(scenario)
+    # One hash for all accounts; hashing each password would take minutes.
+    User.objects.filter(username__in=usernames).update(
+        password=make_password(scenario['accounts']['password'])
+    )
+    admin, _ = User.objects.get_or_create(username=scenario['admin']['username'])
+    admin.is_staff = True
+    admin.is_active = True
+    admin.set_password(scenario['admin']['password'])
+    admin.save()
+    return usernames
+
+
+class HTTPConnection:
+    """A keep-alive HTTP/1.1 connection, reopened when the server closes it."""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise ScenarioError(f'Unsupported base_url: {base_url!r}')
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == 'https' else 80)
+        self.ssl = ssl.create_default_context() if url.scheme == 'https' else None
+        self.host_header = url.netloc
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=(), body=b''):
+        """Send a request; returns ``(status, headers, body)``."""
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host_header}', f'Content-Length: {len(body)}']
+        head += [f'{name}: {value}' for name, value in headers]
+        payload = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+        for retry in (True, False):
+            reused = self.writer is not None
+            if not reused:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+            try:
+                self.writer.write(payload)
+                await self.writer.drain()
+                response = await self._read_response(method)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                # The server may close an idle connection just as it is reused.
+                if reused and retry:
+                    continue
+                raise
+            if response[1].get('connection', '').lower() == 'close':
+                self.close()
+            return response
+
+    async def _read_response(self, method):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionResetError('Connection closed by the server')
+        version, status = line.split(None, 2)[:2]
+        status = int(status)
+        headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if version == b'HTTP/1.0' and headers.get('connection', '').lower() != 'keep-alive':
+            headers['connection'] = 'close'
+
+        if method == 'HEAD' or status in (204, 304) or status < 200:
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            # Delimited by the end of the connection.
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+        return status, headers, body
+
+    async def _read_chunked(self):
+        chunks = []
+        while size := int((await self.reader.readline()).split(b';')[0], 16):
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+        while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass  # trailers
+        return b''.join(chunks)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class ActionStats:
+    """Outcomes and latencies (in seconds) of the recorded requests of an action."""
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        # Requests without an answer, by kind (timeout, ConnectionRefusedError...).
+        self.failures = Counter()
+
+    def record(self, latency, status=None, failure=None):
+        self.latencies.append(latency)
+        if status is None:
+            self.failures[failure] += 1
+        else:
+            self.statuses[status] += 1
+
+    def merge(self, other):
+        self.latencies.extend(other.latencies)
+        self.statuses.update(other.statuses)
+        self.failures.update(other.failures)
+
+    def summary(self, duration):
+        requests = len(self.latencies)
+        ok = sum(count for status, count in self.statuses.items() if status < 400)
+        shed = sum(self.statuses[status] for status in SHED_STATUSES)
+        errors = requests - ok - shed
+        latencies = sorted(latency * 1000 for latency in self.latencies)
+        return {
+            'requests': requests,
+            'ok': ok,
+            'shed': shed,
+            'errors': errors,
+            'throughput': requests / duration,
+            'error_rate': errors / requests if requests else 0.0,
+            'latency_ms': latency_summary(latencies),
+            'histogram': histogram(latencies),
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+            'failures': dict(sorted(self.failures.items())),
+        }
+
+
+def latency_summary(latencies):
+    """Mean, nearest-rank percentiles and maximum of sorted ``latencies``."""
+    if not latencies:
+        return dict.fromkeys(['mean', *(f'p{p}' for p in PERCENTILES), 'max'])
+    summary = {'mean': sum(latencies) / len(latencies)}
+    for p in PERCENTILES:
+        summary[f'p{p}'] = latencies[max(0, math.ceil(p / 100 * len(latencies)) - 1)]
+    summary['max'] = latencies[-1]
+    return summary
+
+
+def histogram(latencies):
+    """``[[upper bound in ms or None for infinity, count], ...]`` over HISTOGRAM_BOUNDS."""
+    counts = [0] * len(HISTOGRAM_BOUNDS)
+    bucket = 0
+    for latency in latencies:
+        while latency > HISTOGRAM_BOUNDS[bucket]:
+            bucket += 1
+        counts[bucket] += 1
+    return [[bound if bound != math.inf else None, count] for bound, count in zip(HISTOGRAM_BOUNDS, counts)]
+
+
+def results_of(data):
+    """Rows of a list response, paginated or not."""
+    return data['results'] if isinstance(data, dict) else data
+
+
+async def login(client):
+    username = client.random.choice(client.accounts)
+    status, data = await client.request(
+        'login', 'POST', '/api/users/login/',
+        {'username': username, 'password': client.test.scenario['accounts']['password']},
+    )
+    if status == 200:
+        client.token, client.user_id = data['token'], data['user_id']
+
+
+async def subscriptions_list(client):
+    # Most views are of the first pages.
+    page = min(client.test.subscription_pages, 1 + int(client.random.expovariate(1 / 3)))
+    status, data = await client.request('subscriptions_list', 'GET', f'/api/subscriptions/?page={page}')
+    if status == 200:
+        client.test.subscription_ids.extend(row['id'] for row in results_of(data))
+
+
+async def subscriptions_search(client):
+    query = urlencode({'search': client.random.choice(client.test.scenario['search_terms'])})
+    await client.request('subscriptions_search', 'GET', f'/api/subscriptions/?{query}')
+
+
+async def subscription_retrieve(client):
+    subscription_id = client.random.choice(client.test.subscription_ids)
+    await client.request('subscription_retrieve', 'GET', f'/api/subscriptions/{subscription_id}/')
+
+
+async def plans_list(client):
+    await client.request('plans_list', 'GET', '/api/plans/', admin=True)
+
+
+async def plan_retrieve(client):
+    plan_id = client.random.choice(client.test.plan_ids)
+    await client.request('plan_retrieve', 'GET', f'/api/plans/{plan_id}/', admin=True)
+
+
+async def user_summary(client):
+    await client.request('user_summary', 'GET', f'/api/users/{client.user_id}/summary/')
+
+
+async def analytics_dashboard(client):
+    await client.request('analytics_dashboard', 'GET', '/api/analytics/')
+
+
+async def revenue_breakdown(client):
+    today = date.today()
+    query = urlencode({
+        'group_by': client.random.choice(['plan', 'billing_cycle', 'status', 'start_month']),
+        'metrics': 'sum,count',
+        'start_date_from': (today - timedelta(days=client.random.choice([30, 90, 365]))).isoformat(),
+        'start_date_to': today.isoformat(),
+    })
+    await client.request('revenue_breakdown', 'GET', f'/api/analytics/revenue/?{query}')
+
+
+ACTIONS = {
+    action.__name__: action
+    for action in (
+        login,
+        subscriptions_list,
+        subscriptions_search,
+        subscription_retrieve,
+        plans_list,
+        plan_retrieve,
+        user_summary,
+        analytics_dashboard,
+        revenue_breakdown,
+    )
+}
+
+
+class Client:
+    """A simulated user: its accounts, one connection and a loop of weighted actions."""
+
+    def __init__(self, test, index):
+        self.test = test
+        self.index = index
+        self.random = random.Random(test.random.random())
+        self.connection = HTTPConnection(test.scenario['base_url'])
+        self.token = self.user_id = None
+        self.headers = [('Accept', 'application/json')]
+        if index is not None:
+            clients = test.scenario['virtual_users']
+            self.accounts = test.usernames[index::clients] or [test.usernames[index % len(test.usernames)]]
+            if test.scenario['forwarded_for']:
+                # As behind a proxy: with NUM_PROXIES=1 per-IP throttles see
+                # one address per client.
+                self.headers.append(('X-Forwarded-For', f'10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}'))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        scenario = self.test.scenario
+        await asyncio.sleep(self.index * scenario['warmup'] / scenario['virtual_users'])
+        names, weights = zip(*scenario['mix'].items())
+        await login(self)
+        while loop.time() < self.test.stop_at:
+            if self.token is None:
+                await login(self)
+            else:
+                await ACTIONS[self.random.choices(names, weights)[0]](self)
+            if scenario['think_time']:
+                await asyncio.sleep(self.random.expovariate(1 / scenario['think_time']))
+
+    async def request(self, action, method, path, data=None, admin=False):
+        """
+        Send a request as this client and record it. Returns ``(status,
+        decoded JSON body)``, or ``(None, failure)`` when there is no answer.
+        """
+        headers = list(self.headers)
+        token = self.test.admin_token if admin else self.token
+        if token:
+            headers.append(('Authorization', f'Token {token}'))
+        body = b''
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers.append(('Content-Type', 'application/json'))
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            status, _, content = await asyncio.wait_for(
+                self.connection.request(method, path, headers, body), self.test.scenario['timeout']
+            )
+        except (OSError, EOFError, ValueError) as exc:
+            # Timeouts, refused or reset connections, malformed responses.
+            self.connection.close()
+            failure = 'timeout' if isinstance(exc, TimeoutError) else type(exc).__name__
+            self.test.record(action, started, loop.time() - started, failure=failure)
+            return None, failure
+        self.test.record(action, started, loop.time() - started, status=status)
+        try:
+            return status, json.loads(content) if content else None
+        except ValueError:
+            return status, None
+
+
+class LoadTest:
+    """One run of a scenario; ``run()`` returns the results."""
+
+    def __init__(self, scenario, usernames):
+        if not usernames:
+            raise ScenarioError('No accounts to log in as; seed the database with generate_data.')
+        self.scenario = scenario
+        self.usernames = usernames
+        self.random = random.Random(scenario['seed'])
+        self.stats = defaultdict(ActionStats)
+        self.subscription_ids = deque(maxlen=SUBSCRIPTION_ID_POOL)
+        self.subscription_pages = 1
+        self.plan_ids = []
+        self.admin_token = None
+        self.measure_from = self.stop_at = None
+
+    def run(self):
+        return asyncio.run(self._run())
+
+    async def _run(self):
+        await self.setup()
+        loop = asyncio.get_running_loop()
+        started_at = timezone.now()
+        self.measure_from = loop.time() + self.scenario['warmup']
+        self.stop_at = self.measure_from + self.scenario['duration']
+        clients = [Client(self, index) for index in range(self.scenario['virtual_users'])]
+        try:
+            await asyncio.gather(*(client.run() for client in clients))
+        finally:
+            for client in clients:
+                client.connection.close()
+        return self.results(started_at)
+
+    async def setup(self):
+        """Log the staff account in and sample the plans and subscriptions to read."""
+        client = Client(self, None)
+        admin = self.scenario['admin']
+        try:
+            status, data = await client.request(
+                'login', 'POST', '/api/users/login/',
+                {'username': admin['username'], 'password': admin['password']},
+            )
+            if status != 200:
+                raise ScenarioError(
+                    f'Staff login to {self.scenario["base_url"]} failed ({status or data}); '
+                    'create the accounts with --prepare.'
+                )
+            self.admin_token = data['token']
+
+            status, data = await client.request('plans_list', 'GET', '/api/plans/', admin=True)
+            if status == 200:
+                self.plan_ids = [plan['id'] for plan in results_of(data)]
+            status, data = await client.request('subscriptions_list', 'GET', '/api/subscriptions/', admin=True)
+            if status == 200 and results_of(data):
+                self.subscription_ids.extend(row['id'] for row in results_of(data))
+                if isinstance(data, dict):
+                    self.subscription_pages = math.ceil(data['count'] / len(data['results']))
+            if not self.plan_ids or not self.subscription_ids:
+                raise ScenarioError('No plans or subscriptions to read; seed the database with generate_data.')
+        finally:
+            client.connection.close()
+
+    def record(self, action, started, latency, status=None, failure=None):
+        if self.measure_from is not None and self.measure_from <= started < self.stop_at:
+            self.stats[action].record(latency, status, failure)
+
+    def results(self, started_at):
+        duration = self.scenario['duration']
+        total = ActionStats()
+        for stats in self.stats.values():
+            total.merge(stats)
+        return {
+            'started_at': started_at.isoformat(),
+            # Without the passwords, as results are shared.
+            'scenario': {name: value for name, value in self.scenario.items() if name not in ('accounts', 'admin')},
+            'total': total.summary(duration),
+            'actions': {name: self.stats[name].summary(duration) for name in sorted(self.stats)},
+        }
+
+
+def change(before, after):
+    """Relative change from ``before`` to ``after``, or ``None`` when undefined."""
+    if before is None or after is None or not before:
+        return None
+    return (after - before) / before
+
+
+def compare(baseline, candidate, threshold=0.1):
+    """
+    Line up two saved runs. Returns ``(rows, regressions)``: a row per action
+    (and ``total``) with ``(before, after, change)`` of throughput, p50, p95,
+    p99 and error rate, and messages for throughput drops or p95 and p99
+    increases beyond ``threshold``, and for error rates up by more than
+    ERROR_RATE_TOLERANCE.
+    """
+    rows, regressions = [], []
+    names = ['total', *sorted(set(baseline['actions']) | set(candidate['actions']))]
+    empty = ActionStats().summary(1)
+    for name in names:
+        before = baseline['total'] if name == 'total' else baseline['actions'].get(name, empty)
+        after = candidate['total'] if name == 'total' else candidate['actions'].get(name, empty)
+        row = {'action': name}
+        for metric, old, new in (
+            ('throughput', before['throughput'], after['throughput']),
+            ('p50', before['latency_ms']['p50'], after['latency_ms']['p50']),
+            ('p95', before['latency_ms']['p95'], after['latency_ms']['p95']),
+            ('p99', before['latency_ms']['p99'], after['latency_ms']['p99']),
+            ('error_rate', before['error_rate'], after['error_rate']),
+        ):
+            row[metric] = (old, new, change(old, new))
+        rows.append(row)
+
+        throughput = row['throughput'][2]
+        if throughput is not None and throughput < -threshold:
+            regressions.append(f'{name}: throughput {throughput:+.0%}')
+        for metric in ('p95', 'p99'):
+            increase = row[metric][2]
+            if increase is not None and increase > threshold:
+                regressions.append(f'{name}: {metric} latency {increase:+.0%}')
+        if after['error_rate'] - before['error_rate'] > ERROR_RATE_TOLERANCE:
+            regressions.append(
+                f'{name}: error rate {before["error_rate"]:.1%} -> {after["error_rate"]:.1%}'
+            )
+    return rows, regressions
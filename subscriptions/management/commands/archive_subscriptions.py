@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from subscriptions.archiving import archivable, archive_batch
+
+
+class Command(BaseCommand):
+    help = 'Move ended subscriptions past the retention horizon into the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=365,
+            help='Archive subscriptions that ended or were cancelled more than this many days ago (default: 365)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows moved per transaction (default: 500)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Stop after archiving this many rows'
+        )
+
+    def handle(self, *args, **options):
+        horizon = date.today() - timedelta(days=options['retention_days'])
+        batch_size = options['batch_size']
+        limit = options['limit']
+
+        self.stdout.write(
+            f'Archiving ~{archivable(horizon).count()} subscriptions ended before {horizon} '
+            f'in batches of {batch_size}...'
+        )
+
+        total = 0
+        last_id = 0
+        while limit is None or total < limit:
+            size = batch_size if limit is None else min(batch_size, limit - total)
+            archived, last_id = archive_batch(horizon, size, after_id=last_id)
+            if not archived:
+                break
+            total += archived
+            self.stdout.write(f'  Archived {total} subscriptions (last id {last_id})...')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {total} subscriptions archived'))
@@ -0,0 +1,66 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from subscriptions.overlaps import Overlap, cancel_overlaps, find_overlaps
+
+
+class Command(BaseCommand):
+    help = 'Find overlapping active subscriptions of a user to the same plan'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=['text', 'csv'],
+            default='text',
+            help='Output format (default: text)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Rows fetched from the database at a time (default: 10000)'
+        )
+        parser.add_argument(
+            '--fail',
+            action='store_true',
+            help='Exit with an error status when overlaps are found'
+        )
+        parser.add_argument(
+            '--cancel',
+            action='store_true',
+            help='Cancel the later of overlapping subscriptions, keeping the earliest of each user and plan'
+        )
+
+    def handle(self, *args, **options):
+        if options['cancel']:
+            cancelled = cancel_overlaps(options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'✓ Cancelled {cancelled} overlapping subscriptions'))
+            return
+
+        writer = None
+        if options['format'] == 'csv':
+            writer = csv.writer(self.stdout)
+            writer.writerow(Overlap._fields)
+
+        found = 0
+        # Results are streamed as the sweep finds them.
+        for overlap in find_overlaps(options['chunk_size']):
+            found += 1
+            if writer:
+                writer.writerow(overlap)
+            else:
+                self.stdout.write(
+                    f'  Subscription {overlap.subscription_id} ({overlap.start_date} - '
+                    f'{overlap.end_date or "open"}) overlaps {overlap.other_id} '
+                    f'({overlap.other_start_date} - {overlap.other_end_date or "open"}) '
+                    f'for user {overlap.user_id}, plan {overlap.plan_id}'
+                )
+
+        if found and options['fail']:
+            raise CommandError(f'{found} overlapping subscriptions found')
+        if writer:
+            return
+        if found:
+            self.stdout.write(self.style.WARNING(f'{found} overlapping subscriptions found'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✓ No overlapping subscriptions'))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+from subscriptions.analytics import backfill_monthly_revenue
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed monthly revenue series from subscriptions and the archive'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Recomputing monthly revenue...')
+        started = time.perf_counter()
+        months = backfill_monthly_revenue()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Monthly revenue for {months} months rebuilt in {elapsed:.2f}s'
+        ))
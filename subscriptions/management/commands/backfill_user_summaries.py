@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+from subscriptions.summaries import backfill_user_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user subscription summaries from subscriptions and the archive'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Recomputing user summaries...')
+        started = time.perf_counter()
+        users = backfill_user_summaries()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Summaries of {users} users rebuilt in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,87 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, FloatField, Q, Sum
+from django.db.models.functions import Coalesce
+from subscriptions.models import UserSubscription, effectively_active
+
+
+class Command(BaseCommand):
+    help = 'Compare status-only, naive and indexed "effectively active" subscription queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Timed runs per query; medians are reported (default: 5)'
+        )
+        parser.add_argument(
+            '--explain',
+            action='store_true',
+            help='Print the query plan of each recurring revenue query'
+        )
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1.')
+        today = date.today()
+        subscriptions = UserSubscription.objects.order_by()
+        status_only = Q(status=UserSubscription.Status.ACTIVE)
+        naive = status_only & (Q(end_date__isnull=True) | Q(end_date__gte=today))
+        indexed = effectively_active(today)
+
+        def revenue(condition):
+            return subscriptions.filter(condition).aggregate(
+                total=Coalesce(Sum('plan_cost'), 0, output_field=FloatField())
+            )
+
+        def dashboard(condition):
+            # The dashboard reads all totals in one scan.
+            return subscriptions.aggregate(
+                total_recurring_revenue=Coalesce(
+                    Sum('plan_cost', filter=condition), 0, output_field=FloatField()
+                ),
+                total_cost=Coalesce(Sum('plan_cost'), 0, output_field=FloatField()),
+                subscription_count=Count('id'),
+            )
+
+        queries = {
+            'recurring revenue, status only': lambda: revenue(status_only),
+            'recurring revenue, naive OR': lambda: revenue(naive),
+            'recurring revenue, indexed': lambda: revenue(indexed),
+            'dashboard totals, status only': lambda: dashboard(status_only),
+            'dashboard totals, indexed': lambda: dashboard(indexed),
+        }
+        medians = {}
+        for name, run in queries.items():
+            timings = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            medians[name] = timings[len(timings) // 2]
+            self.stdout.write(
+                f'{name:>32}: median {medians[name]:.1f} ms, min {timings[0]:.1f} ms'
+            )
+
+        if options['explain']:
+            for name, condition in (('status only', status_only), ('naive OR', naive), ('indexed', indexed)):
+                self.stdout.write(f'\n{name}:\n{subscriptions.filter(condition).explain()}')
+
+        expired = subscriptions.filter(status_only).exclude(indexed).count()
+        self.stdout.write(f'\n  {expired} subscriptions marked active have ended and are no longer counted')
+        # Allow for timing noise on small tables.
+        slack = 1.1
+        if all(
+            medians[f'{query}, indexed'] <= medians[f'{query}, status only'] * slack + 1
+            for query in ('recurring revenue', 'dashboard totals')
+        ):
+            self.stdout.write(self.style.SUCCESS('✓ Indexed queries are as fast as the status-only ones'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                'Indexed queries are slower than the status-only ones; check that '
+                'migration 0014 created usersub_eff_active_idx and the table is analyzed'
+            ))
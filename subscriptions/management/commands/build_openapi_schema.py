@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from subscriptions import openapi
+
+
+class Command(BaseCommand):
+    help = 'Pre-build the OpenAPI schema artefacts served at /api/schema/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Fail if the artefacts are missing or differ from the schema generated from the code'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rendered = openapi.generate()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'  Generated schema in {elapsed:.2f}s')
+
+        if options['check']:
+            stale = openapi.stale(rendered)
+            if stale:
+                raise CommandError(
+                    f'Out of date: {", ".join(str(path) for path in stale)}. '
+                    'Run `python manage.py build_openapi_schema`.'
+                )
+            self.stdout.write(self.style.SUCCESS('✓ OpenAPI schema artefacts are up to date'))
+            return
+
+        for path in openapi.write(rendered):
+            self.stdout.write(f'  Wrote {path}')
+        self.stdout.write(self.style.SUCCESS('✓ OpenAPI schema artefacts built'))
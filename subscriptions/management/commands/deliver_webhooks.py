@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from subscriptions.webhooks import WebhookDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Deliver subscription events to webhook endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run a single delivery pass and exit'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep between passes when idle (default: 1.0)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Maximum concurrent HTTP deliveries across endpoints (default: 8)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Events per webhook request (default: 100)'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=10,
+            help='HTTP timeout per request in seconds (default: 10)'
+        )
+
+    def handle(self, *args, **options):
+        dispatcher = WebhookDispatcher(
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            timeout=options['timeout'],
+        )
+
+        self.stdout.write(self.style.SUCCESS('Starting webhook delivery...'))
+        while True:
+            stats = dispatcher.run_once()
+            if stats['batches'] or stats['failed_batches']:
+                self.stdout.write(
+                    f'  Delivered {stats["delivered"]} events in {stats["batches"]} batches, '
+                    f'{stats["failed_batches"]} failed'
+                )
+            if options['once']:
+                break
+            # Keep draining while there is a backlog, otherwise poll.
+            if not stats['batches']:
+                time.sleep(options['interval'])
@@ -3,7 +3,8 @@ from django.contrib.auth.models import User
 from subscriptions.models import Feature, SubscriptionPlan, UserSubscription
 from faker import Faker
 import random
-from datetime import timedelta
+from collections import defaultdict
+from datetime import date, timedelta
 
 
 fake = Faker()
@@ -126,6 +127,13 @@ class Command(BaseCommand):
         statuses = ['active', 'cancelled', 'suspended']
         status_weights = [0.7, 0.2, 0.1]  # 70% active, 20% cancelled, 10% suspended
 
+        # Active subscriptions of a user to a plan must not overlap.
+        active_ranges = defaultdict(list)
+        for user_id, plan_id, start, end in UserSubscription.objects.filter(
+            status='active'
+        ).values_list('user_id', 'plan_id', 'start_date', 'end_date'):
+            active_ranges[(user_id, plan_id)].append((start, end or date.max))
+
         for i in range(num_subscriptions):
             user = random.choice(users)
             plan = random.choice(plans)
@@ -135,6 +143,12 @@ class Command(BaseCommand):
 
             # Select status based on weights
             status = random.choices(statuses, weights=status_weights)[0]
+            if status == 'active':
+                ranges = active_ranges[(user.id, plan.id)]
+                if any(start <= end_date and start_date <= end for start, end in ranges):
+                    status = 'cancelled'
+                else:
+                    ranges.append((start_date, end_date))
 
             subscriptions_to_create.append(UserSubscription(
                 user=user,
@@ -0,0 +1,152 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from subscriptions import loadtest
+
+
+class Command(BaseCommand):
+    help = 'Replay the traffic mix of a scenario against a running server, or compare two runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenario',
+            nargs='?',
+            help='Scenario file, e.g. loadtest/mixed.yaml'
+        )
+        parser.add_argument(
+            '--prepare',
+            action='store_true',
+            help='Set the passwords of the scenario accounts and create its staff account first'
+        )
+        parser.add_argument('--base-url', help='Server to load (default: the scenario base_url)')
+        parser.add_argument('--duration', type=float, help='Seconds recorded (default: the scenario duration)')
+        parser.add_argument(
+            '--virtual-users',
+            type=int,
+            help='Concurrent clients (default: the scenario virtual_users)'
+        )
+        parser.add_argument(
+            '--output',
+            help='File the results are saved to (default: a new file in LOADTEST_RESULTS_DIR)'
+        )
+        parser.add_argument('--baseline', help='Saved run to compare the results with')
+        parser.add_argument(
+            '--compare',
+            nargs=2,
+            metavar=('BASELINE', 'CANDIDATE'),
+            help='Compare two saved runs instead of running a scenario'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=10,
+            help='Percent change of throughput or p95/p99 latency reported as a regression (default: 10)'
+        )
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            self.write_comparison(*(self.read_run(path) for path in options['compare']), options['threshold'])
+            return
+        if not options['scenario']:
+            raise CommandError('A scenario file is required unless --compare is given.')
+        baseline = self.read_run(options['baseline']) if options['baseline'] else None
+
+        try:
+            scenario = loadtest.load_scenario(
+                options['scenario'],
+                base_url=options['base_url'],
+                duration=options['duration'],
+                virtual_users=options['virtual_users'],
+            )
+            if options['prepare']:
+                usernames = loadtest.prepare_accounts(scenario)
+                self.stdout.write(f'  Prepared {len(usernames)} accounts and {scenario["admin"]["username"]}')
+            else:
+                usernames = loadtest.account_usernames(scenario)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'Loading {scenario["base_url"]} with {scenario["virtual_users"]} clients for '
+                f'{scenario["warmup"]}s warmup + {scenario["duration"]}s...'
+            ))
+            results = loadtest.LoadTest(scenario, usernames).run()
+        except loadtest.ScenarioError as exc:
+            raise CommandError(str(exc))
+
+        self.write_results(results)
+        output = Path(options['output'] or Path(settings.LOADTEST_RESULTS_DIR) / (
+            f'run-{timezone.localtime():%Y%m%d-%H%M%S}.json'
+        ))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2))
+        if baseline:
+            self.write_comparison(baseline, results, options['threshold'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Results saved to {output}'))
+
+    def read_run(self, path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read run {path}: {exc}')
+
+    def write_results(self, results):
+        self.stdout.write('')
+        self.stdout.write(
+            f'  {"action":<22} {"requests":>8} {"req/s":>8} {"errors":>7} {"shed":>6}'
+            f' {"mean":>8} {"p50":>8} {"p95":>8} {"p99":>8} {"max":>8}  (ms)'
+        )
+        for name, summary in [*results['actions'].items(), ('total', results['total'])]:
+            latency = summary['latency_ms']
+            self.stdout.write(
+                f'  {name:<22} {summary["requests"]:>8} {summary["throughput"]:>8.1f}'
+                f' {summary["error_rate"]:>7.1%} {summary["shed"]:>6}'
+                + ''.join(f' {format_ms(latency[key]):>8}' for key in ('mean', 'p50', 'p95', 'p99', 'max'))
+            )
+            if summary['failures']:
+                failures = ', '.join(f'{kind} {count}' for kind, count in summary['failures'].items())
+                self.stdout.write(self.style.WARNING(f'    no answer: {failures}'))
+
+        buckets = results['total']['histogram']
+        counts = [count for _, count in buckets]
+        if not any(counts):
+            self.stdout.write(self.style.WARNING('No requests recorded'))
+            return
+        first = next(index for index, count in enumerate(counts) if count)
+        last = max(index for index, count in enumerate(counts) if count)
+        self.stdout.write('')
+        self.stdout.write('  Latency histogram, all requests')
+        for bound, count in buckets[first:last + 1]:
+            label = f'<= {bound} ms' if bound is not None else f'> {buckets[-2][0]} ms'
+            bar = '#' * round(40 * count / max(counts))
+            self.stdout.write(f'  {label:>12} {count:>8}  {bar}')
+
+    def write_comparison(self, baseline, candidate, threshold):
+        rows, regressions = loadtest.compare(baseline, candidate, threshold / 100)
+        self.stdout.write('')
+        self.stdout.write(f'  Baseline {baseline["started_at"]}, candidate {candidate["started_at"]}')
+        self.stdout.write(
+            f'  {"action":<22} {"req/s":>22} {"p50 ms":>22} {"p95 ms":>22} {"p99 ms":>22} {"errors":>16}'
+        )
+        for row in rows:
+            self.stdout.write(
+                f'  {row["action"]:<22}'
+                + ''.join(f' {format_change(*row[metric]):>22}' for metric in ('throughput', 'p50', 'p95', 'p99'))
+                + ' {:>16}'.format('{:.1%} -> {:.1%}'.format(*row['error_rate'][:2]))
+            )
+        if regressions:
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(f'Regression: {regression}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ No change beyond {threshold:g}%'))
+
+
+def format_ms(value):
+    return '-' if value is None else f'{value:.1f}'
+
+
+def format_change(before, after, change):
+    text = f'{format_ms(before)} -> {format_ms(after)}'
+    return text if change is None else f'{text} {change:+.0%}'
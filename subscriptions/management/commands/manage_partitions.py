@@ -0,0 +1,170 @@
+import json
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+from subscriptions import partitioning
+from subscriptions.models import UserSubscription
+
+
+class Command(BaseCommand):
+    """
+    Partitioning is not a migration: converting the table rewrites every
+    subscription, and the resulting schema would depend on settings
+    (USER_SUBSCRIPTION_PARTITIONING) rather than on the migration history.
+    It is run explicitly with ``partition`` and undone with ``unpartition``.
+    """
+
+    help = 'Manage PostgreSQL range partitions of user subscriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'operation',
+            choices=['status', 'create', 'detach', 'partition', 'unpartition', 'explain'],
+            help='status: list partitions; create: add future partitions; detach: detach old partitions; '
+                 'partition/unpartition: convert the table; explain: show partition pruning of analytics queries'
+        )
+        parser.add_argument(
+            '--granularity',
+            choices=partitioning.GRANULARITIES,
+            help='Partition size (default: existing partitions or USER_SUBSCRIPTION_PARTITIONING)'
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=3,
+            help='Number of future periods to create partitions for (default: 3)'
+        )
+        parser.add_argument(
+            '--before',
+            type=date.fromisoformat,
+            help='Detach partitions ending on or before this date (YYYY-MM-DD)'
+        )
+        parser.add_argument(
+            '--archive-schema',
+            help='Move detached partitions into this schema'
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Drop detached partitions instead of keeping them'
+        )
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported(connection):
+            raise CommandError('Partitioning requires PostgreSQL.')
+
+        operation = options['operation']
+        if operation == 'partition':
+            if partitioning.is_partitioned(connection):
+                raise CommandError('Subscriptions table is already partitioned.')
+            granularity = self.granularity(options)
+            self.stdout.write(f'Partitioning subscriptions {granularity}, this locks the table...')
+            with transaction.atomic():
+                partitioning.partition_table(granularity, ahead=options['ahead'])
+            self.stdout.write(self.style.SUCCESS('✓ Subscriptions table partitioned'))
+            return
+
+        if not partitioning.is_partitioned(connection):
+            raise CommandError('Subscriptions table is not partitioned.')
+
+        if operation == 'status':
+            self.status()
+        elif operation == 'create':
+            self.create(options)
+        elif operation == 'detach':
+            self.detach(options)
+        elif operation == 'unpartition':
+            self.stdout.write('Converting subscriptions back to a plain table, this locks the table...')
+            with transaction.atomic():
+                partitioning.unpartition_table()
+            self.stdout.write(self.style.SUCCESS('✓ Subscriptions table unpartitioned'))
+        elif operation == 'explain':
+            self.explain()
+
+    def granularity(self, options):
+        granularity = (
+            options['granularity']
+            or partitioning.infer_granularity(connection)
+            or settings.USER_SUBSCRIPTION_PARTITIONING
+        )
+        if granularity not in partitioning.GRANULARITIES:
+            raise CommandError('Pass --granularity monthly or yearly.')
+        return granularity
+
+    def status(self):
+        with connection.cursor() as cursor:
+            for name, lower, upper in partitioning.list_partitions(connection):
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [name])
+                rows = max(cursor.fetchone()[0], 0)
+                self.stdout.write(f'  {name}: {lower} - {upper} (~{rows} rows)')
+
+    def create(self, options):
+        granularity = self.granularity(options)
+        start = partitioning.period_start(date.today(), granularity)
+        end = start
+        for _ in range(options['ahead'] + 1):
+            end = partitioning.next_period(end, granularity)
+        with transaction.atomic():
+            created = partitioning.create_partitions(start, end, granularity)
+        for name in created:
+            self.stdout.write(f'  Created {name}')
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(created)} partitions created'))
+
+    def detach(self, options):
+        if not options['before']:
+            raise CommandError('Pass --before YYYY-MM-DD.')
+        with transaction.atomic():
+            detached = partitioning.detach_partitions(
+                options['before'],
+                archive_schema=options['archive_schema'],
+                drop=options['drop'],
+            )
+        for name in detached:
+            self.stdout.write(f'  Detached {name}')
+        self.stdout.write(self.style.SUCCESS(f'✓ {len(detached)} partitions detached'))
+
+    def explain(self):
+        """Compare the analytics monthly revenue query with and without pruning."""
+        today = date.today()
+        start_of_current_month = today.replace(day=1)
+        twelve_months_ago = today.replace(year=today.year - 1)
+        monthly_revenue = (
+            UserSubscription.objects
+            .annotate(month=TruncMonth('start_date'))
+            .values('month')
+            .annotate(total_revenue=Sum('plan_cost'))
+            .order_by('month')
+        )
+        queries = {
+            'last 12 months (analytics)': monthly_revenue.filter(
+                start_date__gte=twelve_months_ago,
+                start_date__lt=start_of_current_month,
+            ),
+            'full history': monthly_revenue,
+        }
+        total = len(partitioning.list_partitions(connection)) + 1
+
+        for label, queryset in queries.items():
+            started = time.perf_counter()
+            plan = json.loads(queryset.explain(format='json', analyze=True))[0]
+            elapsed = (time.perf_counter() - started) * 1000
+            scanned = sorted(self.scanned_relations(plan['Plan']))
+            self.stdout.write(
+                f'{label}: scanned {len(scanned)}/{total} partitions, '
+                f'execution {plan["Execution Time"]:.1f} ms (wall {elapsed:.1f} ms)'
+            )
+            for name in scanned:
+                self.stdout.write(f'  {name}')
+
+    def scanned_relations(self, node):
+        relations = set()
+        if node.get('Relation Name', '').startswith(partitioning.TABLE):
+            relations.add(node['Relation Name'])
+        for child in node.get('Plans', []):
+            relations |= self.scanned_relations(child)
+        return relations
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from subscriptions import startup
+
+
+class Command(BaseCommand):
+    help = 'Measure the cold start time of core.wsgi and the slowest imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=5,
+            help='Cold starts to measure; medians are reported (default: 5)'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Slowest modules to list by cumulative import time (default: 15)'
+        )
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1.')
+
+        timing = startup.measure(options['runs'])
+        self.stdout.write(f'  import core.wsgi: {timing.wsgi_import * 1000:.0f} ms')
+        self.stdout.write(f'  URLconf load:     {timing.urlconf_load * 1000:.0f} ms')
+        self.stdout.write('')
+        self.stdout.write(f'  {"cumulative":>10}  {"self":>8}  module')
+        for module in timing.modules[:options['top']]:
+            self.stdout.write(
+                f'  {module.cumulative_us / 1000:8.1f}ms  {module.self_us / 1000:6.1f}ms  {module.name}'
+            )
+
+        budget = settings.STARTUP_IMPORT_BUDGET
+        if timing.wsgi_import > budget:
+            self.stdout.write(self.style.WARNING(
+                f'core.wsgi import exceeds the {budget:.2f}s budget (STARTUP_IMPORT_BUDGET)'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ core.wsgi imports within the {budget:.2f}s budget'))
@@ -0,0 +1,139 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from subscriptions.models import PlanMigration, SubscriptionPlan, UserSubscription
+from subscriptions.plan_migration import candidates, claim_pending, conflicting, run_migration
+
+
+class Command(BaseCommand):
+    help = 'Move subscriptions from one plan to another with prorated costs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source_plan', nargs='?', help='Source plan id or name')
+        parser.add_argument('target_plan', nargs='?', help='Target plan id or name')
+        parser.add_argument(
+            '--effective-date',
+            type=date.fromisoformat,
+            default=None,
+            help='Date the change takes effect, YYYY-MM-DD (default: today)'
+        )
+        parser.add_argument(
+            '--no-prorate',
+            action='store_true',
+            help='Set plan_cost to the target price instead of prorating the current period'
+        )
+        parser.add_argument(
+            '--status',
+            choices=UserSubscription.Status.values,
+            help='Only migrate subscriptions with this status; active ones must not have ended by the effective date'
+        )
+        parser.add_argument(
+            '--start-date-from',
+            type=date.fromisoformat,
+            help='Only migrate subscriptions starting on or after this date'
+        )
+        parser.add_argument(
+            '--start-date-to',
+            type=date.fromisoformat,
+            help='Only migrate subscriptions starting before this date'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows updated per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--resume',
+            type=int,
+            metavar='MIGRATION_ID',
+            help='Resume an interrupted or failed migration'
+        )
+        parser.add_argument(
+            '--queued',
+            action='store_true',
+            help='Run the migrations queued through the API, then exit'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the matching and conflicting subscriptions'
+        )
+
+    def handle(self, *args, **options):
+        if options['queued']:
+            count = 0
+            while (migration := claim_pending()) is not None:
+                self.run(migration, options['batch_size'])
+                count += 1
+            self.stdout.write(self.style.SUCCESS(f'✓ {count} queued plan migrations run'))
+            return
+
+        if options['resume']:
+            try:
+                migration = PlanMigration.objects.select_related(
+                    'source_plan', 'target_plan'
+                ).get(pk=options['resume'])
+            except PlanMigration.DoesNotExist:
+                raise CommandError(f'Plan migration {options["resume"]} does not exist')
+            if migration.status == PlanMigration.Status.COMPLETED:
+                raise CommandError(f'Plan migration {migration.pk} already completed')
+        else:
+            if not options['source_plan'] or not options['target_plan']:
+                raise CommandError('Give the source and target plans, or --resume')
+            source = self.get_plan(options['source_plan'])
+            target = self.get_plan(options['target_plan'])
+            if source == target:
+                raise CommandError('Source and target plans must differ')
+            migration = PlanMigration(
+                source_plan=source,
+                target_plan=target,
+                effective_date=options['effective_date'] or date.today(),
+                prorate=not options['no_prorate'],
+                filters={
+                    name: str(options[name])
+                    for name in ('status', 'start_date_from', 'start_date_to')
+                    if options[name]
+                },
+            )
+
+        if options['dry_run']:
+            matching = candidates(migration)
+            self.stdout.write(
+                f'{matching.count()} subscriptions match, '
+                f'{matching.filter(conflicting(migration.target_plan_id)).count()} would be skipped '
+                'as overlapping the target plan'
+            )
+            return
+
+        migration.save()
+        self.run(migration, options['batch_size'])
+
+    def run(self, migration, batch_size):
+        self.stdout.write(
+            f'Migrating subscriptions from {migration.source_plan} to {migration.target_plan} '
+            f'(migration {migration.pk}) in batches of {batch_size}...'
+        )
+        started = time.perf_counter()
+
+        def progress(migration):
+            done = migration.migrated + migration.skipped
+            rate = done / max(time.perf_counter() - started, 1e-6)
+            self.stdout.write(
+                f'  {done}/{migration.total} processed, {migration.migrated} migrated, '
+                f'{migration.skipped} skipped ({rate:.0f} rows/s)'
+            )
+
+        run_migration(migration, batch_size, progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {migration.migrated} subscriptions migrated, {migration.skipped} skipped in {elapsed:.2f}s'
+        ))
+
+    def get_plan(self, value):
+        lookup = {'pk': int(value)} if value.isdigit() else {'name': value}
+        try:
+            return SubscriptionPlan.objects.get(**lookup)
+        except SubscriptionPlan.DoesNotExist:
+            raise CommandError(f'Subscription plan {value!r} does not exist')
@@ -0,0 +1,69 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from subscriptions.provisioning import provision_users
+from subscriptions.serializers import ProvisionUserSerializer
+
+
+class Command(BaseCommand):
+    help = 'Bulk provision users from a JSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='JSON array or CSV file with username, email, first_name, last_name and password or password_hash'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Users inserted per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--no-tokens',
+            action='store_true',
+            help='Do not create auth tokens; they are issued on first login instead'
+        )
+        parser.add_argument(
+            '--hasher-iterations',
+            type=int,
+            default=None,
+            help='Work factor for hashing raw passwords (default: PROVISIONING_HASHER_ITERATIONS)'
+        )
+
+    def handle(self, *args, **options):
+        rows = self.read_rows(options['path'])
+
+        serializer = ProvisionUserSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            invalid = {
+                index: row_errors
+                for index, row_errors in enumerate(serializer.errors)
+                if row_errors
+            }
+            raise CommandError(f'Invalid rows: {invalid}')
+
+        self.stdout.write(f'Provisioning {len(rows)} users in batches of {options["batch_size"]}...')
+        created, errors = provision_users(
+            serializer.validated_data,
+            issue_tokens=not options['no_tokens'],
+            batch_size=options['batch_size'],
+            hasher_iterations=options['hasher_iterations'],
+        )
+
+        for index, row_errors in sorted(errors.items()):
+            self.stdout.write(self.style.WARNING(f'  Skipped row {index}: {row_errors}'))
+        self.stdout.write(self.style.SUCCESS(f'✓ {created} users provisioned, {len(errors)} skipped'))
+
+    def read_rows(self, path):
+        try:
+            with open(path, newline='') as f:
+                if path.endswith('.csv'):
+                    return [
+                        {key: value for key, value in row.items() if value != ''}
+                        for row in csv.DictReader(f)
+                    ]
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Could not read {path}: {exc}')
@@ -0,0 +1,81 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from subscriptions import snapshot
+from subscriptions.analytics import dashboard_metrics
+
+
+class Command(BaseCommand):
+    help = 'Refresh the columnar analytics snapshot used by the dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Export all subscriptions from scratch instead of refreshing incrementally'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=100000,
+            help='Rows read from the database per query (default: 100000)'
+        )
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            default=0,
+            metavar='RUNS',
+            help='After refreshing, time the dashboard metrics from SQL and from the snapshot over RUNS runs'
+        )
+
+    def handle(self, *args, **options):
+        if snapshot.np is None:
+            raise CommandError('The analytics snapshot requires NumPy.')
+
+        store = snapshot.Snapshot()
+        started = time.perf_counter()
+        if options['rebuild']:
+            rows = store.rebuild(options['chunk_size'])
+            self.stdout.write(f'  Exported {rows} subscriptions')
+        else:
+            appended, updated = store.refresh(options['chunk_size'])
+            self.stdout.write(f'  Appended {appended} subscriptions, updated {updated}')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Snapshot of {store.read_meta()["row_count"]} rows refreshed in {elapsed:.2f}s'
+        ))
+
+        if options['benchmark']:
+            self.benchmark(store, options['benchmark'])
+
+    def benchmark(self, store, runs):
+        today = date.today()
+        paths = {
+            'sql': lambda: dashboard_metrics(today),
+            'snapshot': lambda: store.dashboard_metrics(today),
+        }
+        results = {}
+        for name, compute in paths.items():
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                results[name] = compute()
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f'{name:>8}: median {timings[len(timings) // 2]:.1f} ms, '
+                f'min {timings[0]:.1f} ms over {runs} runs'
+            )
+
+        sql, columnar = results['sql'], results['snapshot']
+        matches = (
+            abs(sql['total_recurring_revenue'] - columnar['total_recurring_revenue']) < 0.01
+            and abs(sql['average_subscription_cost'] - columnar['average_subscription_cost']) < 0.01
+            and [row['month'] for row in sql['monthly_revenue_history']]
+            == [row['month'] for row in columnar['monthly_revenue_history']]
+        )
+        if matches:
+            self.stdout.write(self.style.SUCCESS('✓ Snapshot metrics match SQL'))
+        else:
+            self.stdout.write(self.style.WARNING('Snapshot metrics differ from SQL; refresh and retry'))
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from subscriptions.reports import ReportWorker
+
+
+class Command(BaseCommand):
+    help = 'Run queued report jobs in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run until no jobs are queued or running, then exit'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds between polls for new jobs (default: 1.0)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.REPORT_WORKERS,
+            help=f'Jobs run in parallel (default: REPORT_WORKERS, {settings.REPORT_WORKERS})'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(
+            f'Starting report worker with {options["workers"]} processes...'
+        ))
+        with ReportWorker(workers=options['workers']) as worker:
+            while True:
+                stats = worker.run_once(timeout=options['interval'])
+                if any(stats.values()):
+                    self.stdout.write(
+                        f'  Started {stats["started"]}, completed {stats["completed"]}, '
+                        f'failed {stats["failed"]}, requeued {stats["requeued"]} jobs'
+                    )
+                if worker.idle and not stats['started']:
+                    if options['once']:
+                        break
+                    time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('✓ No report jobs left'))
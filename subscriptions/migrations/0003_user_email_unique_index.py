@@ -0,0 +1,48 @@
+# Generated by Django 5.2.10 on 2026-10-19 09:00
+
+from django.db import migrations
+from django.db.models import Count
+
+
+# Duplicate emails listed by check_duplicate_emails before the rest are counted.
+REPORTED_DUPLICATES = 20
+
+
+def check_duplicate_emails(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias)
+        .exclude(email='')
+        .values('email')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .order_by('email')
+        .values_list('email', 'count')
+    )
+    if duplicates:
+        listed = [f'{email} ({count} users)' for email, count in duplicates[:REPORTED_DUPLICATES]]
+        if len(duplicates) > REPORTED_DUPLICATES:
+            listed.append(f'... {len(duplicates) - REPORTED_DUPLICATES} more')
+        raise RuntimeError(
+            'Emails are shared by several users; change or clear them so that each non-empty email '
+            'belongs to one user, then migrate again:\n  ' + '\n  '.join(listed)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("subscriptions", "0002_remove_usersubscription_is_active_feature_is_active_and_more"),
+    ]
+
+    operations = [
+        # Fails with a report instead of a bare unique violation.
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        # auth.User has no unique constraint on email; enforce it with a
+        # partial index so accounts without an email remain allowed.
+        migrations.RunSQL(
+            sql="CREATE UNIQUE INDEX auth_user_email_uniq ON auth_user (email) WHERE email <> '';",
+            reverse_sql="DROP INDEX auth_user_email_uniq;",
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.10 on 2026-10-19 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0003_user_email_unique_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subscription_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField()),
+                ('event_type', models.CharField(choices=[('created', 'Created'), ('status_changed', 'Status Changed'), ('plan_changed', 'Plan Changed'), ('cancelled', 'Cancelled'), ('deleted', 'Deleted')], max_length=20)),
+                ('plan_id', models.BigIntegerField()),
+                ('previous_plan_id', models.BigIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('cancelled', 'Cancelled'), ('suspended', 'Suspended')], max_length=20)),
+                ('previous_status', models.CharField(blank=True, choices=[('active', 'Active'), ('cancelled', 'Cancelled'), ('suspended', 'Suspended')], max_length=20)),
+                ('plan_cost', models.FloatField()),
+                ('occurred_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['subscription_id', 'id'], name='subscription_event_sub_idx')],
+            },
+        ),
+    ]
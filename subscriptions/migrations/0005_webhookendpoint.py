@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-19 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0004_subscriptionevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEndpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('url', models.URLField(max_length=500)),
+                ('secret', models.CharField(blank=True, help_text='Used to sign payloads with HMAC-SHA256.', max_length=255)),
+                ('event_types', models.JSONField(blank=True, default=list, help_text='Event types to deliver; empty means all.')),
+                ('max_concurrency', models.PositiveSmallIntegerField(default=2, help_text='Maximum batches in flight to this endpoint.')),
+                ('is_active', models.BooleanField(default=True)),
+                ('last_event_id', models.BigIntegerField(blank=True, null=True)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.10 on 2026-10-19 06:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0005_webhookendpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedUserRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField(unique=True)),
+                ('subscription_count', models.PositiveIntegerField(default=0)),
+                ('total_cost', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='subscriptionevent',
+            name='event_type',
+            field=models.CharField(choices=[('created', 'Created'), ('status_changed', 'Status Changed'), ('plan_changed', 'Plan Changed'), ('cancelled', 'Cancelled'), ('deleted', 'Deleted'), ('archived', 'Archived')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ArchivedRevenueRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('status', models.CharField(choices=[('active', 'Active'), ('cancelled', 'Cancelled'), ('suspended', 'Suspended')], max_length=20)),
+                ('subscription_count', models.PositiveIntegerField(default=0)),
+                ('total_cost', models.FloatField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('start_date', 'status'), name='archived_rollup_date_status_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedUserSubscription',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('plan_cost', models.FloatField()),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('cancelled', 'Cancelled'), ('suspended', 'Suspended')], max_length=20)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('plan', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='archived_subscriptions', to='subscriptions.subscriptionplan')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='archived_subscriptions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-19 06:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0006_archived_subscriptions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(fields=['start_date'], name='usersub_start_date_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.10 on 2026-10-19 06:54
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill(apps, schema_editor):
+    UserSubscription = apps.get_model('subscriptions', 'UserSubscription')
+    ArchivedRevenueRollup = apps.get_model('subscriptions', 'ArchivedRevenueRollup')
+    MonthlyRevenue = apps.get_model('subscriptions', 'MonthlyRevenue')
+    db = schema_editor.connection.alias
+
+    totals = defaultdict(lambda: [0, 0.0])
+    sources = (
+        UserSubscription.objects.using(db).annotate(month=TruncMonth('start_date'))
+        .values('month').annotate(count=Count('id'), revenue=Sum('plan_cost')),
+        ArchivedRevenueRollup.objects.using(db).annotate(month=TruncMonth('start_date'))
+        .values('month').annotate(count=Sum('subscription_count'), revenue=Sum('total_cost')),
+    )
+    for rows in sources:
+        for row in rows.order_by():
+            totals[row['month']][0] += row['count']
+            totals[row['month']][1] += row['revenue']
+    MonthlyRevenue.objects.using(db).bulk_create([
+        MonthlyRevenue(month=month, subscription_count=count, total_revenue=revenue)
+        for month, (count, revenue) in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0007_usersubscription_start_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('subscription_count', models.IntegerField(default=0)),
+                ('total_revenue', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['month'],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
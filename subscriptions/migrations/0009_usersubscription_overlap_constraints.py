@@ -0,0 +1,137 @@
+# Generated by Django 5.2.10 on 2026-10-19 06:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Self-contained: the checks and SQL below must not change with app code.
+
+EXCLUSION_CONSTRAINT = 'usersub_active_no_overlap'
+
+# Offending rows listed before the rest are only counted.
+REPORTED_PROBLEMS = 20
+
+
+def overlapping_rows(UserSubscription):
+    """
+    Yield ``(user_id, plan_id, id, other_id)`` for active subscriptions
+    overlapping an earlier-starting one of the same user and plan, in one
+    pass ordered by (user, plan, start_date).
+    """
+    rows = (
+        UserSubscription.objects
+        .filter(status='active')
+        .order_by('user_id', 'plan_id', 'start_date', 'id')
+        .values_list('user_id', 'plan_id', 'id', 'start_date', 'end_date')
+        .iterator(chunk_size=10000)
+    )
+    group = reach = None
+    for user_id, plan_id, subscription_id, start_date, end_date in rows:
+        if (user_id, plan_id) != group:
+            group = (user_id, plan_id)
+            reach = (subscription_id, end_date)
+            continue
+        reach_id, reach_end = reach
+        if reach_end is None or start_date <= reach_end:
+            yield user_id, plan_id, subscription_id, reach_id
+        if reach_end is not None and (end_date is None or end_date > reach_end):
+            reach = (subscription_id, end_date)
+
+
+def check_existing_rows(apps, schema_editor):
+    UserSubscription = apps.get_model('subscriptions', 'UserSubscription')
+    problems = []
+    reversed_ids = list(
+        UserSubscription.objects.filter(end_date__lt=models.F('start_date'))
+        .values_list('id', flat=True)[:REPORTED_PROBLEMS]
+    )
+    if reversed_ids:
+        problems.append(f'Subscriptions ending before they start: {", ".join(map(str, reversed_ids))}')
+    found = 0
+    for user_id, plan_id, subscription_id, other_id in overlapping_rows(UserSubscription):
+        found += 1
+        if found <= REPORTED_PROBLEMS:
+            problems.append(f'Subscription {subscription_id} overlaps {other_id} for user {user_id}, plan {plan_id}')
+    if found > REPORTED_PROBLEMS:
+        problems.append(f'... {found - REPORTED_PROBLEMS} more overlapping subscriptions')
+    if problems:
+        raise RuntimeError(
+            'Existing subscriptions violate the constraints being added; resolve them '
+            '(`manage.py audit_subscription_overlaps --cancel` cancels the later of '
+            'overlapping subscriptions) and migrate again:\n  ' + '\n  '.join(problems)
+        )
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    """
+    PostgreSQL only, and not on a partitioned table, which cannot carry it.
+    btree_gist is a trusted extension: a superuser or, from PostgreSQL 13, a
+    role with CREATE on the database can add it. Other roles get
+    instructions instead of a permission error.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('subscriptions', 'UserSubscription')._meta.db_table
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relkind FROM pg_class c '
+            'WHERE c.relname = %s AND c.relnamespace = to_regnamespace(current_schema())',
+            [table],
+        )
+        if cursor.fetchone() == ('p',):
+            return
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'btree_gist'")
+        if cursor.fetchone() is None:
+            cursor.execute(
+                "SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist' AND ("
+                "  (SELECT rolsuper FROM pg_roles WHERE rolname = current_user)"
+                "  OR has_database_privilege(current_database(), 'CREATE')"
+                ")"
+            )
+            if cursor.fetchone() is None:
+                raise RuntimeError(
+                    'The overlap constraint needs the btree_gist extension, which this database role '
+                    'cannot create. Have a superuser run `CREATE EXTENSION IF NOT EXISTS btree_gist;` '
+                    'in this database, then migrate again.'
+                )
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        cursor.execute(
+            f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(EXCLUSION_CONSTRAINT)} '
+            "EXCLUDE USING gist (user_id WITH =, plan_id WITH =, "
+            "daterange(start_date, end_date, '[]') WITH &&) "
+            "WHERE (status = 'active')"
+        )
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('subscriptions', 'UserSubscription')._meta.db_table
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {quote(table)} DROP CONSTRAINT IF EXISTS {quote(EXCLUSION_CONSTRAINT)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0008_monthly_revenue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Fails with a report instead of a bare constraint violation.
+        migrations.RunPython(check_existing_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='usersubscription',
+            constraint=models.CheckConstraint(condition=models.Q(('end_date__isnull', True), ('end_date__gte', models.F('start_date')), _connector='OR'), name='usersub_end_after_start'),
+        ),
+        migrations.AddConstraint(
+            model_name='usersubscription',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'active')), fields=('user', 'plan', 'start_date'), name='usersub_active_unique_start'),
+        ),
+        # PostgreSQL only (and not on partitioned tables); a no-op elsewhere.
+        migrations.RunPython(add_exclusion_constraint, drop_exclusion_constraint),
+    ]
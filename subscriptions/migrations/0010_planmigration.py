@@ -0,0 +1,37 @@
+# Generated by Django 5.2.10 on 2026-10-19 06:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0009_usersubscription_overlap_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanMigration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('effective_date', models.DateField()),
+                ('prorate', models.BooleanField(default=True)),
+                ('filters', models.JSONField(blank=True, default=dict, help_text='Optional status, start_date_from and start_date_to.')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total', models.PositiveIntegerField(blank=True, null=True)),
+                ('migrated', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0, help_text='Active rows left on the source plan because they would overlap an active subscription to the target plan.')),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('source_plan', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='migrations_from', to='subscriptions.subscriptionplan')),
+                ('target_plan', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='migrations_to', to='subscriptions.subscriptionplan')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
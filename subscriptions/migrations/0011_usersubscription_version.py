@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0010_planmigration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersubscription',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Incremented on every write; exposed as the ETag for optimistic locking.'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0011_usersubscription_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfilingTrigger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('path_prefix', models.CharField(help_text='e.g. /api/analytics/', max_length=255)),
+                ('method', models.CharField(blank=True, help_text='Empty matches any method.', max_length=10)),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile'), ('sample', 'Stack sampling')], default='cprofile', max_length=20)),
+                ('remaining', models.PositiveIntegerField(default=1)),
+                ('sample_rate', models.FloatField(default=1.0)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=1000)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('trigger', models.CharField(choices=[('header', 'Header'), ('admin', 'Admin trigger'), ('sample', 'Sampled')], max_length=20)),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile'), ('sample', 'Stack sampling')], max_length=20)),
+                ('duration_ms', models.FloatField()),
+                ('query_count', models.PositiveIntegerField()),
+                ('sql_time_ms', models.FloatField()),
+                ('artefact', models.CharField(help_text='Zip file name in PROFILING_DIR.', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
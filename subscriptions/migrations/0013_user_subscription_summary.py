@@ -0,0 +1,66 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:07
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+
+
+def backfill(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    UserSubscription = apps.get_model('subscriptions', 'UserSubscription')
+    ArchivedUserRevenue = apps.get_model('subscriptions', 'ArchivedUserRevenue')
+    UserSubscriptionSummary = apps.get_model('subscriptions', 'UserSubscriptionSummary')
+    db = schema_editor.connection.alias
+
+    active = Q(status='active')
+    totals = defaultdict(lambda: [0, 0.0, None])
+    live = (
+        UserSubscription.objects.using(db).values('user_id')
+        .annotate(
+            active_count=Count('id', filter=active),
+            total_spend=Sum('plan_cost'),
+            next_expiry=Min('end_date', filter=active & Q(end_date__gte=timezone.localdate())),
+        )
+        .order_by()
+    )
+    for row in live:
+        totals[row['user_id']] = [row['active_count'], row['total_spend'], row['next_expiry']]
+    archived = ArchivedUserRevenue.objects.using(db).filter(
+        user_id__in=User.objects.using(db).values('id')
+    )
+    for user_id, total_cost in archived.values_list('user_id', 'total_cost'):
+        totals[user_id][1] += total_cost
+    UserSubscriptionSummary.objects.using(db).bulk_create(
+        [
+            UserSubscriptionSummary(
+                user_id=user_id, active_count=active_count, total_spend=total_spend, next_expiry=next_expiry
+            )
+            for user_id, (active_count, total_spend, next_expiry) in totals.items()
+        ],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('subscriptions', '0012_profiling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSubscriptionSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='subscription_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_count', models.IntegerField(default=0)),
+                ('total_spend', models.FloatField(default=0)),
+                ('next_expiry', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:11
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def recount_active(apps, schema_editor):
+    # Summaries now count only subscriptions that have not ended.
+    UserSubscription = apps.get_model('subscriptions', 'UserSubscription')
+    UserSubscriptionSummary = apps.get_model('subscriptions', 'UserSubscriptionSummary')
+    db = schema_editor.connection.alias
+
+    active = (
+        UserSubscription.objects.using(db)
+        .filter(user_id=OuterRef('user_id'), status='active')
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=timezone.localdate()))
+        .order_by()
+        .values('user_id')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    UserSubscriptionSummary.objects.using(db).update(active_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0013_user_subscription_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersubscription',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('end_date', django.db.models.expressions.RawSQL("'9999-12-31'", (), output_field=models.DateField())), models.F('plan_cost'), condition=models.Q(('status', 'active')), name='usersub_eff_active_idx'),
+        ),
+        migrations.RunPython(recount_active, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:39
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0015_report_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscriptionevent',
+            name='changes',
+            field=models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.AlterField(
+            model_name='subscriptionevent',
+            name='event_type',
+            field=models.CharField(choices=[('created', 'Created'), ('status_changed', 'Status Changed'), ('plan_changed', 'Plan Changed'), ('updated', 'Updated'), ('cancelled', 'Cancelled'), ('deleted', 'Deleted'), ('archived', 'Archived')], max_length=20),
+        ),
+    ]
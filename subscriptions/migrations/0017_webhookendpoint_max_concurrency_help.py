@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0016_subscriptionevent_changes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='webhookendpoint',
+            name='max_concurrency',
+            field=models.PositiveSmallIntegerField(default=2, help_text='Maximum batches in flight to this endpoint; 1 delivers batches in order.'),
+        ),
+    ]
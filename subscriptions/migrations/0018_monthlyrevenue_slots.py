@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-19 07:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subscriptions', '0017_webhookendpoint_max_concurrency_help'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='monthlyrevenue',
+            options={'ordering': ['month', 'slot']},
+        ),
+        migrations.AddField(
+            model_name='monthlyrevenue',
+            name='slot',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='monthlyrevenue',
+            name='month',
+            field=models.DateField(),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyrevenue',
+            constraint=models.UniqueConstraint(fields=('month', 'slot'), name='monthlyrevenue_month_slot_uniq'),
+        ),
+    ]
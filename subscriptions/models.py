@@ -1,6 +1,19 @@
-from django.db import models
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .caching import tiered_cache
+
 
 class TimeStamped(models.Model):
     """Abstract base model with timestamp fields."""
@@ -49,6 +62,172 @@ class SubscriptionPlan(TimeStamped):
         return f"{self.name} - ${self.price}/{self.billing_cycle}"
 
 
+# Fields whose changes are recorded in the subscription event log, the
+# monthly revenue series and the per-user summaries.
+TRACKED_SUBSCRIPTION_FIELDS = (
+    'id', 'user_id', 'plan_id', 'plan_cost', 'start_date', 'end_date', 'status'
+)
+
+# Tracked fields whose changes are logged as ``updated`` events; plan and
+# status changes have events of their own.
+UPDATED_EVENT_FIELDS = ('user_id', 'plan_cost', 'start_date', 'end_date')
+
+# Maximum number of ids per IN (...) lookup when re-reading bulk updates.
+EVENT_LOOKUP_CHUNK_SIZE = 900
+
+
+class UserSubscriptionQuerySet(models.QuerySet):
+    """
+    QuerySet that records subscription events, monthly revenue and user
+    summaries for bulk writes in the same transaction as the write itself.
+    Like Model.save(), writes join the caller's transaction without a
+    savepoint: an error rolls back the whole of it.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            # Rows skipped by ignore_conflicts (or backends that cannot
+            # return ids) have no pk and are not recorded.
+            _record_changes({}, {
+                obj.pk: _tracked_values(obj) for obj in objs if obj.pk is not None
+            }, using=self.db)
+        return objs
+
+    def update(self, **kwargs):
+        # Every write bumps the optimistic locking version.
+        kwargs.setdefault('version', models.F('version') + 1)
+        # bulk_update() is implemented on top of update(), so this also
+        # covers it.
+        if not _touches_tracked_fields(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            before = {
+                row['id']: row
+                for row in self.select_for_update().values(*TRACKED_SUBSCRIPTION_FIELDS)
+            }
+            rows = super().update(**kwargs)
+            after = _updated_values(self.model, before, kwargs)
+            if after is None:
+                after = _snapshot(self.model._base_manager.using(self.db), list(before))
+            _record_changes(before, after, using=self.db)
+        return rows
+
+    update.alters_data = True
+
+    def effectively_active(self, today=None):
+        """Subscriptions that are active and have not ended by ``today``."""
+        return self.filter(effectively_active(today or timezone.localdate()))
+
+    def overlapping(self, user_id, plan_id, start_date, end_date):
+        """
+        Active subscriptions of the user to the plan whose inclusive
+        ``[start_date, end_date]`` range overlaps the given one. A missing
+        end date means open-ended.
+        """
+        queryset = self.filter(
+            user_id=user_id, plan_id=plan_id, status=self.model.Status.ACTIVE
+        ).filter(models.Q(end_date__isnull=True) | models.Q(end_date__gte=start_date))
+        if end_date is not None:
+            queryset = queryset.filter(start_date__lte=end_date)
+        return queryset
+
+    def including_archived(self, *fields, **filters):
+        """
+        Return ``values()`` rows matching ``filters`` from this queryset and
+        from the archive, with an extra ``archived`` flag.
+
+        Archived rows are only read when explicitly requested through this
+        method. ``fields`` and ``filters`` must exist on both models.
+        """
+        fields = fields or ARCHIVED_SUBSCRIPTION_FIELDS
+        live = (
+            self.filter(**filters)
+            .annotate(archived=models.Value(False))
+            .values(*fields, 'archived')
+        )
+        archived = (
+            ArchivedUserSubscription.objects.filter(**filters)
+            .annotate(archived=models.Value(True))
+            .values(*fields, 'archived')
+        )
+        return live.order_by().union(archived.order_by(), all=True)
+
+
+def effective_end():
+    """The end date with open-ended subscriptions ending on ``date.max``."""
+    # A literal rather than a parameter: SQLite only matches expression
+    # indexes whose text is identical to the query's.
+    return Coalesce(
+        'end_date',
+        models.expressions.RawSQL(f"'{date.max.isoformat()}'", (), output_field=models.DateField()),
+    )
+
+
+def effectively_active(today):
+    """
+    Condition for subscriptions that are active and have not ended by
+    ``today``. The end date check is one range comparison on
+    ``effective_end()`` rather than ``end_date IS NULL OR end_date >= today``,
+    so it can use the ``usersub_eff_active_idx`` partial index.
+    """
+    return models.Q(status='active') & models.Q(GreaterThanOrEqual(effective_end(), today))
+
+
+def _touches_tracked_fields(fields):
+    return any(
+        field in (
+            'user', 'user_id', 'plan', 'plan_id', 'plan_cost', 'start_date', 'end_date', 'status'
+        )
+        for field in fields
+    )
+
+
+def _tracked_values(obj):
+    return {field: getattr(obj, field) for field in TRACKED_SUBSCRIPTION_FIELDS}
+
+
+def _updated_values(model, before, kwargs):
+    """
+    Tracked values of the locked ``before`` rows once ``kwargs`` are
+    applied, or ``None`` if a tracked field is set to an expression and has
+    to be read back.
+    """
+    assigned = {}
+    for name, value in kwargs.items():
+        field = model._meta.get_field(name)
+        if field.attname not in TRACKED_SUBSCRIPTION_FIELDS:
+            continue
+        if hasattr(value, 'resolve_expression'):
+            return None
+        if isinstance(value, models.Model):
+            value = value.pk
+        # As read back from the database, e.g. dates given as strings.
+        target = field.target_field if field.is_relation else field
+        assigned[field.attname] = target.to_python(value)
+    return {pk: {**row, **assigned} for pk, row in before.items()}
+
+
+def _snapshot(queryset, ids):
+    snapshot = {}
+    for i in range(0, len(ids), EVENT_LOOKUP_CHUNK_SIZE):
+        chunk = ids[i:i + EVENT_LOOKUP_CHUNK_SIZE]
+        for row in queryset.filter(pk__in=chunk).values(*TRACKED_SUBSCRIPTION_FIELDS):
+            snapshot[row['id']] = row
+    return snapshot
+
+
+def _record_changes(before, after, using=None):
+    """Log events, revenue and summary changes for rows in ``after``; new rows have no ``before``."""
+    events = []
+    for pk, new in after.items():
+        events.extend(SubscriptionEvent.for_change(before.get(pk), new))
+    SubscriptionEvent.objects.using(using).bulk_create(events)
+    changes = [(before.get(pk), new) for pk, new in after.items()]
+    MonthlyRevenue.apply_changes(changes, using=using)
+    UserSubscriptionSummary.apply_changes(changes, using=using)
+
+
 class UserSubscription(TimeStamped):
     """User subscription model linking users to subscription plans."""
 
@@ -75,6 +254,742 @@ class UserSubscription(TimeStamped):
         choices=Status.choices,
         default=Status.ACTIVE
     )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        help_text="Incremented on every write; exposed as the ETag for optimistic locking."
+    )
+
+    objects = UserSubscriptionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Date range filters in analytics and the admin changelist.
+            models.Index(fields=['start_date'], name='usersub_start_date_idx'),
+            # Effectively active subscriptions (see effectively_active()),
+            # with plan_cost so revenue sums can be index-only scans.
+            models.Index(
+                effective_end(),
+                'plan_cost',
+                condition=models.Q(status='active'),
+                name='usersub_eff_active_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(end_date__isnull=True)
+                    | models.Q(end_date__gte=models.F('start_date'))
+                ),
+                name='usersub_end_after_start',
+            ),
+            # Exact duplicates; also the index the overlap audit scans.
+            # Overlapping ranges are excluded by a PostgreSQL-only exclusion
+            # constraint (see subscriptions.overlaps) and by clean().
+            models.UniqueConstraint(
+                fields=['user', 'plan', 'start_date'],
+                condition=models.Q(status='active'),
+                name='usersub_active_unique_start',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.plan.name} - {self.status}"
+
+    def clean(self):
+        super().clean()
+        if self.status != self.Status.ACTIVE or None in (self.user_id, self.plan_id, self.start_date):
+            return
+        if self.end_date is not None and self.end_date < self.start_date:
+            return  # Reported by the check constraint validation.
+        overlapping = type(self).objects.overlapping(
+            self.user_id, self.plan_id, self.start_date, self.end_date
+        ).exclude(pk=self.pk)
+        if overlapping.exists():
+            raise ValidationError(
+                'The user already has an active subscription to this plan in this period.'
+            )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            field: getattr(instance, field)
+            for field in TRACKED_SUBSCRIPTION_FIELDS
+            if field in instance.__dict__
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Record the change event in the same transaction as the row write,
+        # without a savepoint, like QuerySet writes.
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            previous = None
+            if not self._state.adding:
+                previous = getattr(self, '_loaded_values', None)
+                # Instances loaded with deferred fields lack some values.
+                if previous is None or len(previous) < len(TRACKED_SUBSCRIPTION_FIELDS):
+                    previous = _snapshot(
+                        type(self)._base_manager.using(using), [self.pk]
+                    ).get(self.pk)
+            updating = not self._state.adding
+            if updating:
+                # Incremented in SQL so concurrent saves never reuse a version.
+                self.version = models.F('version') + 1
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+            super().save(*args, **kwargs)
+            if updating:
+                self.refresh_from_db(using=using, fields=['version'])
+            current = _tracked_values(self)
+            SubscriptionEvent.objects.using(using).bulk_create(
+                SubscriptionEvent.for_change(previous, current)
+            )
+            MonthlyRevenue.apply_changes([(previous, current)], using=using)
+            UserSubscriptionSummary.apply_changes([(previous, current)], using=using)
+        self._loaded_values = current
+
+
+# Columns kept for archived subscriptions.
+ARCHIVED_SUBSCRIPTION_FIELDS = (
+    'id', 'user_id', 'plan_id', 'plan_cost', 'start_date', 'end_date', 'status'
+)
+
+
+class ArchivedUserSubscription(models.Model):
+    """
+    Compact cold copy of ended subscriptions moved out of UserSubscription.
+
+    Keeps the original id; relations are not enforced by the database so
+    archiving and deleting users stay cheap.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="archived_subscriptions"
+    )
+    plan = models.ForeignKey(
+        SubscriptionPlan,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="archived_subscriptions"
+    )
+    plan_cost = models.FloatField()
+    start_date = models.DateField()
+    end_date = models.DateField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=UserSubscription.Status.choices)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived subscription {self.pk} - {self.status}"
+
+
+class ArchivedRevenueRollup(models.Model):
+    """Archived subscription totals per start date and status."""
+
+    start_date = models.DateField()
+    status = models.CharField(max_length=20, choices=UserSubscription.Status.choices)
+    subscription_count = models.PositiveIntegerField(default=0)
+    total_cost = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['start_date', 'status'],
+                name='archived_rollup_date_status_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.start_date} {self.status}: {self.total_cost}"
+
+
+class ArchivedUserRevenue(models.Model):
+    """Archived subscription totals per user."""
+
+    user_id = models.BigIntegerField(unique=True)
+    subscription_count = models.PositiveIntegerField(default=0)
+    total_cost = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"User {self.user_id}: {self.total_cost}"
+
+
+class MonthlyRevenue(models.Model):
+    """
+    Revenue of subscriptions by the month they started in.
+
+    Maintained incrementally in the same transaction as subscription writes;
+    archived subscriptions stay counted. Months without subscriptions have
+    no row.
+
+    Each month is split over up to MONTHLY_REVENUE_SLOTS rows and a write
+    adds to one picked at random, so concurrent writes to the current month
+    rarely wait on the same row lock. Readers sum the slots of a month.
+    """
+
+    month = models.DateField()
+    slot = models.PositiveSmallIntegerField(default=0)
+    subscription_count = models.IntegerField(default=0)
+    total_revenue = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['month', 'slot']
+        constraints = [
+            # Also the index of month range reads.
+            models.UniqueConstraint(fields=['month', 'slot'], name='monthlyrevenue_month_slot_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} #{self.slot}: {self.total_revenue}"
+
+    @classmethod
+    def apply_changes(cls, changes, using=None):
+        """
+        Apply ``(old, new)`` pairs of tracked subscription values, either of
+        which is ``None`` for created and deleted rows.
+        """
+        deltas = defaultdict(lambda: [0, 0.0])
+        for old, new in changes:
+            for values, sign in ((old, -1), (new, 1)):
+                if values is None:
+                    continue
+                totals = deltas[month_start(values['start_date'])]
+                totals[0] += sign
+                totals[1] += sign * values['plan_cost']
+
+        deltas = {month: totals for month, totals in deltas.items() if totals[0] or totals[1]}
+        # One slot for the whole write.
+        slot = random.randrange(settings.MONTHLY_REVENUE_SLOTS)
+        months = sorted(deltas)
+        for i in range(0, len(months), DELTA_UPDATE_CHUNK_SIZE):
+            chunk = months[i:i + DELTA_UPDATE_CHUNK_SIZE]
+            _add_deltas(
+                cls.objects.using(using), 'month',
+                {
+                    'subscription_count': {month: deltas[month][0] for month in chunk},
+                    'total_revenue': {month: deltas[month][1] for month in chunk},
+                },
+                creatable=chunk,
+                slot=slot,
+            )
+
+
+# Rows per statement when adding deltas to, or recomputing, rollup rows.
+DELTA_UPDATE_CHUNK_SIZE = 200
+
+
+class UserSubscriptionSummary(models.Model):
+    """
+    Subscription totals of a user, for client dashboards.
+
+    Maintained in the same transaction as subscription writes, like
+    MonthlyRevenue. ``total_spend`` keeps archived subscriptions counted.
+    ``active_count`` counts effectively active subscriptions (see
+    ``effectively_active()``) and ``next_expiry`` is the earliest of their
+    end dates. Open-ended subscriptions are counted incrementally; users
+    whose write touches an active subscription with an end date are
+    recomputed, and so are summaries read after ``next_expiry`` has passed.
+    Users who never subscribed have no row.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="subscription_summary"
+    )
+    active_count = models.IntegerField(default=0)
+    total_spend = models.FloatField(default=0)
+    next_expiry = models.DateField(blank=True, null=True)
+
+    def __str__(self):
+        return f"User {self.user_id}: {self.active_count} active, {self.total_spend} spent"
+
+    @classmethod
+    def apply_changes(cls, changes, using=None, archived=False):
+        """
+        Apply ``(old, new)`` pairs of tracked subscription values, either of
+        which is ``None`` for created and deleted rows. Rows removed by
+        archiving pass ``archived`` so their spend stays counted.
+        """
+        deltas = defaultdict(lambda: [0, 0.0])
+        added = set()
+        expiring = set()
+        for old, new in changes:
+            for values, sign in ((old, -1), (new, 1)):
+                if values is None:
+                    continue
+                totals = deltas[values['user_id']]
+                if values['status'] == UserSubscription.Status.ACTIVE:
+                    # Whether a dated subscription is still active depends on
+                    # the day, so those users are recomputed instead.
+                    if values['end_date'] is None:
+                        totals[0] += sign
+                    else:
+                        expiring.add(values['user_id'])
+                if not archived:
+                    totals[1] += sign * values['plan_cost']
+            if new is not None:
+                added.add(new['user_id'])
+
+        deltas = {
+            user_id: totals for user_id, totals in deltas.items() if totals[0] or totals[1]
+        }
+        user_ids = sorted(deltas)
+        for i in range(0, len(user_ids), DELTA_UPDATE_CHUNK_SIZE):
+            chunk = user_ids[i:i + DELTA_UPDATE_CHUNK_SIZE]
+            # Rows are only created for users gaining subscriptions: a user
+            # being deleted may have lost theirs.
+            _add_deltas(
+                cls.objects.using(using), 'user_id',
+                {
+                    'active_count': {user_id: deltas[user_id][0] for user_id in chunk},
+                    'total_spend': {user_id: deltas[user_id][1] for user_id in chunk},
+                },
+                creatable=[user_id for user_id in chunk if user_id in added],
+            )
+        cls.refresh_expiring(expiring, using=using)
+        tiered_cache.invalidate_tags(
+            *{f'user:{values["user_id"]}' for change in changes for values in change if values is not None},
+            using=using,
+        )
+
+    @classmethod
+    def refresh_expiring(cls, user_ids, today=None, using=None):
+        """Recompute ``active_count`` and ``next_expiry`` of ``user_ids`` as of ``today``."""
+        active = (
+            UserSubscription.objects.using(using)
+            .effectively_active(today)
+            .filter(user_id=models.OuterRef('user_id'))
+            .order_by()
+        )
+        active_count = active.values('user_id').annotate(count=models.Count('id')).values('count')
+        next_expiry = active.filter(end_date__isnull=False).order_by('end_date').values('end_date')[:1]
+        user_ids = sorted(user_ids)
+        for i in range(0, len(user_ids), DELTA_UPDATE_CHUNK_SIZE):
+            cls.objects.using(using).filter(
+                user_id__in=user_ids[i:i + DELTA_UPDATE_CHUNK_SIZE]
+            ).update(
+                active_count=Coalesce(models.Subquery(active_count), 0),
+                next_expiry=models.Subquery(next_expiry),
+            )
+
+
+def _add_deltas(manager, key, deltas, creatable, **filters):
+    """
+    Add ``deltas`` (``{column: {key value: delta}}``) to the rows matching
+    ``filters`` and the key values, in one ``CASE`` update. Rows missing for
+    key values in ``creatable`` are created from ``filters`` first.
+
+    A single row is updated directly and only created if the update misses
+    it. Several are locked in key order first, so concurrent writers queue
+    instead of deadlocking.
+    """
+    keys = sorted({value for values in deltas.values() for value in values})
+    if not keys:
+        return
+    model = manager.model
+    rows = manager.filter(**filters, **{f'{key}__in': keys})
+    changed = {
+        column: models.F(column) + models.Case(
+            *(models.When(**{key: value}, then=models.Value(delta)) for value, delta in values.items()),
+            default=models.Value(0),
+            output_field=type(model._meta.get_field(column))(),
+        )
+        for column, values in deltas.items()
+    }
+
+    def create(missing):
+        manager.bulk_create(
+            [model(**filters, **{key: value}) for value in missing if value in creatable],
+            ignore_conflicts=True,
+        )
+
+    if len(keys) == 1:
+        if rows.update(**changed) or keys[0] not in creatable:
+            return
+        create(keys)
+    else:
+        existing = set(rows.order_by(key).select_for_update().values_list(key, flat=True))
+        create(value for value in keys if value not in existing)
+    rows.update(**changed)
+
+
+def month_start(day):
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day.replace(day=1)
+
+
+class SubscriptionEvent(models.Model):
+    """
+    Append-only change log of subscription mutations.
+
+    Events are written in the same transaction as the subscription change and
+    their auto-incrementing id is the cursor consumers resume from. Ids are
+    assigned on insert but become visible on commit, so consumers read
+    through ``read()``, which does not hand out events past an id that may
+    still be committed.
+    """
+
+    class EventType(models.TextChoices):
+        CREATED = 'created', 'Created'
+        STATUS_CHANGED = 'status_changed', 'Status Changed'
+        PLAN_CHANGED = 'plan_changed', 'Plan Changed'
+        UPDATED = 'updated', 'Updated'
+        CANCELLED = 'cancelled', 'Cancelled'
+        DELETED = 'deleted', 'Deleted'
+        ARCHIVED = 'archived', 'Archived'
+
+    # Plain ids rather than foreign keys so events outlive deleted rows.
+    subscription_id = models.BigIntegerField()
+    user_id = models.BigIntegerField()
+    event_type = models.CharField(max_length=20, choices=EventType.choices)
+    plan_id = models.BigIntegerField()
+    previous_plan_id = models.BigIntegerField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=UserSubscription.Status.choices)
+    previous_status = models.CharField(
+        max_length=20,
+        choices=UserSubscription.Status.choices,
+        blank=True
+    )
+    plan_cost = models.FloatField()
+    # ``{field: [old, new]}`` of an ``updated`` event.
+    changes = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    occurred_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['subscription_id', 'id'],
+                name='subscription_event_sub_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.event_type} subscription {self.subscription_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Subscription events are append-only.")
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def for_change(cls, old, new, deleted=False, archived=False):
+        """Build (unsaved) events describing the change from ``old`` to ``new``."""
+        common = {
+            'subscription_id': new['id'],
+            'user_id': new['user_id'],
+            'plan_id': new['plan_id'],
+            'status': new['status'],
+            'plan_cost': new['plan_cost'],
+        }
+        if archived:
+            return [cls(event_type=cls.EventType.ARCHIVED, **common)]
+        if deleted:
+            return [cls(event_type=cls.EventType.DELETED, **common)]
+        if old is None:
+            return [cls(event_type=cls.EventType.CREATED, **common)]
+
+        events = []
+        if 'plan_id' in old and old['plan_id'] != new['plan_id']:
+            events.append(cls(
+                event_type=cls.EventType.PLAN_CHANGED,
+                previous_plan_id=old['plan_id'],
+                **common
+            ))
+        if 'status' in old and old['status'] != new['status']:
+            if new['status'] == UserSubscription.Status.CANCELLED:
+                event_type = cls.EventType.CANCELLED
+            else:
+                event_type = cls.EventType.STATUS_CHANGED
+            events.append(cls(
+                event_type=event_type,
+                previous_status=old['status'],
+                **common
+            ))
+        changes = {
+            field: [old[field], new[field]]
+            for field in UPDATED_EVENT_FIELDS
+            if field in old and old[field] != new[field]
+        }
+        if changes:
+            events.append(cls(event_type=cls.EventType.UPDATED, changes=changes, **common))
+        return events
+
+    @classmethod
+    def read(cls, after, limit, using=None):
+        """
+        Up to ``limit`` events with an id above the cursor ``after``, oldest
+        first, and whether more are ready.
+
+        An id missing from the log may belong to a transaction that has not
+        committed yet, and a consumer that moved past it would never see it.
+        Events are handed out while their ids follow on from the cursor
+        without gaps; an event after a gap only once it is older than
+        SUBSCRIPTION_EVENT_SETTLE_SECONDS, after which the gap is taken to be
+        a rolled back write.
+        """
+        events = list(cls.objects.using(using).filter(id__gt=after).order_by('id')[:limit + 1])
+        settled_before = timezone.now() - timedelta(seconds=settings.SUBSCRIPTION_EVENT_SETTLE_SECONDS)
+        previous = after
+        for index, event in enumerate(events[:limit]):
+            if event.id != previous + 1 and event.occurred_at > settled_before:
+                return events[:index], False
+            previous = event.id
+        return events[:limit], len(events) > limit
+
+    @classmethod
+    def watermark(cls, using=None):
+        """
+        The highest id up to which ``read()`` hands out every event: a cursor
+        to start reading from that skips nothing still to be committed.
+        """
+        settled_before = timezone.now() - timedelta(seconds=settings.SUBSCRIPTION_EVENT_SETTLE_SECONDS)
+        # Only the few recent events are scanned, newest first.
+        cursor = (
+            cls.objects.using(using)
+            .filter(occurred_at__lte=settled_before)
+            .order_by('-id')
+            .values_list('id', flat=True)
+            .first()
+        ) or 0
+        while True:
+            events, more = cls.read(cursor, 1000, using=using)
+            if events:
+                cursor = events[-1].id
+            if not more:
+                return cursor
+
+
+class WebhookEndpoint(TimeStamped):
+    """
+    Receiver of subscription events.
+
+    The subscription event log acts as the outbox: each endpoint keeps its
+    own cursor (``last_event_id``) into it, advanced only after a batch has
+    been acknowledged, so delivery is at-least-once. With ``max_concurrency``
+    above 1 several batches are in flight at once and may arrive out of
+    order; receivers order events by ``id``.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    url = models.URLField(max_length=500)
+    secret = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Used to sign payloads with HMAC-SHA256."
+    )
+    event_types = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Event types to deliver; empty means all."
+    )
+    max_concurrency = models.PositiveSmallIntegerField(
+        default=2,
+        help_text="Maximum batches in flight to this endpoint; 1 delivers batches in order."
+    )
+    is_active = models.BooleanField(default=True)
+    last_event_id = models.BigIntegerField(blank=True, null=True)
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if self.last_event_id is None:
+            # New endpoints start from the current end of the log rather
+            # than replaying the whole history; the watermark stops before
+            # events whose transactions may still commit.
+            self.last_event_id = SubscriptionEvent.watermark()
+        super().save(*args, **kwargs)
+
+
+class PlanMigration(TimeStamped):
+    """
+    Move of subscriptions from one plan to another, with progress.
+
+    Rows are migrated in id order and ``last_id`` is checkpointed after each
+    chunk, so an interrupted migration resumes where it stopped.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    source_plan = models.ForeignKey(
+        SubscriptionPlan,
+        on_delete=models.PROTECT,
+        related_name="migrations_from"
+    )
+    target_plan = models.ForeignKey(
+        SubscriptionPlan,
+        on_delete=models.PROTECT,
+        related_name="migrations_to"
+    )
+    effective_date = models.DateField()
+    prorate = models.BooleanField(default=True)
+    filters = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Optional status, start_date_from and start_date_to."
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    total = models.PositiveIntegerField(blank=True, null=True)
+    migrated = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(
+        default=0,
+        help_text="Active rows left on the source plan because they would overlap "
+                  "an active subscription to the target plan."
+    )
+    last_id = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.source_plan} -> {self.target_plan} ({self.status})"
+
+
+class ProfilingTriggerQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_active=True, remaining__gt=0).filter(
+            models.Q(expires_at__isnull=True) | models.Q(expires_at__gt=timezone.now())
+        )
+
+
+class ProfilingTrigger(TimeStamped):
+    """
+    Admin request to profile the next ``remaining`` requests whose path
+    starts with ``path_prefix``, each picked with ``sample_rate``.
+    """
+
+    class Mode(models.TextChoices):
+        CPROFILE = 'cprofile', 'cProfile'
+        SAMPLE = 'sample', 'Stack sampling'
+
+    path_prefix = models.CharField(max_length=255, help_text="e.g. /api/analytics/")
+    method = models.CharField(max_length=10, blank=True, help_text="Empty matches any method.")
+    mode = models.CharField(max_length=20, choices=Mode.choices, default=Mode.CPROFILE)
+    remaining = models.PositiveIntegerField(default=1)
+    sample_rate = models.FloatField(default=1.0)
+    expires_at = models.DateTimeField(blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+
+    objects = ProfilingTriggerQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.method or '*'} {self.path_prefix} ({self.remaining} left)"
+
+    def matches(self, request):
+        return (
+            request.path.startswith(self.path_prefix)
+            and (not self.method or request.method == self.method.upper())
+        )
+
+
+class RequestProfile(models.Model):
+    """A profiled request and its downloadable artefact."""
+
+    class Trigger(models.TextChoices):
+        HEADER = 'header', 'Header'
+        ADMIN = 'admin', 'Admin trigger'
+        SAMPLE = 'sample', 'Sampled'
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=1000)
+    status_code = models.PositiveSmallIntegerField()
+    trigger = models.CharField(max_length=20, choices=Trigger.choices)
+    mode = models.CharField(max_length=20, choices=ProfilingTrigger.Mode.choices)
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    sql_time_ms = models.FloatField()
+    artefact = models.CharField(max_length=255, help_text="Zip file name in PROFILING_DIR.")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    @property
+    def artefact_path(self):
+        return Path(settings.PROFILING_DIR) / self.artefact
+
+    def delete(self, *args, **kwargs):
+        self.artefact_path.unlink(missing_ok=True)
+        return super().delete(*args, **kwargs)
+
+
+class ReportJob(TimeStamped):
+    """
+    A report queued for ``manage.py run_report_jobs``; the finished result is
+    a file in REPORTS_DIR, downloadable until it is pruned.
+
+    ``updated_at`` doubles as the heartbeat: the worker bumps it for the jobs
+    it is running, so a running job whose heartbeat stops was abandoned by a
+    killed worker and is queued again.
+    """
+
+    class Kind(models.TextChoices):
+        REVENUE_BREAKDOWN = 'revenue_breakdown', 'Revenue breakdown'
+        SUBSCRIPTIONS_EXPORT = 'subscriptions_export', 'Subscriptions export'
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        RUNNING = 'running', 'Running'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    kind = models.CharField(max_length=30, choices=Kind.choices)
+    params = models.JSONField(default=dict, blank=True)
+    # Kept when the user is deleted, so pruning still removes the result file.
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="report_jobs"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.QUEUED
+    )
+    progress = models.PositiveIntegerField(default=0, help_text="Rows processed so far.")
+    total = models.PositiveIntegerField(blank=True, null=True, help_text="Rows to process, once known.")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.CharField(max_length=255, blank=True, help_text="CSV file name in REPORTS_DIR.")
+    result_size = models.PositiveBigIntegerField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "id"], name="reportjob_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk} ({self.status})"
+
+    @property
+    def result_path(self):
+        return Path(settings.REPORTS_DIR) / self.result if self.result else None
+
+    def delete(self, *args, **kwargs):
+        if self.result:
+            self.result_path.unlink(missing_ok=True)
+        return super().delete(*args, **kwargs)
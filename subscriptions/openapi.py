@@ -0,0 +1,67 @@
+"""
+Pre-built OpenAPI schema.
+
+Generating the schema introspects every view and serializer, which makes
+the first ``/api/schema/`` hit after a deploy slow. ``manage.py
+build_openapi_schema`` renders it once at build time into YAML and JSON
+artefacts under OPENAPI_SCHEMA_DIR; the schema view serves those bytes and
+only generates the schema live when they are missing or disabled with
+OPENAPI_SCHEMA_CACHED. ``build_openapi_schema --check`` (and the test
+suite) fail when the artefacts no longer match the code.
+"""
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+
+RENDERERS = {
+    'yaml': OpenApiYamlRenderer,
+    'json': OpenApiJsonRenderer,
+}
+
+
+def artefact_path(fmt):
+    return Path(settings.OPENAPI_SCHEMA_DIR) / f'schema.{fmt}'
+
+
+def generate():
+    """Render the schema as ``{format: bytes}``, as the schema view would."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=spectacular_settings.SERVE_PUBLIC)
+    return {fmt: renderer().render(schema, renderer_context={}) for fmt, renderer in RENDERERS.items()}
+
+
+def write(rendered=None):
+    """Write the artefacts; return their paths."""
+    rendered = rendered or generate()
+    directory = Path(settings.OPENAPI_SCHEMA_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for fmt, content in rendered.items():
+        path = artefact_path(fmt)
+        path.write_bytes(content)
+        paths.append(path)
+    load.cache_clear()
+    return paths
+
+
+def stale(rendered=None):
+    """Artefact paths that are missing or differ from the generated schema."""
+    rendered = rendered or generate()
+    return [
+        artefact_path(fmt)
+        for fmt, content in rendered.items()
+        if not artefact_path(fmt).is_file() or artefact_path(fmt).read_bytes() != content
+    ]
+
+
+@lru_cache(maxsize=None)
+def load(fmt):
+    """The artefact bytes for ``fmt``, read once per process; ``None`` if missing."""
+    try:
+        return artefact_path(fmt).read_bytes()
+    except OSError:
+        return None
@@ -0,0 +1,99 @@
+"""
+Overlapping active subscriptions of a user to the same plan.
+
+On PostgreSQL an exclusion constraint rejects overlapping inclusive
+``[start_date, end_date]`` ranges of active subscriptions. It needs the
+btree_gist extension and cannot be created on a partitioned table, where it
+would have to include the partition key; there, as on SQLite, overlaps are
+only prevented by model and serializer validation, and
+``find_overlaps()`` audits existing rows. ``cancel_overlaps()`` resolves
+them. The constraints are added by migration 0009, which carries its own
+copy of the checks it runs first.
+"""
+from collections import namedtuple
+
+from .models import UserSubscription
+
+
+EXCLUSION_CONSTRAINT = 'usersub_active_no_overlap'
+
+# Constraints rejecting overlapping active subscriptions.
+OVERLAP_CONSTRAINTS = ('usersub_active_unique_start', EXCLUSION_CONSTRAINT)
+
+Overlap = namedtuple('Overlap', [
+    'user_id', 'plan_id',
+    'subscription_id', 'start_date', 'end_date',
+    'other_id', 'other_start_date', 'other_end_date',
+])
+
+
+def find_overlaps(chunk_size=10000, model=UserSubscription, keep_first=False):
+    """
+    Yield an ``Overlap`` for each active subscription that overlaps an
+    earlier-starting one of the same user and plan.
+
+    A single pass over active rows ordered by (user, plan, start_date), the
+    order of the ``usersub_active_unique_start`` index, keeping only the
+    row that reaches furthest so far in the current user and plan; each
+    overlapping row is reported once, against that row. With
+    ``keep_first`` reported rows are treated as gone and never become that
+    row, so the result is the rows to remove for the others not to overlap.
+
+    ``model`` may be a historical model, for use in migrations.
+    """
+    rows = (
+        model.objects
+        .filter(status=UserSubscription.Status.ACTIVE)
+        .order_by('user_id', 'plan_id', 'start_date', 'id')
+        .values_list('user_id', 'plan_id', 'id', 'start_date', 'end_date')
+        .iterator(chunk_size=chunk_size)
+    )
+    group = None
+    reach = None
+    for user_id, plan_id, subscription_id, start_date, end_date in rows:
+        if (user_id, plan_id) != group:
+            group = (user_id, plan_id)
+            reach = (subscription_id, start_date, end_date)
+            continue
+
+        reach_end = reach[2]
+        overlaps = reach_end is None or start_date <= reach_end
+        if overlaps:
+            yield Overlap(user_id, plan_id, subscription_id, start_date, end_date, *reach)
+            if keep_first:
+                continue
+        if reach_end is not None and (end_date is None or end_date > reach_end):
+            reach = (subscription_id, start_date, end_date)
+
+
+def cancel_overlaps(chunk_size=10000):
+    """
+    Cancel active subscriptions overlapping an earlier-starting one of the
+    same user and plan, keeping the earliest; return how many were
+    cancelled. The update is logged like any other status change.
+    """
+    ids = [overlap.subscription_id for overlap in find_overlaps(chunk_size, keep_first=True)]
+    for i in range(0, len(ids), chunk_size):
+        UserSubscription.objects.filter(pk__in=ids[i:i + chunk_size]).update(
+            status=UserSubscription.Status.CANCELLED
+        )
+    return len(ids)
+
+
+def is_overlap_violation(exc):
+    """
+    Whether an IntegrityError was raised by one of the overlap constraints,
+    rather than by some other constraint.
+    """
+    diag = getattr(exc.__cause__, 'diag', None)
+    name = getattr(diag, 'constraint_name', None)
+    if name:
+        return name in OVERLAP_CONSTRAINTS
+    # SQLite reports a violated unique index by its columns, not its name.
+    columns = ', '.join(
+        f'{UserSubscription._meta.db_table}.{column}' for column in ('user_id', 'plan_id', 'start_date')
+    )
+    message = str(exc)
+    return message == f'UNIQUE constraint failed: {columns}' or any(
+        name in message for name in OVERLAP_CONSTRAINTS
+    )
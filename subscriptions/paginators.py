@@ -0,0 +1,35 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the PostgreSQL planner's row estimate instead of an
+    exact ``COUNT(*)`` once a result set is known to be large.
+
+    Counts at or below ``exact_count_threshold`` (and every count on other
+    backends) stay exact, so small and filtered result sets paginate
+    precisely while the unfiltered changelist of a large table does not scan
+    it on every page view.
+    """
+
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self.estimated_count()
+        if estimate is not None and estimate > self.exact_count_threshold:
+            return estimate
+        return super().count
+
+    def estimated_count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'explain'):
+            return None
+        if connections[queryset.db].vendor != 'postgresql':
+            return None
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
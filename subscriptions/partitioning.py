@@ -0,0 +1,279 @@
+"""
+Optional PostgreSQL range partitioning of UserSubscription by start_date.
+
+The ORM keeps treating ``id`` as the primary key; in the database the key
+becomes ``(id, start_date)`` because PostgreSQL requires the partition key in
+every unique constraint. Ids still come from a single sequence, so they stay
+unique across partitions.
+"""
+from datetime import date
+
+from django.db import connection as default_connection
+
+from .models import UserSubscription
+
+
+TABLE = UserSubscription._meta.db_table
+GRANULARITIES = ('monthly', 'yearly')
+
+
+def period_start(day, granularity):
+    if granularity == 'yearly':
+        return date(day.year, 1, 1)
+    return date(day.year, day.month, 1)
+
+
+def next_period(start, granularity):
+    if granularity == 'yearly':
+        return date(start.year + 1, 1, 1)
+    if start.month == 12:
+        return date(start.year + 1, 1, 1)
+    return date(start.year, start.month + 1, 1)
+
+
+def partition_name(start, granularity):
+    if granularity == 'yearly':
+        return f'{TABLE}_p{start:%Y}'
+    return f'{TABLE}_p{start:%Y_%m}'
+
+
+def infer_granularity(connection=default_connection):
+    """Return the granularity of existing partitions, or ``None``."""
+    for _, lower, upper in list_partitions(connection):
+        return 'yearly' if (upper - lower).days > 31 else 'monthly'
+    return None
+
+
+def is_supported(connection=default_connection):
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned(connection=default_connection):
+    if not is_supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_partitioned_table pt
+            JOIN pg_class c ON c.oid = pt.partrelid
+            WHERE c.relname = %s AND c.relnamespace = to_regnamespace(current_schema())
+            """,
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection=default_connection):
+    """Return ``(name, lower, upper)`` for each range partition, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits i
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            JOIN pg_class child ON child.oid = i.inhrelid
+            WHERE parent.relname = %s
+              AND parent.relnamespace = to_regnamespace(current_schema())
+            """,
+            [TABLE],
+        )
+        partitions = []
+        for name, bound in cursor.fetchall():
+            if bound == 'DEFAULT':
+                continue
+            # FOR VALUES FROM ('2026-01-01') TO ('2026-02-01')
+            lower, upper = (
+                date.fromisoformat(part.split("'")[1])
+                for part in bound.split(' TO ')
+            )
+            partitions.append((name, lower, upper))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partitions(start, end, granularity, connection=default_connection):
+    """Create missing partitions covering ``[start, end)``; return their names."""
+    created = []
+    existing = {name for name, _, _ in list_partitions(connection)}
+    period = period_start(start, granularity)
+    with connection.cursor() as cursor:
+        while period < end:
+            upper = next_period(period, granularity)
+            name = partition_name(period, granularity)
+            if name not in existing:
+                cursor.execute(
+                    f'CREATE TABLE {_quote(name, connection)} PARTITION OF {_quote(TABLE, connection)} '
+                    'FOR VALUES FROM (%s) TO (%s)',
+                    [period, upper],
+                )
+                created.append(name)
+            period = upper
+    return created
+
+
+def detach_partitions(before, archive_schema=None, drop=False,
+                      connection=default_connection):
+    """
+    Detach partitions whose whole range ends on or before ``before``.
+
+    Detached tables are moved to ``archive_schema`` when given, dropped when
+    ``drop`` is set, and otherwise left in place as standalone tables.
+    """
+    detached = []
+    with connection.cursor() as cursor:
+        if archive_schema:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {_quote(archive_schema, connection)}')
+        for name, _, upper in list_partitions(connection):
+            if upper > before:
+                continue
+            cursor.execute(f'ALTER TABLE {_quote(TABLE, connection)} DETACH PARTITION {_quote(name, connection)}')
+            if drop:
+                cursor.execute(f'DROP TABLE {_quote(name, connection)}')
+            elif archive_schema:
+                cursor.execute(
+                    f'ALTER TABLE {_quote(name, connection)} SET SCHEMA {_quote(archive_schema, connection)}'
+                )
+            detached.append(name)
+    return detached
+
+
+def partition_table(granularity, ahead=3, connection=default_connection):
+    """Rebuild the subscriptions table as a range-partitioned table."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Unknown partition granularity: {granularity}')
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(start_date), MAX(start_date) FROM {_quote(TABLE, connection)}')
+        first, last = cursor.fetchone()
+
+    today = date.today()
+    first = first or today
+    last = max(last or today, today)
+    end = next_period(period_start(last, granularity), granularity)
+    for _ in range(ahead):
+        end = next_period(end, granularity)
+
+    def create_table(cursor, old):
+        cursor.execute(
+            f'CREATE TABLE {_quote(TABLE, connection)} (LIKE {_quote(old, connection)} INCLUDING DEFAULTS '
+            'INCLUDING CONSTRAINTS) PARTITION BY RANGE (start_date)'
+        )
+        cursor.execute(f'ALTER TABLE {_quote(TABLE, connection)} ADD PRIMARY KEY (id, start_date)')
+        create_partitions(first, end, granularity, connection)
+        cursor.execute(
+            f'CREATE TABLE {_quote(TABLE + "_pdefault", connection)} '
+            f'PARTITION OF {_quote(TABLE, connection)} DEFAULT'
+        )
+
+    _rebuild(connection, create_table)
+
+
+def unpartition_table(connection=default_connection):
+    """Rebuild the subscriptions table as a plain table keyed by ``id``."""
+
+    def create_table(cursor, old):
+        cursor.execute(
+            f'CREATE TABLE {_quote(TABLE, connection)} (LIKE {_quote(old, connection)} INCLUDING DEFAULTS '
+            'INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(f'ALTER TABLE {_quote(TABLE, connection)} ADD PRIMARY KEY (id)')
+
+    _rebuild(connection, create_table)
+
+
+def _rebuild(connection, create_table):
+    """
+    Copy the table into a new one built by ``create_table`` and restore its
+    secondary indexes, unique, foreign key and exclusion constraints (the
+    latter unless the new table is partitioned) and id generation. Must run
+    in a transaction; the table is locked for the duration of the copy.
+    """
+    old = f'{TABLE}_old'
+    sequence = f'{TABLE}_id_seq'
+    table, quoted_old = _quote(TABLE, connection), _quote(old, connection)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT conrelid::regclass::text FROM pg_constraint
+            WHERE confrelid = %s::regclass AND contype = 'f'
+            """,
+            [TABLE],
+        )
+        referencing = [row[0] for row in cursor.fetchall()]
+        if referencing:
+            raise ValueError(
+                f'{TABLE} is referenced by foreign keys from {", ".join(referencing)}; '
+                'drop them before rebuilding the table.'
+            )
+        cursor.execute(
+            """
+            SELECT indexdef FROM pg_indexes
+            WHERE tablename = %s AND schemaname = current_schema()
+              AND indexname NOT IN (
+                  SELECT conname FROM pg_constraint
+                  WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'x')
+              )
+            """,
+            [TABLE, TABLE],
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid), contype FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype IN ('f', 'u', 'x')
+            """,
+            [TABLE],
+        )
+        constraints = cursor.fetchall()
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}')
+        last_id = cursor.fetchone()[0]
+
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p'", [TABLE]
+        )
+        primary_key = cursor.fetchone()[0]
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {quoted_old}')
+        # Free the primary key's name for the new table.
+        cursor.execute(
+            f'ALTER TABLE {quoted_old} RENAME CONSTRAINT {_quote(primary_key, connection)} '
+            f'TO {_quote(primary_key + "_old", connection)}'
+        )
+        # Detach the old id generator (an identity, or a sequence default once
+        # partitioned) so the copy does not depend on it; it is dropped with
+        # the old table and recreated below.
+        cursor.execute(f'ALTER TABLE {quoted_old} ALTER COLUMN id DROP IDENTITY IF EXISTS')
+        cursor.execute(f'ALTER TABLE {quoted_old} ALTER COLUMN id DROP DEFAULT')
+        create_table(cursor, old)
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {quoted_old}')
+        cursor.execute(f'DROP TABLE {quoted_old}')
+        cursor.execute(f'DROP SEQUENCE IF EXISTS {_quote(sequence, connection)}')
+
+        partitioned = is_partitioned(connection)
+        if not partitioned or connection.pg_version >= 170000:
+            # The identity column Django creates for the primary key.
+            cursor.execute(
+                f'ALTER TABLE {table} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY '
+                f'(SEQUENCE NAME {_quote(sequence, connection)} START WITH {last_id + 1})'
+            )
+        else:
+            # Partitioned tables only take identity columns from PostgreSQL 17;
+            # a sequence owned by the column behaves the same for the ORM.
+            cursor.execute(f'CREATE SEQUENCE {_quote(sequence, connection)} OWNED BY {table}.id')
+            cursor.execute('SELECT setval(%s, %s, %s)', [sequence, max(last_id, 1), last_id > 0])
+            cursor.execute(
+                f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)"
+            )
+
+        # Captured before the rename, so they already target the new table.
+        for definition in index_definitions:
+            cursor.execute(definition)
+        for name, definition, kind in constraints:
+            # Exclusion constraints would need the partition key, so
+            # partitioned tables rely on validation (see overlaps).
+            if kind == 'x' and partitioned:
+                continue
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {_quote(name, connection)} {definition}')
+
+
+def _quote(name, connection=default_connection):
+    return connection.ops.quote_name(name)
@@ -0,0 +1,180 @@
+"""
+Bulk moves of subscriptions between plans with prorated costs.
+
+Each chunk is a single set-based UPDATE computing the new ``plan_cost`` in
+SQL, run in its own transaction through ``UserSubscriptionQuerySet.update``
+so plan change events and the monthly revenue series are recorded with it.
+
+Migrations requested through the API are only saved as pending rows; the
+database is the queue, and ``manage.py migrate_plan --queued`` claims and
+runs them outside the request cycle.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import (
+    Case, DecimalField, Exists, F, FloatField, Func, IntegerField, OuterRef, Q, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Mod, Round
+from django.utils import timezone
+
+from .models import PlanMigration, SubscriptionPlan, UserSubscription, effectively_active
+
+# Billing period lengths used for proration.
+PERIOD_DAYS = {
+    SubscriptionPlan.BillingCycle.MONTHLY: 30,
+    SubscriptionPlan.BillingCycle.YEARLY: 365,
+}
+
+
+class DaysSince(Func):
+    """Whole days from a date expression to a fixed ``day``."""
+
+    output_field = IntegerField()
+
+    def __init__(self, expression, day):
+        super().__init__(expression, Value(day))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date - date is an integer number of days.
+        (start, start_params), (day, day_params) = (
+            compiler.compile(expression) for expression in self.source_expressions
+        )
+        return f'(CAST({day} AS date) - {start})', [*day_params, *start_params]
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        (start, start_params), (day, day_params) = (
+            compiler.compile(expression) for expression in self.source_expressions
+        )
+        return (
+            f'CAST(julianday({day}) - julianday({start}) AS INTEGER)',
+            [*day_params, *start_params],
+        )
+
+
+def candidates(migration):
+    """
+    Subscriptions of the source plan matching the migration filters. The
+    ``active`` status selects effectively active ones: subscriptions that
+    ended before the effective date are not moved.
+    """
+    queryset = UserSubscription.objects.filter(plan_id=migration.source_plan_id)
+    filters = migration.filters
+    if filters.get('status') == UserSubscription.Status.ACTIVE:
+        queryset = queryset.filter(effectively_active(migration.effective_date))
+    elif filters.get('status'):
+        queryset = queryset.filter(status=filters['status'])
+    if filters.get('start_date_from'):
+        queryset = queryset.filter(start_date__gte=filters['start_date_from'])
+    if filters.get('start_date_to'):
+        queryset = queryset.filter(start_date__lt=filters['start_date_to'])
+    return queryset
+
+
+def conflicting(target_plan_id):
+    """
+    Condition for active rows that would overlap an active subscription of
+    the same user to the target plan once moved.
+    """
+    overlapping = UserSubscription.objects.filter(
+        user_id=OuterRef('user_id'),
+        plan_id=target_plan_id,
+        status=UserSubscription.Status.ACTIVE,
+        start_date__lte=Coalesce(OuterRef('end_date'), Value(date.max)),
+    ).filter(Q(end_date__isnull=True) | Q(end_date__gte=OuterRef('start_date')))
+    return Q(Exists(overlapping), status=UserSubscription.Status.ACTIVE)
+
+
+def new_cost(migration):
+    """
+    SQL expression for the migrated ``plan_cost``.
+
+    With proration, the current source billing period (anchored on
+    ``start_date``) is charged at the old cost up to ``effective_date`` and
+    at the target plan's daily rate for the rest. That charge is scaled to
+    the target plan's billing period, so moving between monthly and yearly
+    plans stores a cost on the target's scale. Subscriptions starting after
+    ``effective_date`` pay the target price.
+    """
+    target = migration.target_plan
+    if not migration.prorate:
+        return Value(target.price)
+
+    period = PERIOD_DAYS[migration.source_plan.billing_cycle]
+    target_period = PERIOD_DAYS[target.billing_cycle]
+    target_daily = target.price / target_period
+    elapsed = Mod(DaysSince('start_date', migration.effective_date), period)
+    prorated = (
+        F('plan_cost') * elapsed / Value(float(period))
+        + Value(target_daily) * (Value(period) - elapsed)
+    ) * Value(target_period / period)
+    # PostgreSQL only rounds numerics to a given precision.
+    rounded = Round(Cast(prorated, DecimalField(max_digits=14, decimal_places=4)), 2)
+    return Case(
+        When(start_date__gt=migration.effective_date, then=Value(target.price)),
+        default=Cast(rounded, FloatField()),
+        output_field=FloatField(),
+    )
+
+
+def run_migration(migration, batch_size=1000, progress=None):
+    """
+    Migrate matching subscriptions in chunks of ``batch_size`` rows, one
+    transaction each, calling ``progress(migration)`` after every chunk.
+    """
+    if migration.total is None:
+        migration.total = candidates(migration).filter(id__gt=migration.last_id).count()
+    migration.status = PlanMigration.Status.RUNNING
+    migration.error = ''
+    migration.save(update_fields=['total', 'status', 'error', 'updated_at'])
+
+    cost = new_cost(migration)
+    conflict = conflicting(migration.target_plan_id)
+    try:
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    candidates(migration)
+                    .filter(id__gt=migration.last_id)
+                    .order_by('id')
+                    .values_list('id', flat=True)[:batch_size]
+                )
+                if not ids:
+                    break
+                moved = (
+                    UserSubscription.objects
+                    .filter(id__in=ids, plan_id=migration.source_plan_id)
+                    .exclude(conflict)
+                    .update(plan_id=migration.target_plan_id, plan_cost=cost)
+                )
+                migration.migrated += moved
+                migration.skipped += len(ids) - moved
+                migration.last_id = ids[-1]
+                migration.save(update_fields=['migrated', 'skipped', 'last_id', 'updated_at'])
+            if progress:
+                progress(migration)
+    except Exception as exc:
+        migration.status = PlanMigration.Status.FAILED
+        migration.error = str(exc)
+        migration.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    migration.status = PlanMigration.Status.COMPLETED
+    migration.finished_at = timezone.now()
+    migration.save(update_fields=['status', 'finished_at', 'updated_at'])
+    return migration
+
+
+def claim_pending():
+    """
+    Mark the oldest pending migration as running and return it, or ``None``
+    when none is pending. The conditional UPDATE means concurrent workers
+    never run the same migration.
+    """
+    pending = PlanMigration.objects.filter(status=PlanMigration.Status.PENDING)
+    for migration_id in list(pending.order_by('id').values_list('id', flat=True)):
+        if pending.filter(pk=migration_id).update(
+            status=PlanMigration.Status.RUNNING, updated_at=timezone.now()
+        ):
+            return PlanMigration.objects.select_related('source_plan', 'target_plan').get(pk=migration_id)
+    return None
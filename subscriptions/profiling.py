@@ -0,0 +1,289 @@
+"""
+On-demand profiling of single requests.
+
+Off by default: unless PROFILING_ENABLED is set the middleware removes itself
+at startup, so requests pay nothing. When enabled, a request is profiled if
+it carries an ``X-Profile`` header with PROFILING_TOKEN, matches an active
+ProfilingTrigger created in the admin, or is drawn by PROFILING_SAMPLE_RATE.
+Other requests only pay a header lookup, a random draw and a scan of the
+cached triggers.
+
+A profiled request runs under cProfile (or a stack sampler with
+``mode=sample``) with every SQL query timed. The artefact, a zip with the raw
+profile, a text summary and the queries, is stored in PROFILING_DIR and
+listed as a RequestProfile for download.
+"""
+import cProfile
+import hmac
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ProfilingTrigger, RequestProfile
+
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+# How long active triggers are cached between database reads, in seconds.
+TRIGGER_REFRESH_INTERVAL = 5
+# Old profiles are pruned when the id of a new one is a multiple of this.
+PRUNE_INTERVAL = 10
+
+
+class SQLRecorder:
+    """
+    Database execute wrapper recording each query and its duration.
+
+    Parameters (tokens, password hashes, emails) are left out unless
+    ``record_params``; the SQL itself only has placeholders.
+    """
+
+    def __init__(self, record_params=False):
+        self.record_params = record_params
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': repr(params)[:500] if self.record_params else None,
+                'many': many,
+                'duration_ms': (time.perf_counter() - started) * 1000,
+            })
+
+
+class CProfiler:
+    name = 'cprofile'
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, archive):
+        # Same format as pstats.Stats.dump_stats(), readable by pstats/snakeviz.
+        archive.writestr('profile.prof', marshal.dumps(pstats.Stats(self.profile).stats))
+        summary = io.StringIO()
+        pstats.Stats(self.profile, stream=summary).sort_stats('cumulative').print_stats(50)
+        archive.writestr('summary.txt', summary.getvalue())
+
+
+class StackSampler:
+    """
+    Samples the calling thread's stack at a fixed interval from a helper
+    thread. Cheaper than cProfile on deep call trees; the output is in the
+    collapsed-stack format read by flame graph tools.
+    """
+
+    name = 'sample'
+
+    def __init__(self, interval=None):
+        self.interval = interval or settings.PROFILING_SAMPLE_INTERVAL
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread_id = None
+        self._thread = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def write(self, archive):
+        archive.writestr('stacks.txt', ''.join(
+            f'{stack} {count}\n' for stack, count in self.stacks.most_common()
+        ))
+        total = sum(self.stacks.values()) or 1
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        archive.writestr('summary.txt', ''.join(
+            f'{count * 100 / total:6.2f}%  {count:6d}  {frame}\n'
+            for frame, count in leaves.most_common(50)
+        ))
+
+
+PROFILERS = {profiler.name: profiler for profiler in (CProfiler, StackSampler)}
+
+
+class TriggerCache:
+    """Active profiling triggers, re-read at most every few seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._triggers = []
+        self._fetched_at = float('-inf')
+
+    def active(self):
+        now = time.monotonic()
+        if now - self._fetched_at > TRIGGER_REFRESH_INTERVAL:
+            with self._lock:
+                if now - self._fetched_at > TRIGGER_REFRESH_INTERVAL:
+                    self._triggers = list(ProfilingTrigger.objects.active())
+                    self._fetched_at = now
+        return self._triggers
+
+    def claim(self, request):
+        """Return the mode of a trigger matching ``request`` that has runs left."""
+        for trigger in self.active():
+            if not trigger.matches(request) or random.random() >= trigger.sample_rate:
+                continue
+            # Conditional decrement, so concurrent workers never exceed it.
+            claimed = ProfilingTrigger.objects.filter(
+                pk=trigger.pk, remaining__gt=0
+            ).update(remaining=F('remaining') - 1)
+            if claimed:
+                return trigger.mode
+        return None
+
+    def clear(self):
+        self._fetched_at = float('-inf')
+
+
+triggers = TriggerCache()
+
+
+class ProfilingMiddleware:
+    """Profile selected requests; see the module docstring."""
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        selected = self.select(request)
+        if selected is None:
+            return self.get_response(request)
+        trigger, mode = selected
+        return profile_request(self.get_response, request, trigger, mode)
+
+    def select(self, request):
+        """Return ``(trigger, mode)`` when ``request`` should be profiled."""
+        header = request.headers.get(PROFILE_HEADER)
+        if header and settings.PROFILING_TOKEN:
+            token, _, mode = header.partition(';')
+            if hmac.compare_digest(token.strip(), settings.PROFILING_TOKEN):
+                mode = mode.strip().removeprefix('mode=')
+                return RequestProfile.Trigger.HEADER, mode if mode in PROFILERS else CProfiler.name
+        mode = triggers.claim(request)
+        if mode:
+            return RequestProfile.Trigger.ADMIN, mode
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return RequestProfile.Trigger.SAMPLE, StackSampler.name
+        return None
+
+
+def profile_request(get_response, request, trigger, mode):
+    profiler = PROFILERS[mode]()
+    recorder = SQLRecorder(settings.PROFILING_RECORD_PARAMS)
+    started = time.perf_counter()
+    with connection.execute_wrapper(recorder):
+        profiler.start()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.stop()
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    profile = save_profile(request, response, trigger, profiler, recorder.queries, duration_ms)
+    response[PROFILE_ID_HEADER] = str(profile.pk)
+    return response
+
+
+def recorded_path(request, record_params=False):
+    """
+    The request path with its query string. Query values are left out like
+    SQL parameters, as ``%s`` placeholders, unless ``record_params``.
+    """
+    if record_params or not request.GET:
+        return request.get_full_path()
+    query = '&'.join(
+        f'{quote(name, safe="")}=%s' for name, values in request.GET.lists() for _ in values
+    )
+    return f'{request.path}?{query}'
+
+
+def save_profile(request, response, trigger, profiler, queries, duration_ms):
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    artefact = f'{timezone.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}.zip'
+    with zipfile.ZipFile(directory / artefact, 'w', zipfile.ZIP_DEFLATED) as archive:
+        profiler.write(archive)
+        archive.writestr('queries.json', json.dumps(queries, indent=2))
+
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=recorded_path(request, settings.PROFILING_RECORD_PARAMS)[:1000],
+        status_code=response.status_code,
+        trigger=trigger,
+        mode=profiler.name,
+        duration_ms=duration_ms,
+        query_count=len(queries),
+        sql_time_ms=sum(query['duration_ms'] for query in queries),
+        artefact=artefact,
+    )
+    # Pruning every few saves keeps the profiled request cheap; the cap is
+    # exceeded by at most PRUNE_INTERVAL - 1 profiles in between.
+    if profile.pk % PRUNE_INTERVAL == 0:
+        prune_profiles()
+    return profile
+
+
+def prune_profiles(keep=None):
+    """
+    Delete all but the ``keep`` most recent profiles and their artefacts,
+    with one DELETE; return how many were deleted.
+    """
+    keep = settings.PROFILING_MAX_PROFILES if keep is None else keep
+    cutoff = list(RequestProfile.objects.order_by('-id').values_list('id', flat=True)[keep:keep + 1])
+    if not cutoff:
+        return 0
+    stale = RequestProfile.objects.filter(id__lte=cutoff[0])
+    artefacts = list(stale.values_list('artefact', flat=True))
+    deleted, _ = stale.delete()
+    directory = Path(settings.PROFILING_DIR)
+    for artefact in artefacts:
+        (directory / artefact).unlink(missing_ok=True)
+    return deleted
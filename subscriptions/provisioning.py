@@ -0,0 +1,148 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+
+# Upper bound for IN (...) lists, kept below SQLite's default variable limit.
+LOOKUP_CHUNK_SIZE = 900
+
+
+def get_provisioning_hasher(iterations=None):
+    """
+    Return the default password hasher, with its work factor lowered to
+    ``iterations`` when given (or ``PROVISIONING_HASHER_ITERATIONS``).
+
+    Django re-hashes with the full default cost on the user's first
+    successful login, so cheap import hashes do not persist.
+    """
+    hasher = get_hasher()
+    if iterations is None:
+        iterations = getattr(settings, 'PROVISIONING_HASHER_ITERATIONS', None)
+    if iterations and hasattr(hasher, 'iterations'):
+        hasher = copy.copy(hasher)
+        hasher.iterations = iterations
+    return hasher
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _existing_values(field, values):
+    existing = set()
+    for chunk in _chunks(list(values), LOOKUP_CHUNK_SIZE):
+        existing.update(
+            User.objects.filter(**{f'{field}__in': chunk}).values_list(field, flat=True)
+        )
+    return existing
+
+
+def _find_conflicts(rows):
+    """Map row index to errors for usernames/emails already taken or repeated."""
+    errors = {}
+    seen_usernames = set()
+    seen_emails = set()
+    existing_usernames = _existing_values('username', {row['username'] for row in rows})
+    existing_emails = _existing_values(
+        'email', {row['email'] for row in rows if row.get('email')}
+    )
+
+    for index, row in enumerate(rows):
+        row_errors = {}
+        username = row['username']
+        email = row.get('email')
+        if username in existing_usernames or username in seen_usernames:
+            row_errors['username'] = ['A user with that username already exists.']
+        if email and (email in existing_emails or email in seen_emails):
+            row_errors['email'] = ['A user with that email already exists.']
+        seen_usernames.add(username)
+        if email:
+            seen_emails.add(email)
+        if row_errors:
+            errors[index] = row_errors
+    return errors
+
+
+def _hash_passwords(rows, hasher, workers):
+    """Encoded passwords for ``rows``, hashing only the raw ones."""
+    raw = [(index, row['password']) for index, row in enumerate(rows) if not row.get('password_hash')]
+
+    def encode(password):
+        return make_password(password, hasher=hasher)
+
+    passwords = [row.get('password_hash') for row in rows]
+    if raw:
+        # PBKDF2 releases the GIL, so hashing scales across threads.
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (index, _), encoded in zip(raw, executor.map(encode, [password for _, password in raw])):
+                passwords[index] = encoded
+    return passwords
+
+
+def provision_users(rows, issue_tokens=True, batch_size=1000,
+                    hasher_iterations=None, hash_workers=4):
+    """
+    Create many users with set-based uniqueness checks.
+
+    ``rows`` are dicts with ``username``, ``email``, optional names and
+    either a raw ``password`` or an already encoded ``password_hash``.
+    Rows that clash with existing users or with each other are skipped and
+    reported; the rest are inserted with ``bulk_create`` one transaction per
+    batch, together with their auth tokens when ``issue_tokens`` is set
+    (otherwise tokens are issued on first login).
+
+    Returns ``(created_count, errors)`` where ``errors`` maps row index to
+    field errors.
+    """
+    errors = _find_conflicts(rows)
+    accepted = [
+        (index, row) for index, row in enumerate(rows) if index not in errors
+    ]
+    hasher = get_provisioning_hasher(hasher_iterations)
+    created = 0
+
+    for batch in _chunks(accepted, batch_size):
+        batch_rows = [row for _, row in batch]
+        passwords = _hash_passwords(batch_rows, hasher, hash_workers)
+        users = [
+            User(
+                username=row['username'],
+                email=row.get('email', ''),
+                first_name=row.get('first_name', ''),
+                last_name=row.get('last_name', ''),
+                password=password,
+            )
+            for row, password in zip(batch_rows, passwords)
+        ]
+        try:
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                if issue_tokens:
+                    _bulk_issue_tokens(users)
+        except IntegrityError:
+            # Lost a race with a concurrent signup; report the whole batch.
+            for index, _ in batch:
+                errors[index] = {
+                    'non_field_errors': ['Conflicting user created concurrently, retry.']
+                }
+            continue
+        created += len(users)
+
+    return created, errors
+
+
+def _bulk_issue_tokens(users):
+    if any(user.pk is None for user in users):
+        # Backends that cannot return ids from bulk inserts.
+        users = list(
+            User.objects.filter(username__in=[user.username for user in users])
+        )
+    Token.objects.bulk_create(
+        [Token(key=Token.generate_key(), user=user) for user in users]
+    )
@@ -0,0 +1,317 @@
+"""
+Background report jobs.
+
+Reports too heavy for a request (full-history breakdowns, subscription
+exports) are submitted through the API as ReportJob rows. The database is
+the queue: ``manage.py run_report_jobs`` claims queued jobs with a
+conditional UPDATE, so any number of workers can poll it without running a
+job twice, and executes them in a pool of worker processes. Each job streams
+its rows into a CSV file in REPORTS_DIR, recording progress as it goes, and
+the file is downloadable from the API once the job completes.
+
+The worker bumps ``updated_at`` of the jobs it is running; jobs whose
+heartbeat stops (a killed worker) are queued again up to
+REPORT_JOB_MAX_ATTEMPTS runs. Finished jobs and their files are pruned after
+REPORT_RETENTION_DAYS.
+"""
+import csv
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .analytics import DIMENSIONS, FILTERS, breakdown_queryset
+from .models import ARCHIVED_SUBSCRIPTION_FIELDS, ArchivedUserSubscription, ReportJob, UserSubscription
+
+
+# Rows read per query by exports.
+CHUNK_SIZE = 5000
+# Least time between two progress writes of a job, in seconds.
+PROGRESS_INTERVAL = 1.0
+
+
+def revenue_breakdown_report(params, writer, progress):
+    """A revenue breakdown without the date range and group limits of the API."""
+    group_by = sorted(set(params['group_by']))
+    metrics = sorted(set(params['metrics']))
+    columns = [column for dimension in group_by for column in DIMENSIONS[dimension]] + metrics
+    queryset = breakdown_queryset(
+        group_by,
+        metrics,
+        params.get('start_date_from'),
+        params.get('start_date_to'),
+        filters={name: params.get(name) for name in FILTERS},
+    )
+    writer.writerow(columns)
+    count = 0
+    for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+        writer.writerow([row[column] for column in columns])
+        count += 1
+        progress(count)
+    return count
+
+
+def subscriptions_export(params, writer, progress):
+    """Subscriptions matching the filters, optionally with archived ones, in id order."""
+    lookups = {
+        lookup: params[name]
+        for name, lookup in (
+            ('status', 'status'),
+            ('plan_id', 'plan_id'),
+            ('start_date_from', 'start_date__gte'),
+            ('start_date_to', 'start_date__lt'),
+        )
+        if params.get(name) is not None
+    }
+    querysets = [UserSubscription.objects.filter(**lookups)]
+    if params.get('include_archived'):
+        querysets.append(ArchivedUserSubscription.objects.filter(**lookups))
+    progress(0, total=sum(queryset.count() for queryset in querysets))
+
+    writer.writerow(ARCHIVED_SUBSCRIPTION_FIELDS + ('archived',))
+    count = 0
+    for archived, queryset in enumerate(querysets):
+        # Keyset pagination keeps every chunk an index range scan.
+        last_id = 0
+        while True:
+            rows = list(
+                queryset.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list(*ARCHIVED_SUBSCRIPTION_FIELDS)[:CHUNK_SIZE]
+            )
+            if not rows:
+                break
+            writer.writerows(row + (bool(archived),) for row in rows)
+            last_id = rows[-1][0]
+            count += len(rows)
+            progress(count)
+    return count
+
+
+REPORTS = {
+    ReportJob.Kind.REVENUE_BREAKDOWN: revenue_breakdown_report,
+    ReportJob.Kind.SUBSCRIPTIONS_EXPORT: subscriptions_export,
+}
+
+
+class Progress:
+    """Throttled progress writes for one run of a job."""
+
+    def __init__(self, run, interval=PROGRESS_INTERVAL):
+        self.run = run
+        self.interval = interval
+        self._written_at = float('-inf')
+
+    def __call__(self, done, total=None):
+        now = time.monotonic()
+        if total is None and now - self._written_at < self.interval:
+            return
+        fields = {'progress': done}
+        if total is not None:
+            fields['total'] = total
+        self.run.update(**fields)
+        self._written_at = now
+
+
+def run_job(job_id, attempt):
+    """
+    Run one claimed job and store its result; returns the final status, or
+    ``None`` when the run no longer owns the job. Runs in a pool process.
+    Every write is conditional on the job still being in this run, so a run
+    that was given up on cannot overwrite a newer one.
+    """
+    job = ReportJob.objects.get(pk=job_id)
+    run = ReportJob.objects.filter(pk=job_id, status=ReportJob.Status.RUNNING, attempts=attempt)
+    directory = Path(settings.REPORTS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    result = f'report-{job.pk}-{attempt}.csv'
+    partial = directory / f'{result}.part'
+    try:
+        with open(partial, 'w', newline='') as output:
+            count = REPORTS[job.kind](job.params, csv.writer(output), Progress(run))
+        os.replace(partial, directory / result)
+    except Exception:
+        partial.unlink(missing_ok=True)
+        failed = run.update(
+            status=ReportJob.Status.FAILED,
+            error=traceback.format_exc(limit=5),
+            finished_at=timezone.now(),
+        )
+        return ReportJob.Status.FAILED if failed else None
+
+    completed = run.update(
+        status=ReportJob.Status.COMPLETED,
+        progress=count,
+        total=count,
+        result=result,
+        result_size=(directory / result).stat().st_size,
+        finished_at=timezone.now(),
+    )
+    if not completed:
+        (directory / result).unlink(missing_ok=True)
+        return None
+    return ReportJob.Status.COMPLETED
+
+
+def claim(limit):
+    """Mark up to ``limit`` queued jobs as running, oldest first; return them."""
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    claimed = []
+    candidates = ReportJob.objects.filter(status=ReportJob.Status.QUEUED).order_by('id')
+    for job_id in candidates.values_list('id', flat=True)[:limit]:
+        # Conditional update, so concurrent workers never run the same job.
+        if ReportJob.objects.filter(pk=job_id, status=ReportJob.Status.QUEUED).update(
+            status=ReportJob.Status.RUNNING,
+            attempts=F('attempts') + 1,
+            progress=0,
+            total=None,
+            started_at=now,
+            updated_at=now,
+        ):
+            claimed.append(job_id)
+    return list(ReportJob.objects.filter(pk__in=claimed).order_by('id'))
+
+
+def release(jobs, reason):
+    """
+    Queue running ``jobs`` (a queryset) again, or fail those out of attempts.
+    Returns ``(requeued, failed)``.
+    """
+    now = timezone.now()
+    jobs = jobs.filter(status=ReportJob.Status.RUNNING)
+    failed = jobs.filter(attempts__gte=settings.REPORT_JOB_MAX_ATTEMPTS).update(
+        status=ReportJob.Status.FAILED, error=reason, finished_at=now, updated_at=now
+    )
+    requeued = jobs.update(status=ReportJob.Status.QUEUED, updated_at=now)
+    return requeued, failed
+
+
+def requeue_abandoned():
+    """Release running jobs whose heartbeat is older than REPORT_JOB_STALE_AFTER."""
+    cutoff = timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_AFTER)
+    return release(
+        ReportJob.objects.filter(updated_at__lt=cutoff),
+        'Abandoned by its worker too many times.',
+    )
+
+
+def prune_report_jobs(days=None):
+    """Delete jobs finished more than ``days`` ago and their result files."""
+    days = settings.REPORT_RETENTION_DAYS if days is None else days
+    stale = ReportJob.objects.filter(
+        status__in=[ReportJob.Status.COMPLETED, ReportJob.Status.FAILED],
+        finished_at__lt=timezone.now() - timedelta(days=days),
+    )
+    count = 0
+    for job in stale.iterator():
+        job.delete()
+        count += 1
+    return count
+
+
+class ReportWorker:
+    """
+    Runs report jobs in a pool of ``workers`` processes.
+
+    Database bookkeeping (claims, heartbeats, recovery) stays in the calling
+    process; pool processes only run jobs. Use as a context manager and call
+    ``run_once()`` in a loop.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or settings.REPORT_WORKERS
+        self.heartbeat_interval = settings.REPORT_JOB_STALE_AFTER / 3
+        self.pool = None
+        self.running = {}
+        self._heartbeat_at = float('-inf')
+
+    def __enter__(self):
+        self.pool = self._start_pool()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.pool.shutdown(wait=exc_info[0] is None, cancel_futures=True)
+        if self.running:
+            # Interrupted: hand unfinished jobs to the next worker now rather
+            # than after their heartbeat goes stale.
+            release(ReportJob.objects.filter(pk__in=self.running.values()), 'Interrupted too many times.')
+            self.running.clear()
+
+    def _start_pool(self):
+        # Pool processes are spawned rather than forked, so they never share
+        # this process's database connections. The initializer is imported
+        # before Django is set up and so cannot live in this module.
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+
+    @property
+    def idle(self):
+        return not self.running
+
+    def run_once(self, timeout=0):
+        """
+        Fill free processes with queued jobs, wait up to ``timeout`` seconds
+        for running ones, and return counters for the pass.
+        """
+        stats = {'started': 0, 'completed': 0, 'failed': 0, 'requeued': 0}
+        now = time.monotonic()
+        if now - self._heartbeat_at >= self.heartbeat_interval:
+            ReportJob.objects.filter(pk__in=self.running.values()).update(updated_at=timezone.now())
+            requeued, failed = requeue_abandoned()
+            stats['requeued'] += requeued
+            stats['failed'] += failed
+            prune_report_jobs()
+            self._heartbeat_at = now
+
+        for job in claim(self.workers - len(self.running)):
+            self.running[self.pool.submit(run_job, job.pk, job.attempts)] = job.pk
+            stats['started'] += 1
+
+        if self.running:
+            done, _ = wait(self.running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                # A broken pool settles all running jobs at once.
+                if future in self.running:
+                    self.settle(future, stats)
+        return stats
+
+    def settle(self, future, stats):
+        job_id = self.running.pop(future)
+        try:
+            status = future.result()
+        except BrokenProcessPool:
+            # A pool process died (e.g. killed for memory); every job in the
+            # pool is lost with it.
+            job_ids = [job_id, *self.running.values()]
+            self.running.clear()
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = self._start_pool()
+            requeued, failed = release(
+                ReportJob.objects.filter(pk__in=job_ids), 'Worker process died too many times.'
+            )
+            stats['requeued'] += requeued
+            stats['failed'] += failed
+            return
+        except Exception:
+            ReportJob.objects.filter(pk=job_id, status=ReportJob.Status.RUNNING).update(
+                status=ReportJob.Status.FAILED,
+                error=traceback.format_exc(limit=5),
+                finished_at=timezone.now(),
+            )
+            status = ReportJob.Status.FAILED
+        if status:
+            stats[status] += 1
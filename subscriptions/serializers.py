@@ -1,7 +1,27 @@
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher
 from django.contrib.auth.models import User
-from .models import Feature, SubscriptionPlan, UserSubscription
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from . import overlaps
+from .analytics import DIMENSIONS, METRICS, add_months
+from .caching import CachedRepresentationMixin
+from .concurrency import PreconditionFailed
+from .models import (
+    Feature,
+    PlanMigration,
+    ReportJob,
+    RequestProfile,
+    SubscriptionPlan,
+    UserSubscription,
+    UserSubscriptionSummary,
+    SubscriptionEvent,
+    month_start,
+)
 from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.validators import EmailValidator
 
 
@@ -25,9 +45,20 @@ class SignUpInputSerializer(serializers.Serializer):
     password_confirm = serializers.CharField(write_only=True)
 
     def create(self, validated_data):
-        user = self.Meta.model.objects.create_user(
-            **validated_data
-        )
+        validated_data.pop('password_confirm')
+        # Uniqueness is enforced by the database (unique username and the
+        # unique email index) instead of a racy exists() check up front.
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(**validated_data)
+        except IntegrityError:
+            if User.objects.filter(email=validated_data['email']).exists():
+                raise serializers.ValidationError(
+                    {"email": ["A user with that email already exists."]}
+                )
+            raise serializers.ValidationError(
+                {"username": ["A user with that username already exists."]}
+            )
         return user
 
     def validate(self, data):
@@ -41,13 +72,55 @@ class SignUpInputSerializer(serializers.Serializer):
         validate_password(value)
         return value
 
-    def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
+
+class ProvisionUserSerializer(serializers.Serializer):
+    """Serializer for a single user row in bulk provisioning."""
+
+    username = serializers.CharField(max_length=150)
+    email = serializers.EmailField(required=False, allow_blank=True, default='')
+    first_name = serializers.CharField(
+        max_length=150, required=False, allow_blank=True, default=''
+    )
+    last_name = serializers.CharField(
+        max_length=150, required=False, allow_blank=True, default=''
+    )
+    password = serializers.CharField(write_only=True, required=False)
+    password_hash = serializers.CharField(write_only=True, required=False)
+
+    def validate_password_hash(self, value):
+        try:
+            identify_hasher(value)
+        except ValueError:
             raise serializers.ValidationError(
-                "A user with that email already exists."
+                "Unknown password hash format."
             )
         return value
 
+    def validate(self, data):
+        if ('password' in data) == ('password_hash' in data):
+            raise serializers.ValidationError(
+                "Provide exactly one of password or password_hash."
+            )
+        if 'password' in data:
+            # Same validators as signup, compared against the row's names.
+            user = User(**{
+                field: data[field] for field in ('username', 'email', 'first_name', 'last_name')
+            })
+            try:
+                validate_password(data['password'], user)
+            except DjangoValidationError as exc:
+                raise serializers.ValidationError({"password": list(exc.messages)})
+        return data
+
+
+class BulkProvisionUsersSerializer(serializers.Serializer):
+    """Serializer for bulk user provisioning requests."""
+
+    users = ProvisionUserSerializer(
+        many=True, allow_empty=False, max_length=10000
+    )
+    issue_tokens = serializers.BooleanField(default=True)
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model."""
@@ -82,8 +155,12 @@ class FeatureSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class SubscriptionPlanSerializer(serializers.ModelSerializer):
-    """Serializer for SubscriptionPlan model."""
+class SubscriptionPlanSerializer(CachedRepresentationMixin, serializers.ModelSerializer):
+    """
+    Serializer for SubscriptionPlan model. Representations are cached, as
+    every subscription read embeds its plan.
+    """
+    cache_tag = 'plan'
     features = FeatureSerializer(many=True, read_only=True)
     feature_ids = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -144,10 +221,82 @@ class UserSubscriptionSerializer(serializers.ModelSerializer):
             'start_date',
             'end_date',
             'status',
+            'version',
             'created_at',
             'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'version', 'created_at', 'updated_at']
+        # The unique active start date is covered by the overlap check in
+        # validate().
+        validators = []
+
+    OVERLAP_ERROR = "The user already has an active subscription to this plan in this period."
+
+    def validate(self, data):
+        values = {
+            field: data.get(field, getattr(self.instance, field, None))
+            for field in ('user', 'plan', 'start_date', 'end_date', 'status')
+        }
+        status = values['status'] or UserSubscription.Status.ACTIVE
+        if values['end_date'] and values['start_date'] and values['end_date'] < values['start_date']:
+            raise serializers.ValidationError(
+                {"end_date": "Must not be before start_date."}
+            )
+        if status == UserSubscription.Status.ACTIVE and values['start_date']:
+            overlapping = UserSubscription.objects.overlapping(
+                values['user'].pk, values['plan'].pk, values['start_date'], values['end_date']
+            )
+            if self.instance is not None:
+                overlapping = overlapping.exclude(pk=self.instance.pk)
+            if overlapping.exists():
+                raise serializers.ValidationError(self.OVERLAP_ERROR)
+        return data
+
+    # The check above can race with a concurrent write; the database
+    # constraints then reject the row. Other integrity errors are bugs and
+    # propagate.
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as exc:
+            if not overlaps.is_overlap_violation(exc):
+                raise
+            # Shaped like the error of validate(), not a bare list.
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [self.OVERLAP_ERROR]})
+
+    def update(self, instance, validated_data):
+        """
+        Write the changes with an UPDATE conditional on the version: with
+        ``expected_versions`` (from If-Match) it only applies while the row
+        still has one of them, with ``excluded_versions`` (If-None-Match)
+        while it has none of them, otherwise PreconditionFailed is raised.
+        The tracked update also locks the row to log the change, within
+        the same transaction.
+        """
+        expected_versions = validated_data.pop('expected_versions', None)
+        excluded_versions = validated_data.pop('excluded_versions', None)
+        rows = UserSubscription.objects.filter(pk=instance.pk)
+        if expected_versions is not None:
+            rows = rows.filter(version__in=expected_versions)
+        if excluded_versions:
+            rows = rows.exclude(version__in=excluded_versions)
+        validated_data['updated_at'] = timezone.now()
+        try:
+            with transaction.atomic():
+                updated = rows.update(**validated_data)
+        except IntegrityError as exc:
+            if not overlaps.is_overlap_violation(exc):
+                raise
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [self.OVERLAP_ERROR]})
+        if not updated:
+            raise PreconditionFailed()
+        # The written values are known, and the validated user and plan stay
+        # cached for the response; only the version is read back.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.refresh_from_db(fields=['version'])
+        return instance
 
 
 class UserSubscriptionListSerializer(serializers.ModelSerializer):
@@ -169,3 +318,290 @@ class UserSubscriptionListSerializer(serializers.ModelSerializer):
             'end_date',
             'status'
         ]
+
+
+class SubscriptionEventSerializer(serializers.ModelSerializer):
+    """Serializer for SubscriptionEvent change feed entries."""
+
+    class Meta:
+        model = SubscriptionEvent
+        fields = [
+            'id',
+            'subscription_id',
+            'user_id',
+            'event_type',
+            'plan_id',
+            'previous_plan_id',
+            'status',
+            'previous_status',
+            'plan_cost',
+            'changes',
+            'occurred_at',
+        ]
+        read_only_fields = fields
+
+
+class UserSubscriptionSummarySerializer(serializers.ModelSerializer):
+    """Serializer for a user's denormalized subscription totals."""
+
+    user_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = UserSubscriptionSummary
+        fields = ['user_id', 'active_count', 'total_spend', 'next_expiry']
+        read_only_fields = fields
+
+
+class UserSummaryQuerySerializer(serializers.Serializer):
+    """Query parameters for bulk user summaries."""
+
+    ids = serializers.ListField(
+        child=serializers.CharField(),
+        allow_empty=False,
+        help_text="User ids, repeated or comma-separated."
+    )
+
+    def validate_ids(self, value):
+        # Accept both repeated parameters and comma-separated values.
+        try:
+            ids = {int(user_id) for item in value for user_id in item.split(',') if user_id.strip()}
+        except ValueError:
+            raise serializers.ValidationError("User ids must be integers.")
+        if not ids:
+            raise serializers.ValidationError("At least one user id is required.")
+        if len(ids) > settings.USER_SUMMARY_MAX_IDS:
+            raise serializers.ValidationError(
+                f"At most {settings.USER_SUMMARY_MAX_IDS} user ids per request."
+            )
+        return sorted(ids)
+
+
+class SubscriptionChangesQuerySerializer(serializers.Serializer):
+    """Query parameters for the subscription change feed."""
+
+    since = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=5000, default=500)
+
+
+class RevenueBreakdownQuerySerializer(serializers.Serializer):
+    """Query parameters for ad-hoc revenue breakdowns."""
+
+    group_by = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+    metrics = serializers.ListField(child=serializers.CharField(), required=False)
+    start_date_from = serializers.DateField()
+    start_date_to = serializers.DateField()
+    status = serializers.ChoiceField(
+        choices=UserSubscription.Status.choices, required=False
+    )
+    plan_id = serializers.IntegerField(required=False)
+    billing_cycle = serializers.ChoiceField(
+        choices=SubscriptionPlan.BillingCycle.choices, required=False
+    )
+    feature_id = serializers.IntegerField(required=False)
+
+    def split_choices(self, values, allowed, name):
+        # Accept both repeated parameters and comma-separated values.
+        choices = [
+            value.strip() for item in values for value in item.split(',') if value.strip()
+        ]
+        invalid = sorted(set(choices) - set(allowed))
+        if invalid:
+            raise serializers.ValidationError(
+                f"Unsupported {name}: {', '.join(invalid)}. Allowed: {', '.join(sorted(allowed))}."
+            )
+        return choices
+
+    def validate_group_by(self, value):
+        return self.split_choices(value, DIMENSIONS, 'dimensions')
+
+    def validate_metrics(self, value):
+        return self.split_choices(value, METRICS, 'metrics')
+
+    def validate(self, data):
+        span = (data['start_date_to'] - data['start_date_from']).days
+        if span <= 0:
+            raise serializers.ValidationError(
+                {"start_date_to": "Must be after start_date_from."}
+            )
+        if span > settings.REVENUE_BREAKDOWN_MAX_DAYS:
+            raise serializers.ValidationError(
+                {"start_date_to": f"Date range cannot exceed {settings.REVENUE_BREAKDOWN_MAX_DAYS} days."}
+            )
+        data.setdefault('metrics', ['sum'])
+        return data
+
+
+class MonthlyRevenueQuerySerializer(serializers.Serializer):
+    """Query parameters for the monthly revenue series."""
+
+    start_month = serializers.DateField(
+        input_formats=['%Y-%m', 'iso-8601'], required=False
+    )
+    end_month = serializers.DateField(
+        input_formats=['%Y-%m', 'iso-8601'], required=False
+    )
+
+    def validate(self, data):
+        # Defaults to the last 12 months, ending with the current one.
+        end = month_start(data.get('end_month') or self.context['today'])
+        start = month_start(data.get('start_month') or add_months(end, -11))
+        if start > end:
+            raise serializers.ValidationError(
+                {"end_month": "Must not be before start_month."}
+            )
+        if add_months(start, settings.MONTHLY_REVENUE_MAX_MONTHS) <= end:
+            raise serializers.ValidationError(
+                {"end_month": f"Range cannot exceed {settings.MONTHLY_REVENUE_MAX_MONTHS} months."}
+            )
+        return {'start_month': start, 'end_month': end}
+
+
+class PlanMigrationRequestSerializer(serializers.Serializer):
+    """Input for moving a plan's subscribers to another plan."""
+
+    target_plan_id = serializers.PrimaryKeyRelatedField(
+        queryset=SubscriptionPlan.objects.all(),
+        source='target_plan'
+    )
+    effective_date = serializers.DateField(required=False)
+    prorate = serializers.BooleanField(default=True)
+    status = serializers.ChoiceField(
+        choices=UserSubscription.Status.choices, required=False
+    )
+    start_date_from = serializers.DateField(required=False)
+    start_date_to = serializers.DateField(required=False)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate_target_plan_id(self, value):
+        if value == self.context['source_plan']:
+            raise serializers.ValidationError("Must differ from the source plan.")
+        return value
+
+    def validate(self, data):
+        data.setdefault('effective_date', self.context['today'])
+        data['filters'] = {
+            name: str(data.pop(name))
+            for name in ('status', 'start_date_from', 'start_date_to')
+            if name in data
+        }
+        return data
+
+
+class PlanMigrationSerializer(serializers.ModelSerializer):
+    """Serializer for plan migration progress."""
+
+    class Meta:
+        model = PlanMigration
+        fields = [
+            'id',
+            'source_plan',
+            'target_plan',
+            'effective_date',
+            'prorate',
+            'filters',
+            'status',
+            'total',
+            'migrated',
+            'skipped',
+            'error',
+            'created_at',
+            'updated_at',
+            'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class RequestProfileSerializer(serializers.ModelSerializer):
+    """Serializer for profiled requests."""
+
+    class Meta:
+        model = RequestProfile
+        fields = [
+            'id',
+            'method',
+            'path',
+            'status_code',
+            'trigger',
+            'mode',
+            'duration_ms',
+            'query_count',
+            'sql_time_ms',
+            'created_at'
+        ]
+
+
+class RevenueBreakdownReportSerializer(RevenueBreakdownQuerySerializer):
+    """Parameters of a revenue breakdown report; the date range is optional and unbounded."""
+
+    start_date_from = serializers.DateField(required=False)
+    start_date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        start, end = data.get('start_date_from'), data.get('start_date_to')
+        if start and end and end <= start:
+            raise serializers.ValidationError(
+                {"start_date_to": "Must be after start_date_from."}
+            )
+        data.setdefault('metrics', ['sum'])
+        return data
+
+
+class SubscriptionExportReportSerializer(serializers.Serializer):
+    """Parameters of a subscriptions export report."""
+
+    status = serializers.ChoiceField(
+        choices=UserSubscription.Status.choices, required=False
+    )
+    plan_id = serializers.IntegerField(required=False)
+    start_date_from = serializers.DateField(required=False)
+    start_date_to = serializers.DateField(required=False)
+    include_archived = serializers.BooleanField(default=False)
+
+
+REPORT_PARAMS_SERIALIZERS = {
+    ReportJob.Kind.REVENUE_BREAKDOWN: RevenueBreakdownReportSerializer,
+    ReportJob.Kind.SUBSCRIPTIONS_EXPORT: SubscriptionExportReportSerializer,
+}
+
+
+class ReportJobRequestSerializer(serializers.Serializer):
+    """Input for submitting a report job."""
+
+    kind = serializers.ChoiceField(choices=ReportJob.Kind.choices)
+    params = serializers.DictField(
+        required=False,
+        default=dict,
+        help_text="Report parameters: the revenue breakdown query parameters (without the date range "
+                  "limit), or `status`, `plan_id`, `start_date_from`, `start_date_to` and "
+                  "`include_archived` for an export."
+    )
+
+    def validate(self, data):
+        params = REPORT_PARAMS_SERIALIZERS[data['kind']](data=data['params'])
+        if not params.is_valid():
+            raise serializers.ValidationError({"params": params.errors})
+        # Stored as JSON, so keep the serialized form (e.g. ISO dates).
+        data['params'] = params.data
+        return data
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """Serializer for report job status and progress."""
+
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id',
+            'kind',
+            'params',
+            'status',
+            'progress',
+            'total',
+            'attempts',
+            'result_size',
+            'error',
+            'requested_by',
+            'created_at',
+            'started_at',
+            'finished_at'
+        ]
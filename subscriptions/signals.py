@@ -1,10 +1,74 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
+from .caching import tiered_cache
+from .models import (
+    Feature,
+    MonthlyRevenue,
+    SubscriptionEvent,
+    SubscriptionPlan,
+    UserSubscription,
+    UserSubscriptionSummary,
+    TRACKED_SUBSCRIPTION_FIELDS,
+)
 
 
 @receiver(post_save, sender=User)
 def create_auth_token(sender, instance=None, created=False, **kwargs):
     if created:
         Token.objects.create(user=instance)
+
+
+@receiver(post_delete, sender=UserSubscription)
+def record_subscription_deleted(sender, instance, using, **kwargs):
+    # post_delete runs inside the deletion transaction, including cascades.
+    values = {field: getattr(instance, field) for field in TRACKED_SUBSCRIPTION_FIELDS}
+    SubscriptionEvent.objects.using(using).bulk_create(
+        SubscriptionEvent.for_change(None, values, deleted=True)
+    )
+    MonthlyRevenue.apply_changes([(values, None)], using=using)
+    UserSubscriptionSummary.apply_changes([(values, None)], using=using)
+
+
+# Cache invalidation. Subscription writes invalidate ``user:{id}`` in
+# UserSubscriptionSummary.apply_changes, which every write path (including
+# bulk writes, which send no signals) goes through.
+
+@receiver(post_save, sender=Feature)
+@receiver(pre_delete, sender=Feature)
+def invalidate_feature(sender, instance, using, created=False, **kwargs):
+    # Plans embed their features; on delete they are looked up before the
+    # feature's m2m rows go with it.
+    plan_ids = [] if created else (
+        SubscriptionPlan.objects.using(using).filter(features=instance).values_list('id', flat=True)
+    )
+    tiered_cache.invalidate_tags(
+        f'feature:{instance.pk}', 'features', *(f'plan:{plan_id}' for plan_id in plan_ids), using=using
+    )
+
+
+@receiver(post_save, sender=SubscriptionPlan)
+@receiver(post_delete, sender=SubscriptionPlan)
+def invalidate_plan(sender, instance, using, **kwargs):
+    tiered_cache.invalidate_tags(f'plan:{instance.pk}', 'plans', using=using)
+
+
+@receiver(m2m_changed, sender=SubscriptionPlan.features.through)
+def invalidate_plan_features(sender, instance, action, reverse, pk_set, using, **kwargs):
+    # Clearing from the feature side does not say which plans lost it, so
+    # they are looked up before the rows go.
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        plan_ids = [instance.pk]
+    elif action == 'pre_clear':
+        plan_ids = list(instance.plans.using(using).values_list('id', flat=True))
+    else:
+        plan_ids = pk_set
+    tiered_cache.invalidate_tags(*(f'plan:{plan_id}' for plan_id in plan_ids), using=using)
+
+
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, using, **kwargs):
+    tiered_cache.invalidate_tags(f'user:{instance.pk}', using=using)
@@ -0,0 +1,345 @@
+"""
+Columnar snapshot of subscriptions for the analytics dashboard.
+
+Each projected column is a flat binary file of a fixed NumPy dtype, memory
+mapped on read, so dashboard metrics become vectorized scans over a few
+contiguous arrays instead of row-store aggregates. Subscriptions are
+appended when their ``created`` event is read, and changes to exported rows
+are replayed from the subscription event log, read through
+``SubscriptionEvent.read``. Rows are not kept in id order: ids are handed out
+before commit, so a row with a lower id can commit after a higher one was
+exported. A rebuild writes a new generation of column files, which readers
+switch to atomically with ``meta.json``. Recurring
+revenue counts effectively active rows, from the status and end date
+columns. NumPy is optional; without it the dashboard keeps using SQL.
+"""
+import json
+import os
+import time
+import uuid
+from datetime import date
+from itertools import compress
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .analytics import archived_totals, combine_dashboard_metrics
+from .models import EVENT_LOOKUP_CHUNK_SIZE, ArchivedUserRevenue, SubscriptionEvent, UserSubscription
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
+COLUMNS = {
+    'id': 'int64',
+    'user_id': 'int64',
+    'plan_id': 'int64',
+    'plan_cost': 'float64',
+    'start_date': 'int32',  # days since 1970-01-01
+    'end_date': 'int32',  # days since 1970-01-01, date.max when open-ended
+    'status': 'int8',
+}
+# Version of the column layout; snapshots of another one are rebuilt.
+FORMAT = 3
+STATUS_CODES = {
+    UserSubscription.Status.ACTIVE: 0,
+    UserSubscription.Status.CANCELLED: 1,
+    UserSubscription.Status.SUSPENDED: 2,
+}
+# Status code of rows deleted or archived since they were exported.
+REMOVED = -1
+REMOVED_EVENTS = (
+    SubscriptionEvent.EventType.DELETED,
+    SubscriptionEvent.EventType.ARCHIVED,
+)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_days(day):
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+class Snapshot:
+    """A columnar subscription snapshot stored in ``directory``."""
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or settings.ANALYTICS_SNAPSHOT_DIR)
+
+    def column_path(self, name, generation):
+        return self.directory / f'{name}.{generation}.bin'
+
+    @property
+    def meta_path(self):
+        return self.directory / 'meta.json'
+
+    def read_meta(self):
+        try:
+            meta = json.loads(self.meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('format') == FORMAT else None
+
+    def write_meta(self, meta):
+        # Readers pick the column files and size the memory maps from
+        # meta.json, so it is replaced atomically after the column data is
+        # written.
+        tmp = self.meta_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({**meta, 'format': FORMAT}))
+        os.replace(tmp, self.meta_path)
+
+    def columns(self, meta, mode='r'):
+        rows = meta['row_count']
+        if not rows:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()}
+        return {
+            name: np.memmap(self.column_path(name, meta['generation']), dtype=dtype, mode=mode, shape=(rows,))
+            for name, dtype in COLUMNS.items()
+        }
+
+    def rebuild(self, chunk_size=100000):
+        """
+        Export all subscriptions from scratch into a new generation of
+        column files; return the row count. Readers keep the previous
+        generation until ``meta.json`` points to the new one.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        last_event_id = SubscriptionEvent.watermark()
+        generation = uuid.uuid4().hex
+        files = {name: open(self.column_path(name, generation), 'wb') for name in COLUMNS}
+        try:
+            rows = _export(files, UserSubscription.objects.all(), chunk_size)
+        finally:
+            for f in files.values():
+                f.close()
+        self.write_meta({
+            'generation': generation,
+            'row_count': rows,
+            'last_event_id': last_event_id,
+            'refreshed_at': time.time(),
+        })
+        # Open memory maps of older generations stay readable.
+        for path in self.directory.glob('*.bin'):
+            if not path.name.endswith(f'.{generation}.bin'):
+                path.unlink(missing_ok=True)
+        return rows
+
+    def refresh(self, chunk_size=100000):
+        """
+        Append subscriptions created since the last refresh and apply logged
+        changes to exported rows. Returns ``(appended, updated)``.
+
+        Replaying an event twice is harmless, so a refresh interrupted before
+        ``meta.json`` is rewritten is simply redone by the next one.
+        """
+        meta = self.read_meta()
+        if meta is None:
+            return self.rebuild(chunk_size), 0
+
+        last_event_id = meta['last_event_id']
+        events = []
+        while True:
+            batch, more = SubscriptionEvent.read(last_event_id, chunk_size)
+            if batch:
+                last_event_id = batch[-1].id
+            events.extend(batch)
+            if not more:
+                break
+
+        # Rows are read after their events, so they are at least as new as
+        # every event read. Rows exported by a rebuild that ran after they
+        # were created are already there.
+        created = np.unique(np.asarray([
+            event.subscription_id for event in events
+            if event.event_type == SubscriptionEvent.EventType.CREATED
+        ], dtype='int64'))
+        if meta['row_count'] and len(created):
+            _, exported = _positions(self.columns(meta)['id'], created)
+            created = created[~exported]
+
+        files = {name: open(self.column_path(name, meta['generation']), 'r+b') for name in COLUMNS}
+        try:
+            for name, f in files.items():
+                # Drop rows appended by an interrupted refresh.
+                f.truncate(meta['row_count'] * np.dtype(COLUMNS[name]).itemsize)
+                f.seek(0, os.SEEK_END)
+            appended = sum(
+                _export(
+                    files,
+                    UserSubscription.objects.filter(id__in=created[start:start + EVENT_LOOKUP_CHUNK_SIZE].tolist()),
+                    chunk_size,
+                )
+                for start in range(0, len(created), EVENT_LOOKUP_CHUNK_SIZE)
+            )
+        finally:
+            for f in files.values():
+                f.close()
+
+        updated = 0
+        if meta['row_count']:
+            columns = self.columns(meta, mode='r+')
+            created = set(created.tolist())
+            updated = _apply_events(columns, [event for event in events if event.subscription_id not in created])
+            for column in columns.values():
+                column.flush()
+
+        self.write_meta({
+            **meta,
+            'row_count': meta['row_count'] + appended,
+            'last_event_id': last_event_id,
+            'refreshed_at': time.time(),
+        })
+        return appended, updated
+
+    def dashboard_metrics(self, today, meta=None):
+        """Compute the dashboard metrics from the snapshot columns."""
+        meta = meta or self.read_meta()
+        columns = self.columns(meta)
+        status = np.asarray(columns['status'])
+        cost = np.asarray(columns['plan_cost'])
+        live = status != REMOVED
+        # effectively_active(): active and not ended by today.
+        recurring = (status == STATUS_CODES[UserSubscription.Status.ACTIVE]) & (
+            np.asarray(columns['end_date']) >= to_days(today)
+        )
+
+        live_totals = {
+            'total_recurring_revenue': float(cost[recurring].sum()),
+            'total_cost': float(cost[live].sum()),
+            'subscription_count': int(live.sum()),
+        }
+
+        # The monthly history comes from the precomputed series table.
+        metrics = combine_dashboard_metrics(live_totals, archived_totals(), today)
+        metrics['top_users'] = self.top_users(columns['user_id'][live], cost[live])
+        return metrics
+
+    def top_users(self, user_ids, cost, limit=5):
+        archived = list(ArchivedUserRevenue.objects.values_list('user_id', 'total_cost'))
+        size = int(max(
+            user_ids.max() + 1 if len(user_ids) else 0,
+            max((user_id for user_id, _ in archived), default=-1) + 1,
+        ))
+        values = np.bincount(user_ids, weights=cost, minlength=size)
+        has_subscriptions = np.bincount(user_ids, minlength=size) > 0
+        for user_id, total in archived:
+            values[user_id] += total
+            has_subscriptions[user_id] = True
+
+        candidates = np.flatnonzero(has_subscriptions)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-values[candidates], limit)[:limit]]
+        top = candidates[np.argsort(-values[candidates], kind='stable')]
+
+        users = User.objects.in_bulk([int(user_id) for user_id in top])
+        return [
+            {
+                'id': user.id,
+                'username': user.username,
+                'email': user.email,
+                'total_subscription_value': float(values[user.id]),
+            }
+            for user in (users.get(int(user_id)) for user_id in top)
+            if user is not None
+        ]
+
+
+def _export(files, queryset, chunk_size):
+    """Append the rows of ``queryset`` to column files; return how many."""
+    exported = 0
+    after_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=after_id).order_by('id').values_list(*COLUMNS)[:chunk_size])
+        if not rows:
+            return exported
+        ids, user_ids, plan_ids, costs, start_dates, end_dates, statuses = zip(*rows)
+        arrays = {
+            'id': ids,
+            'user_id': user_ids,
+            'plan_id': plan_ids,
+            'plan_cost': costs,
+            'start_date': [to_days(day) for day in start_dates],
+            'end_date': [to_days(day or date.max) for day in end_dates],
+            'status': [STATUS_CODES[value] for value in statuses],
+        }
+        for name, dtype in COLUMNS.items():
+            files[name].write(np.asarray(arrays[name], dtype=dtype).tobytes())
+        exported += len(rows)
+        after_id = ids[-1]
+
+
+def _positions(ids, wanted):
+    """
+    Positions in the unordered ``ids`` column of the ``wanted`` ids, and
+    which of them were found.
+    """
+    order = np.argsort(ids, kind='stable')
+    ordered = np.asarray(ids)[order]
+    index = np.searchsorted(ordered, wanted)
+    found = index < len(ordered)
+    found[found] = ordered[index[found]] == wanted[found]
+    return order[index[found]], found
+
+
+def _apply_events(columns, events):
+    """
+    Apply logged changes, latest event per subscription winning. Every
+    event carries the plan, cost and status after the change; other fields
+    come from the ``changes`` of ``updated`` events.
+    """
+    if not events:
+        return 0
+    subscription_ids, event_types, plan_ids, costs, statuses = zip(*(
+        (event.subscription_id, event.event_type, event.plan_id, event.plan_cost, event.status)
+        for event in events
+    ))
+    # Keep each subscription's last event only.
+    reversed_ids = np.asarray(subscription_ids[::-1], dtype='int64')
+    unique_ids, first_in_reversed = np.unique(reversed_ids, return_index=True)
+    latest = len(events) - 1 - first_in_reversed
+
+    positions, found = _positions(columns['id'], unique_ids)
+    latest = latest[found]
+
+    columns['plan_id'][positions] = np.asarray(plan_ids, dtype='int64')[latest]
+    columns['plan_cost'][positions] = np.asarray(costs, dtype='float64')[latest]
+    columns['status'][positions] = np.asarray([
+        REMOVED if event_types[index] in REMOVED_EVENTS else STATUS_CODES[statuses[index]]
+        for index in latest
+    ], dtype='int8')
+
+    # Updated events are rare: apply their other fields one by one, in order.
+    updates = [event for event in events if event.event_type == SubscriptionEvent.EventType.UPDATED]
+    if updates:
+        update_positions, update_found = _positions(
+            columns['id'], np.asarray([event.subscription_id for event in updates], dtype='int64')
+        )
+        for event, position in zip(compress(updates, update_found), update_positions):
+            if 'user_id' in event.changes:
+                columns['user_id'][position] = event.changes['user_id'][1]
+            if 'start_date' in event.changes:
+                columns['start_date'][position] = to_days(date.fromisoformat(event.changes['start_date'][1]))
+            if 'end_date' in event.changes:
+                end_date = event.changes['end_date'][1]
+                columns['end_date'][position] = to_days(date.fromisoformat(end_date) if end_date else date.max)
+    return len(positions)
+
+
+def dashboard_metrics(today):
+    """
+    Dashboard metrics from the snapshot, or ``None`` when NumPy is missing
+    or the snapshot is absent or older than ``ANALYTICS_SNAPSHOT_MAX_AGE``.
+    """
+    if np is None:
+        return None
+    snapshot = Snapshot()
+    meta = snapshot.read_meta()
+    if meta is None or time.time() - meta['refreshed_at'] > settings.ANALYTICS_SNAPSHOT_MAX_AGE:
+        return None
+    try:
+        return snapshot.dashboard_metrics(today, meta)
+    except FileNotFoundError:
+        # A rebuild removed the generation just read; SQL answers this once.
+        return None
@@ -0,0 +1,67 @@
+"""
+Startup time of the WSGI application.
+
+Each measurement runs a fresh interpreter so nothing is already imported:
+it times ``import core.wsgi`` (settings, app registry, models, admin) and
+then loading the URLconf, which Django defers to the first request and
+which imports the views. ``python -X importtime`` attributes the time to
+individual modules.
+"""
+import json
+import os
+import subprocess
+import sys
+from collections import namedtuple
+from statistics import median
+
+from django.conf import settings
+
+
+StartupTiming = namedtuple('StartupTiming', ['wsgi_import', 'urlconf_load', 'modules'])
+ModuleTiming = namedtuple('ModuleTiming', ['name', 'self_us', 'cumulative_us'])
+
+SCRIPT = '''
+import json, time
+started = time.perf_counter()
+import core.wsgi
+imported = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+loaded = time.perf_counter()
+print(json.dumps([imported - started, loaded - imported]))
+'''
+
+
+def measure_once():
+    """Time one cold start; returns a ``StartupTiming`` in seconds."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='core.settings')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    wsgi_import, urlconf_load = json.loads(result.stdout.strip().splitlines()[-1])
+    return StartupTiming(wsgi_import, urlconf_load, parse_importtime(result.stderr))
+
+
+def measure(runs=5):
+    """Median timings over ``runs`` cold starts; modules from the last run."""
+    timings = [measure_once() for _ in range(runs)]
+    return StartupTiming(
+        median(timing.wsgi_import for timing in timings),
+        median(timing.urlconf_load for timing in timings),
+        timings[-1].modules,
+    )
+
+
+def parse_importtime(output):
+    """Module timings from ``-X importtime`` output, slowest cumulative first."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # header line
+        modules.append(ModuleTiming(name.strip(), int(self_us), int(cumulative_us)))
+    modules.sort(key=lambda module: module.cumulative_us, reverse=True)
+    return modules
@@ -0,0 +1,98 @@
+"""
+Per-user subscription summaries read by client dashboards.
+
+The rows are maintained by the subscription write hooks (see
+``UserSubscriptionSummary``); this module reads them in bulk and rebuilds
+them from scratch.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+
+from .caching import tiered_cache
+from .models import ArchivedUserRevenue, UserSubscription, UserSubscriptionSummary, effectively_active
+
+
+def summaries(user_ids, today=None):
+    """
+    ``{user_id: UserSubscriptionSummary}`` for ``user_ids`` in one query.
+    Users without a row get an unsaved empty summary; rows whose next expiry
+    has passed are recomputed first.
+    """
+    today = today or timezone.localdate()
+    user_ids = sorted(set(user_ids))
+    rows = UserSubscriptionSummary.objects.in_bulk(user_ids)
+    expired = [user_id for user_id, row in rows.items() if row.next_expiry and row.next_expiry < today]
+    if expired:
+        UserSubscriptionSummary.refresh_expiring(expired, today)
+        rows.update(UserSubscriptionSummary.objects.in_bulk(expired))
+    return {
+        user_id: rows.get(user_id) or UserSubscriptionSummary(user_id=user_id)
+        for user_id in user_ids
+    }
+
+
+def day_remaining(now=None):
+    """
+    Seconds left in the current day. Cached summaries expire by then, as
+    subscriptions ending today stop being active tomorrow.
+    """
+    now = now or timezone.localtime()
+    tomorrow = datetime.combine(now.date() + timedelta(days=1), time(), now.tzinfo)
+    return (tomorrow - now).total_seconds()
+
+
+def backfill_user_summaries(today=None, batch_size=5000):
+    """
+    Recompute every user summary from live subscriptions and the archive
+    totals. Returns the number of summaries written.
+    """
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Block subscription writes (not reads) until the summaries are
+            # replaced, so no incremental update is lost in between.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'LOCK TABLE %s IN SHARE MODE'
+                    % connection.ops.quote_name(UserSubscription._meta.db_table)
+                )
+
+        active = effectively_active(today)
+        totals = defaultdict(lambda: [0, 0.0, None])
+        live = (
+            UserSubscription.objects
+            .values('user_id')
+            .annotate(
+                active_count=Count('id', filter=active),
+                total_spend=Sum('plan_cost'),
+                next_expiry=Min('end_date', filter=active),
+            )
+            .order_by()
+        )
+        for row in live:
+            totals[row['user_id']] = [row['active_count'], row['total_spend'], row['next_expiry']]
+        # Archive totals are kept for deleted users too.
+        archived = ArchivedUserRevenue.objects.filter(user_id__in=User.objects.values('id'))
+        for user_id, total_cost in archived.values_list('user_id', 'total_cost'):
+            totals[user_id][1] += total_cost
+
+        UserSubscriptionSummary.objects.all().delete()
+        UserSubscriptionSummary.objects.bulk_create(
+            [
+                UserSubscriptionSummary(
+                    user_id=user_id,
+                    active_count=active_count,
+                    total_spend=total_spend,
+                    next_expiry=next_expiry,
+                )
+                for user_id, (active_count, total_spend, next_expiry) in sorted(totals.items())
+            ],
+            batch_size=batch_size,
+        )
+        tiered_cache.invalidate_tags('user-summaries')
+    return len(totals)
@@ -1,3 +1,1855 @@
-from django.test import TestCase
+import importlib
+import json
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from drf_spectacular.generators import SchemaGenerator
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework.views import APIView
+
+from . import (
+    analytics, loadtest, openapi, overlaps, partitioning, plan_migration, profiling, provisioning, reports, snapshot,
+    startup, throttling, urls,
+)
+from .caching import TieredCache, tiered_cache
+from .models import (
+    ArchivedRevenueRollup,
+    ArchivedUserRevenue,
+    ArchivedUserSubscription,
+    Feature,
+    MonthlyRevenue,
+    PlanMigration,
+    ProfilingTrigger,
+    ReportJob,
+    RequestProfile,
+    SubscriptionEvent,
+    SubscriptionPlan,
+    UserSubscription,
+    WebhookEndpoint,
+)
+from .archiving import archivable, archive_batch
+from .serializers import UserSubscriptionSerializer
+from .summaries import backfill_user_summaries, summaries
+from .views import AnalyticsDashboardView
+from .webhooks import WebhookDispatcher, sign_payload
+
+OVERLAP_MIGRATION = importlib.import_module('subscriptions.migrations.0009_usersubscription_overlap_constraints')
+
+
+class StubWebhookServer:
+    """
+    Local HTTP server recording webhook requests, failing on demand with a
+    500 or by closing the connection without an answer.
+    """
+
+    def __init__(self, fail=False, disconnect=False):
+        self.requests = []
+        self.fail = fail
+        self.disconnect = disconnect
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                stub.requests.append((dict(self.headers), body))
+                if stub.disconnect:
+                    self.close_connection = True
+                    return
+                self.send_response(500 if stub.fail else 204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/hook'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class WebhookDispatcherTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('subscriber', 'subscriber@example.com')
+        cls.plan = SubscriptionPlan.objects.create(name='Basic', price=9.99)
+
+    def create_subscriptions(self, count):
+        # Consecutive single-day subscriptions, since active ones of a user
+        # to a plan must not overlap.
+        UserSubscription.objects.bulk_create([
+            UserSubscription(
+                user=self.user,
+                plan=self.plan,
+                plan_cost=9.99,
+                start_date=date(2026, 1, 1) + timedelta(days=i),
+                end_date=date(2026, 1, 1) + timedelta(days=i)
+            )
+            for i in range(count)
+        ])
+
+    def test_delivers_batches_and_advances_cursor(self):
+        with StubWebhookServer() as stub:
+            endpoint = WebhookEndpoint.objects.create(
+                name='billing', url=stub.url, secret='s3cret', max_concurrency=2
+            )
+            self.create_subscriptions(5)
+
+            stats = WebhookDispatcher(batch_size=2).run_once()
+
+        self.assertEqual(stats['delivered'], 4)
+        self.assertEqual(stats['batches'], 2)
+        self.assertEqual(len(stub.requests), 2)
+        headers, body = stub.requests[0]
+        self.assertEqual(headers['X-Webhook-Signature'], sign_payload('s3cret', body))
+        self.assertEqual(
+            {event['event_type'] for event in json.loads(body)['events']},
+            {'created'}
+        )
+        endpoint.refresh_from_db()
+        delivered_ids = sorted(
+            event['id']
+            for _, body in stub.requests
+            for event in json.loads(body)['events']
+        )
+        self.assertEqual(endpoint.last_event_id, delivered_ids[-1])
+
+    def test_failure_backs_off_without_advancing(self):
+        with StubWebhookServer(fail=True) as stub:
+            endpoint = WebhookEndpoint.objects.create(name='billing', url=stub.url)
+            start = endpoint.last_event_id
+            self.create_subscriptions(3)
+
+            dispatcher = WebhookDispatcher(batch_size=10)
+            stats = dispatcher.run_once()
+            # The endpoint is deferred, so a second pass sends nothing.
+            dispatcher.run_once()
+
+        self.assertEqual(stats['failed_batches'], 1)
+        self.assertEqual(len(stub.requests), 1)
+        endpoint.refresh_from_db()
+        self.assertEqual(endpoint.last_event_id, start)
+        self.assertEqual(endpoint.consecutive_failures, 1)
+        self.assertIsNotNone(endpoint.next_attempt_at)
+
+    def test_broken_responses_fail_only_their_endpoint(self):
+        with StubWebhookServer(disconnect=True) as broken, StubWebhookServer() as working:
+            failing = WebhookEndpoint.objects.create(name='broken', url=broken.url)
+            delivered = WebhookEndpoint.objects.create(name='working', url=working.url)
+            self.create_subscriptions(3)
+
+            stats = WebhookDispatcher(batch_size=10).run_once()
+
+        self.assertEqual((stats['delivered'], stats['failed_batches']), (3, 1))
+        failing.refresh_from_db()
+        self.assertEqual(failing.consecutive_failures, 1)
+        self.assertIn('Remote end closed connection', failing.last_error)
+        delivered.refresh_from_db()
+        self.assertEqual(delivered.last_event_id, SubscriptionEvent.objects.latest('id').id)
+
+    def test_filtered_endpoints_move_past_other_events(self):
+        with StubWebhookServer() as stub:
+            endpoint = WebhookEndpoint.objects.create(
+                name='cancellations', url=stub.url, event_types=['cancelled']
+            )
+            self.create_subscriptions(3)
+
+            stats = WebhookDispatcher(batch_size=10).run_once()
+
+        self.assertEqual(stats['delivered'], 0)
+        self.assertEqual(stub.requests, [])
+        endpoint.refresh_from_db()
+        self.assertEqual(endpoint.last_event_id, SubscriptionEvent.objects.latest('id').id)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning requires PostgreSQL')
+class PartitioningTests(TestCase):
+
+    def constraints(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT conname, contype FROM pg_constraint WHERE conrelid = %s::regclass",
+                [partitioning.TABLE],
+            )
+            return dict(cursor.fetchall())
+
+    def indexes(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT indexname FROM pg_indexes WHERE tablename = %s AND schemaname = current_schema()',
+                [partitioning.TABLE],
+            )
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_rebuilds_keep_ids_constraints_and_foreign_keys(self):
+        user = User.objects.create_user('member')
+        plan = SubscriptionPlan.objects.create(name='Base', price=10)
+        first = UserSubscription.objects.create(user=user, plan=plan, plan_cost=10, start_date=date(2025, 1, 1))
+        constraints, indexes = self.constraints(), self.indexes()
+
+        partitioning.partition_table('monthly')
+        self.assertTrue(partitioning.is_partitioned())
+        second = UserSubscription.objects.create(user=user, plan=plan, plan_cost=10, start_date=date(2025, 3, 1))
+        self.assertGreater(second.pk, first.pk)
+        self.assertIn('usersub_active_unique_start', self.indexes())
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserSubscription.objects.bulk_create(
+                [UserSubscription(user=user, plan=plan, plan_cost=10, start_date=date(2025, 3, 1))]
+            )
+        self.assertEqual(
+            {name: kind for name, kind in self.constraints().items() if kind == 'f'},
+            {name: kind for name, kind in constraints.items() if kind == 'f'},
+        )
+
+        partitioning.unpartition_table()
+        self.assertFalse(partitioning.is_partitioned())
+        self.assertEqual(self.constraints(), constraints)
+        self.assertEqual(self.indexes(), indexes)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'",
+                [partitioning.TABLE],
+            )
+            self.assertEqual(cursor.fetchone()[0], 'd')
+        third = UserSubscription.objects.create(user=user, plan=plan, plan_cost=10, start_date=date(2025, 5, 1))
+        self.assertGreater(third.pk, second.pk)
+
+
+class UserSubscriptionAdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.plans = [
+            SubscriptionPlan.objects.create(name='Monthly', price=9.99),
+            SubscriptionPlan.objects.create(
+                name='Yearly', price=99.99, billing_cycle='yearly'
+            ),
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_subscriptions(self, count):
+        users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com')
+            for i in range(User.objects.count(), User.objects.count() + count)
+        ])
+        UserSubscription.objects.bulk_create([
+            UserSubscription(
+                user=user,
+                plan=self.plans[i % 2],
+                plan_cost=9.99,
+                start_date=date(2025 + i % 2, 1 + i % 12, 1)
+            )
+            for i, user in enumerate(users)
+        ])
+
+    def changelist_queries(self, query=''):
+        url = reverse('admin:subscriptions_usersubscription_changelist') + query
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelist_query_count_is_bounded(self):
+        self.create_subscriptions(5)
+        small = self.changelist_queries()
+        self.create_subscriptions(60)
+        large = self.changelist_queries()
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 6)
+
+    def test_filtered_changelist_query_count_is_bounded(self):
+        self.create_subscriptions(60)
+        queries = self.changelist_queries('?billing_cycle=yearly&start_year=2026&status=active')
+
+        self.assertLessEqual(queries, 6)
+
+
+class OpenApiSchemaTests(SimpleTestCase):
+
+    def test_artefacts_match_code(self):
+        stale = openapi.stale()
+        self.assertEqual(
+            stale, [],
+            'OpenAPI schema artefacts are out of date; run `python manage.py build_openapi_schema`.'
+        )
+
+    def test_schema_view_serves_artefacts_without_generating(self):
+        with mock.patch.object(SchemaGenerator, 'get_schema', side_effect=AssertionError):
+            yaml_response = self.client.get(reverse('schema'))
+            json_response = self.client.get(reverse('schema'), {'format': 'json'})
+
+        self.assertEqual(yaml_response.status_code, 200)
+        self.assertEqual(yaml_response.content, openapi.load('yaml'))
+        self.assertTrue(yaml_response['Content-Type'].startswith('application/vnd.oai.openapi'))
+        self.assertEqual(json_response.content, openapi.load('json'))
+        self.assertTrue(json_response['Content-Type'].startswith('application/vnd.oai.openapi+json'))
+
+
+class StartupBudgetTests(SimpleTestCase):
+
+    def test_wsgi_import_within_budget(self):
+        # Best of three cold starts, to ride out a busy machine.
+        wsgi_import = min(startup.measure_once().wsgi_import for _ in range(3))
+        self.assertLess(
+            wsgi_import, settings.STARTUP_IMPORT_BUDGET,
+            'Importing core.wsgi is over STARTUP_IMPORT_BUDGET; see `python manage.py measure_startup`.'
+        )
+
+    def test_numpy_is_not_imported_at_startup(self):
+        # Only the snapshot analytics engine needs it, on first use.
+        modules = {module.name for module in startup.measure_once().modules}
+        self.assertIn('subscriptions.views', modules)
+        self.assertNotIn('numpy', modules)
+
+
+class SubscriptionChangesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member')
+        cls.plan = SubscriptionPlan.objects.create(name='Base', price=10)
+        cls.subscriptions = [
+            UserSubscription.objects.create(
+                user=cls.user, plan=cls.plan, plan_cost=10, start_date=date(2026, month, 1), end_date=None
+            )
+            for month in (1, 2, 3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def changes(self, **params):
+        response = self.client.get(reverse('usersubscription-changes'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_resume_from_the_cursor(self):
+        first = self.changes(limit=2)
+        self.assertEqual([event['event_type'] for event in first['results']], ['created', 'created'])
+        self.assertTrue(first['has_more'])
+        self.assertEqual(first['next_cursor'], first['results'][-1]['id'])
+
+        second = self.changes(since=first['next_cursor'], limit=2)
+        self.assertEqual(
+            [event['subscription_id'] for event in second['results']], [self.subscriptions[2].pk]
+        )
+        self.assertFalse(second['has_more'])
+
+        last = self.changes(since=second['next_cursor'])
+        self.assertEqual(last['results'], [])
+        self.assertEqual(last['next_cursor'], second['next_cursor'])
+
+    def test_edits_of_cost_and_dates_are_updated_events(self):
+        subscription = self.subscriptions[0]
+        cursor = SubscriptionEvent.objects.latest('id').id
+        subscription.plan_cost = 12.5
+        subscription.end_date = date(2026, 6, 30)
+        subscription.save()
+
+        [event] = self.changes(since=cursor)['results']
+        self.assertEqual(event['event_type'], 'updated')
+        self.assertEqual(event['changes'], {'plan_cost': [10, 12.5], 'end_date': [None, '2026-06-30']})
+
+        UserSubscription.objects.filter(pk=subscription.pk).update(status='suspended', start_date=date(2026, 1, 2))
+        self.assertEqual(
+            [(event['event_type'], event['changes']) for event in self.changes(since=event['id'])['results']],
+            [('status_changed', {}), ('updated', {'start_date': ['2026-01-01', '2026-01-02']})],
+        )
+
+    def test_bulk_updates_log_values_as_stored(self):
+        subscription = self.subscriptions[0]
+        cursor = SubscriptionEvent.objects.latest('id').id
+        # Unchanged values given in other types are not changes; expressions
+        # are read back.
+        UserSubscription.objects.filter(pk=subscription.pk).update(
+            start_date='2026-01-01', plan_cost=Decimal('10'), user=subscription.user
+        )
+        UserSubscription.objects.filter(pk=subscription.pk).update(plan_cost=F('plan_cost') * 2)
+        self.assertEqual(
+            [(event['event_type'], event['changes']) for event in self.changes(since=cursor)['results']],
+            [('updated', {'plan_cost': [10, 20]})],
+        )
+
+    def test_events_after_a_gap_wait_until_it_settles(self):
+        first, gap, last = SubscriptionEvent.objects.order_by('id')
+        # As if the middle event's transaction had not committed yet.
+        SubscriptionEvent.objects.filter(pk=gap.pk).delete()
+
+        self.assertEqual(SubscriptionEvent.read(0, 10), ([first], False))
+        self.assertEqual(self.changes()['next_cursor'], first.id)
+
+        settled = timezone.now() + timedelta(seconds=settings.SUBSCRIPTION_EVENT_SETTLE_SECONDS + 1)
+        with mock.patch('subscriptions.models.timezone.now', return_value=settled):
+            self.assertEqual(SubscriptionEvent.read(first.id, 10), ([last], False))
+
+
+class ArchivingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [User.objects.create_user(f'member{index}') for index in range(3)]
+        plan = SubscriptionPlan.objects.create(name='Base', price=10)
+        # Rows 0, 1, 3 and 5 ended before 2026; 0, 1 and 3 share a rollup.
+        cls.subscriptions = [
+            UserSubscription.objects.create(
+                user=users[user], plan=plan, plan_cost=cost, start_date=start_date, end_date=end_date
+            )
+            for user, cost, start_date, end_date in [
+                (0, 10, date(2025, 1, 1), date(2025, 2, 1)),
+                (1, 20, date(2025, 1, 1), date(2025, 3, 1)),
+                (0, 30, date(2025, 2, 2), None),
+                (2, 40, date(2025, 1, 1), date(2025, 2, 1)),
+                (1, 50, date(2025, 5, 1), date(2026, 12, 1)),
+                (2, 60, date(2025, 3, 1), date(2025, 4, 1)),
+            ]
+        ]
+
+    def totals(self):
+        archived = analytics.archived_totals()
+        by_user = Counter()
+        for user_id, cost in [
+            *UserSubscription.objects.values_list('user_id', 'plan_cost'),
+            *ArchivedUserRevenue.objects.values_list('user_id', 'total_cost'),
+        ]:
+            by_user[user_id] += cost
+        return (
+            UserSubscription.objects.count() + archived['subscription_count'],
+            sum(UserSubscription.objects.values_list('plan_cost', flat=True)) + archived['total_cost'],
+            by_user,
+        )
+
+    def test_rollups_and_live_rows_keep_the_totals(self):
+        before = self.totals()
+        after_id = 0
+        while after_id is not None:
+            _, after_id = archive_batch(date(2026, 1, 1), 1, after_id)
+
+        self.assertEqual(UserSubscription.objects.count(), 2)
+        self.assertEqual(self.totals(), before)
+        self.assertEqual(
+            list(ArchivedRevenueRollup.objects.order_by('start_date').values_list(
+                'start_date', 'subscription_count', 'total_cost'
+            )),
+            [(date(2025, 1, 1), 3, 70), (date(2025, 3, 1), 1, 60)],
+        )
+
+    def test_batches_resume_after_the_last_id(self):
+        horizon = date(2026, 1, 1)
+        first, second, _, fourth, _, sixth = self.subscriptions
+        self.assertEqual(archive_batch(horizon, 2), (2, second.pk))
+        # Rows up to after_id are left for another run.
+        self.assertEqual(archive_batch(horizon, 10, after_id=fourth.pk), (1, sixth.pk))
+        self.assertTrue(UserSubscription.objects.filter(pk=fourth.pk).exists())
+        self.assertEqual(archive_batch(horizon, 10, after_id=second.pk), (1, fourth.pk))
+        self.assertEqual(archive_batch(horizon, 10), (0, None))
+        self.assertEqual(
+            set(ArchivedUserSubscription.objects.values_list('id', flat=True)),
+            {first.pk, second.pk, fourth.pk, sixth.pk},
+        )
+
+    def test_archiving_logs_archived_events_and_keeps_monthly_revenue(self):
+        revenue = analytics.monthly_revenue_series(date(2025, 1, 1), date(2025, 12, 1))
+        archived, _ = archive_batch(date(2026, 1, 1), 10)
+        self.assertEqual(archived, 4)
+        self.assertEqual(analytics.monthly_revenue_series(date(2025, 1, 1), date(2025, 12, 1)), revenue)
+        self.assertEqual(
+            list(SubscriptionEvent.objects.filter(subscription_id=self.subscriptions[0].pk).values_list(
+                'event_type', flat=True
+            )),
+            ['created', 'archived'],
+        )
+
+    def test_cancellations_date_from_the_event_log(self):
+        horizon = timezone.localdate() - timedelta(days=30)
+        old, recent = self.subscriptions[2], self.subscriptions[4]
+        for subscription in (old, recent):
+            subscription.status = 'cancelled'
+            subscription.save()
+        SubscriptionEvent.objects.filter(subscription_id=old.pk, event_type='cancelled').update(
+            occurred_at=timezone.now() - timedelta(days=60)
+        )
+        # Touched after its cancellation, e.g. by a plan migration.
+        UserSubscription.objects.filter(pk=old.pk).update(plan_cost=35)
+
+        self.assertEqual(
+            set(archivable(horizon).values_list('id', flat=True)),
+            {subscription.pk for subscription in self.subscriptions if subscription.end_date is not None
+             and subscription.end_date < horizon} | {old.pk},
+        )
+
+
+class MonthlyRevenueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member')
+        cls.plan = SubscriptionPlan.objects.create(name='Base', price=10)
+
+    def subscribe(self, start_date, cost=10, **fields):
+        return UserSubscription.objects.create(
+            user=self.user, plan=self.plan, plan_cost=cost, start_date=start_date, **fields
+        )
+
+    def series(self, first, last):
+        return [
+            (row['month'], row['subscription_count'], row['total_revenue'])
+            for row in analytics.monthly_revenue_series(first, last)
+        ]
+
+    def test_series_is_zero_filled_and_matches_a_backfill(self):
+        today = timezone.localdate()
+        current = analytics.month_start(today)
+        for day in (1, 5, 9, 13):
+            self.subscribe(date(2026, 1, day), cost=day)
+        edited = self.subscribe(date(2026, 3, 2), cost=20)
+        deleted = self.subscribe(date(2026, 3, 3))
+        archived = self.subscribe(date(2025, 11, 1), end_date=date(2025, 11, 30), cost=4)
+        self.subscribe(current, cost=6)
+
+        edited.plan_cost = 25
+        edited.save()
+        UserSubscription.objects.filter(pk=edited.pk).update(start_date=date(2026, 4, 2))
+        deleted.delete()
+        archive_batch(date(2025, 12, 1), 10)
+        self.assertFalse(UserSubscription.objects.filter(pk=archived.pk).exists())
+
+        expected = [
+            (date(2025, 11, 1), 1, 4), (date(2025, 12, 1), 0, 0), (date(2026, 1, 1), 4, 28),
+            (date(2026, 2, 1), 0, 0), (date(2026, 3, 1), 0, 0), (date(2026, 4, 1), 1, 25),
+        ]
+        self.assertEqual(self.series(date(2025, 11, 1), date(2026, 4, 30)), expected)
+        self.assertEqual(self.series(current, current), [(current, 1, 6)])
+
+        analytics.backfill_monthly_revenue()
+        self.assertEqual(self.series(date(2025, 11, 1), date(2026, 4, 1)), expected)
+        self.assertEqual(self.series(current, current), [(current, 1, 6)])
+
+    def test_writes_to_a_month_are_spread_over_slots(self):
+        with mock.patch('subscriptions.models.random.randrange', side_effect=[0, 3, 3]):
+            self.subscribe(date(2026, 1, 1), cost=1)
+            self.subscribe(date(2026, 1, 2), cost=2)
+            self.subscribe(date(2026, 1, 3), cost=4)
+        self.assertEqual(
+            list(MonthlyRevenue.objects.values_list('slot', 'subscription_count', 'total_revenue')),
+            [(0, 1, 1), (3, 2, 6)],
+        )
+        self.assertEqual(self.series(date(2026, 1, 1), date(2026, 1, 1)), [(date(2026, 1, 1), 3, 7)])
+
+    def test_dashboard_keeps_the_history_shape(self):
+        today = timezone.localdate()
+        current = analytics.month_start(today)
+        last_month = analytics.add_months(current, -1)
+        self.subscribe(last_month, cost=7)
+        self.subscribe(analytics.add_months(current, -13), cost=3)
+        self.subscribe(current, cost=5)
+
+        history = analytics.dashboard_metrics(today)['monthly_revenue_history']
+        self.assertEqual(history, [{'month': last_month, 'total_revenue': 7}])
+
+    def test_endpoint_ranges(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.subscribe(date(2026, 2, 10), cost=8)
+        response = client.get(
+            reverse('analytics-monthly-revenue'), {'start_month': '2026-01', 'end_month': '2026-03'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['month'], row['total_revenue']) for row in response.data],
+            [(date(2026, 1, 1), 0), (date(2026, 2, 1), 8), (date(2026, 3, 1), 0)],
+        )
+        response = client.get(
+            reverse('analytics-monthly-revenue'), {'start_month': '2026-03', 'end_month': '2026-01'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class RevenueBreakdownTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analyst')
+        reports, exports = Feature.objects.create(name='Reports'), Feature.objects.create(name='Exports')
+        cls.basic = SubscriptionPlan.objects.create(name='Basic', price=10)
+        cls.basic.features.set([reports, exports])
+        cls.yearly = SubscriptionPlan.objects.create(name='Yearly', price=100, billing_cycle='yearly')
+        cls.yearly.features.set([reports])
+        cls.features = reports, exports
+        for index, (plan, cost, start_date, status) in enumerate([
+            (cls.basic, 10, date(2026, 1, 5), 'active'),
+            (cls.basic, 12, date(2026, 1, 20), 'cancelled'),
+            (cls.basic, 10, date(2026, 2, 1), 'active'),
+            (cls.yearly, 100, date(2026, 2, 3), 'active'),
+            (cls.yearly, 90, date(2026, 3, 1), 'active'),
+        ]):
+            UserSubscription.objects.create(
+                user=User.objects.create_user(f'member{index}'), plan=plan, plan_cost=cost,
+                start_date=start_date, status=status,
+            )
+
+    def setUp(self):
+        tiered_cache.clear()
+        self.addCleanup(tiered_cache.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def breakdown(self, **params):
+        return self.client.get(
+            reverse('analytics-revenue'),
+            {'start_date_from': '2026-01-01', 'start_date_to': '2026-03-01', **params},
+        )
+
+    def test_groups_by_the_requested_dimensions(self):
+        response = self.breakdown(group_by='start_month,plan', metrics=['count', 'sum'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data['group_by'], response.data['metrics']), (['plan', 'start_month'], ['count', 'sum'])
+        )
+        self.assertEqual(
+            [(row['plan_name'], row['start_month'], row['count'], row['sum']) for row in response.data['results']],
+            [
+                ('Basic', date(2026, 1, 1), 2, 22),
+                ('Basic', date(2026, 2, 1), 1, 10),
+                ('Yearly', date(2026, 2, 1), 1, 100),
+            ],
+        )
+        # Subscriptions count once per feature of their plan; filters narrow the rows.
+        response = self.breakdown(group_by='feature', status='active')
+        self.assertEqual(
+            [(row['feature_name'], row['sum']) for row in response.data['results']],
+            [('Reports', 120), ('Exports', 20)],
+        )
+
+    def test_only_whitelisted_dimensions_and_metrics(self):
+        response = self.breakdown(group_by='plan,user_id', metrics='max')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Unsupported dimensions: user_id', str(response.data['group_by'][0]))
+        self.assertIn('Unsupported metrics: max', str(response.data['metrics'][0]))
+
+    def test_oversized_breakdowns_are_rejected(self):
+        with self.assertRaises(analytics.TooManyGroups):
+            analytics.revenue_breakdown(['status'], ['sum'], date(2026, 1, 1), date(2026, 3, 1), max_groups=1)
+        self.assertEqual(
+            analytics.revenue_breakdown(['status'], ['sum'], date(2026, 1, 1), date(2026, 3, 1), max_groups=2)[0],
+            [{'status': 'active', 'sum': 120}, {'status': 'cancelled', 'sum': 12}],
+        )
+        with override_settings(REVENUE_BREAKDOWN_MAX_GROUPS=2):
+            response = self.breakdown(group_by='plan,status')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('exceeds 2 groups', response.data['error'])
+
+    def test_archived_subscriptions_are_left_out(self):
+        UserSubscription.objects.filter(plan=self.basic).update(end_date=date(2026, 2, 28))
+        archive_batch(date(2026, 3, 1), 10)
+        response = self.breakdown(group_by='plan')
+        self.assertEqual(
+            [(row['plan_name'], row['sum']) for row in response.data['results']], [('Yearly', 100)]
+        )
+
+
+class UserSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.users = [User.objects.create_user(f'member{index}') for index in range(3)]
+        cls.plans = [SubscriptionPlan.objects.create(name=name, price=10) for name in ('Base', 'Plus')]
+
+    def setUp(self):
+        tiered_cache.clear()
+        self.addCleanup(tiered_cache.clear)
+
+    def subscribe(self, user, plan, start_date, end_date=None, cost=10, status='active'):
+        return UserSubscription.objects.create(
+            user=user, plan=plan, plan_cost=cost, start_date=start_date, end_date=end_date, status=status
+        )
+
+    def current(self):
+        return {
+            user_id: (summary.active_count, round(summary.total_spend, 2), summary.next_expiry)
+            for user_id, summary in summaries([user.pk for user in self.users]).items()
+        }
+
+    def test_incremental_counters_match_a_backfill(self):
+        today = timezone.localdate()
+        first, second, third = self.users
+        base, plus = self.plans
+        open_ended = self.subscribe(first, base, date(2025, 1, 1))
+        ending = self.subscribe(first, plus, date(2025, 1, 1), today + timedelta(days=30), cost=25)
+        self.subscribe(second, base, date(2025, 1, 1), today - timedelta(days=10), cost=7.5)
+        moved = self.subscribe(second, plus, date(2025, 6, 1), cost=12)
+        self.subscribe(third, base, date(2025, 1, 1), status='cancelled', cost=3)
+        deleted = self.subscribe(third, plus, date(2025, 1, 1), today + timedelta(days=5))
+
+        open_ended.plan_cost = 11
+        open_ended.save()
+        ending.end_date = today + timedelta(days=3)
+        ending.save()
+        UserSubscription.objects.filter(pk=moved.pk).update(user=third, status='suspended')
+        UserSubscription.objects.filter(pk=moved.pk).update(status='active', end_date=today + timedelta(days=60))
+        deleted.delete()
+        # Archives the subscription that ended ten days ago; its spend stays.
+        self.assertEqual(archive_batch(today, 10)[0], 1)
+
+        incremental = self.current()
+        backfill_user_summaries()
+        self.assertEqual(incremental, self.current())
+        self.assertEqual(incremental[first.pk], (2, 36, today + timedelta(days=3)))
+        self.assertEqual(incremental[third.pk], (1, 15, today + timedelta(days=60)))
+
+    def test_expired_subscriptions_are_not_active(self):
+        today = timezone.localdate()
+        member, _, _ = self.users
+        base, plus = self.plans
+        counted = [
+            self.subscribe(member, base, date(2025, 1, 1), cost=5),
+            self.subscribe(member, plus, date(2025, 1, 1), today, cost=7),
+        ]
+        self.subscribe(member, base, date(2024, 1, 1), today - timedelta(days=1), cost=11)
+        self.subscribe(member, plus, date(2024, 1, 1), status='cancelled', cost=13)
+
+        self.assertEqual(
+            set(UserSubscription.objects.effectively_active(today).values_list('pk', flat=True)),
+            {subscription.pk for subscription in counted},
+        )
+        self.assertEqual(analytics.dashboard_metrics(today)['total_recurring_revenue'], 12)
+        self.assertEqual(self.current()[member.pk][0], 2)
+
+    def test_summary_access(self):
+        member, other, _ = self.users
+        self.subscribe(member, self.plans[0], date(2025, 1, 1))
+        client = APIClient()
+
+        client.force_authenticate(member)
+        own = client.get(reverse('user-summary', args=[member.pk]))
+        self.assertEqual(own.status_code, 200)
+        self.assertEqual((own.data['active_count'], own.data['total_spend']), (1, 10))
+        self.assertEqual(client.get(reverse('user-summary', args=[other.pk])).status_code, 403)
+        self.assertEqual(client.get(reverse('user-summary', args=[0])).status_code, 403)
+
+        client.force_authenticate(self.admin)
+        self.assertEqual(client.get(reverse('user-summary', args=[member.pk])).status_code, 200)
+        # Users who never subscribed have zero totals; unknown users are 404.
+        never = client.get(reverse('user-summary', args=[other.pk]))
+        self.assertEqual((never.status_code, never.data['active_count']), (200, 0))
+        self.assertEqual(client.get(reverse('user-summary', args=[0])).status_code, 404)
+        self.assertEqual(client.get(reverse('user-summary', args=['me'])).status_code, 404)
+
+        client.force_authenticate(None)
+        self.assertEqual(client.get(reverse('user-summary', args=[member.pk])).status_code, 401)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class UserProvisioningTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        User.objects.create_user('taken', 'taken@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def provision(self, rows, **data):
+        return self.client.post(reverse('user-bulk-provision'), {'users': rows, **data}, format='json')
+
+    def test_bulk_provisioning_skips_conflicts_and_keeps_given_hashes(self):
+        encoded = make_password('Imported-secret!')
+        with mock.patch.object(provisioning, 'make_password', wraps=make_password) as hashing:
+            response = self.provision([
+                {'username': 'partner1', 'email': 'partner1@example.com', 'password': 'Sup3r-secret!'},
+                {'username': 'partner2', 'email': 'partner2@example.com', 'password_hash': encoded},
+                {'username': 'taken', 'email': 'other@example.com', 'password': 'Sup3r-secret!'},
+                {'username': 'partner3', 'email': 'taken@example.com', 'password': 'Sup3r-secret!'},
+                {'username': 'partner1', 'email': 'partner1b@example.com', 'password': 'Sup3r-secret!'},
+            ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(sorted(response.data['errors']), [2, 3, 4])
+        self.assertIn('username', response.data['errors'][2])
+        self.assertIn('email', response.data['errors'][3])
+        self.assertIn('username', response.data['errors'][4])
+        # Only the raw password was hashed.
+        self.assertEqual(hashing.call_count, 1)
+
+        self.assertTrue(User.objects.get(username='partner1').check_password('Sup3r-secret!'))
+        self.assertEqual(User.objects.get(username='partner2').password, encoded)
+        self.assertEqual(
+            set(Token.objects.filter(user__username__startswith='partner').values_list('user__username', flat=True)),
+            {'partner1', 'partner2'},
+        )
+
+    def test_bulk_provisioning_validates_raw_passwords(self):
+        response = self.provision([
+            {'username': 'partner1', 'password': 'Sup3r-secret!'},
+            {'username': 'partner2', 'password': '1234'},
+            {'username': 'partner3', 'password': 'partner3'},
+            {'username': 'partner4', 'password': 'Sup3r-secret!', 'password_hash': make_password('x')},
+        ])
+        self.assertEqual(response.status_code, 400)
+        errors = response.data['users']
+        self.assertEqual(errors[0], {})
+        self.assertIn('password', errors[1])
+        self.assertIn('password', errors[2])
+        self.assertIn('non_field_errors', errors[3])
+        self.assertFalse(User.objects.filter(username__startswith='partner').exists())
+
+    def test_signup(self):
+        client = APIClient()
+        signup = {
+            'username': 'newcomer', 'email': 'newcomer@example.com',
+            'password': 'Sup3r-secret!', 'password_confirm': 'Sup3r-secret!',
+        }
+        for changes, field in (
+            ({'password_confirm': 'Other-secret!'}, 'password'),
+            ({'password': 'password', 'password_confirm': 'password'}, 'password'),
+            ({'email': 'taken@example.com'}, 'email'),
+            ({'username': 'taken'}, 'username'),
+        ):
+            response = client.post(reverse('user-list'), {**signup, **changes}, format='json')
+            self.assertEqual(response.status_code, 400, changes)
+            self.assertIn(field, response.data)
+
+        self.assertEqual(client.post(reverse('user-list'), signup, format='json').status_code, 201)
+        self.assertTrue(User.objects.get(username='newcomer').check_password('Sup3r-secret!'))
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_TOKEN='profile-token', PROFILING_SAMPLE_RATE=0.0)
+class ProfilingMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(PROFILING_DIR=directory.name))
+        profiling.triggers.clear()
+        self.addCleanup(profiling.triggers.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, path='/api/subscriptions/', **headers):
+        return self.client.get(path, {'search': 'secret-term'}, headers=headers)
+
+    def queries(self, response):
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        with zipfile.ZipFile(profile.artefact_path) as archive:
+            return json.loads(archive.read('queries.json'))
+
+    def test_header_with_the_token_profiles_without_query_params(self):
+        self.assertNotIn('X-Profile-Id', self.get(**{'X-Profile': 'wrong-token'}))
+
+        response = self.get(**{'X-Profile': 'profile-token; mode=sample'})
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.trigger, profile.mode, profile.status_code), ('header', 'sample', 200))
+        queries = self.queries(response)
+        self.assertEqual(len(queries), profile.query_count)
+        self.assertTrue(queries)
+        self.assertNotIn('secret-term', json.dumps(queries))
+        self.assertEqual(profile.path, '/api/subscriptions/?search=%s')
+
+        with self.settings(PROFILING_RECORD_PARAMS=True):
+            response = self.get(**{'X-Profile': 'profile-token'})
+        self.assertIn('secret-term', json.dumps(self.queries(response)))
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(profile.path, '/api/subscriptions/?search=secret-term')
+
+    def test_admin_triggers_profile_matching_requests_until_used_up(self):
+        ProfilingTrigger.objects.create(path_prefix='/api/subscriptions/', method='get', remaining=2)
+        ProfilingTrigger.objects.create(path_prefix='/api/plans/')
+
+        responses = [self.get() for _ in range(3)]
+        self.assertEqual(['X-Profile-Id' in response for response in responses], [True, True, False])
+        self.assertEqual(
+            list(RequestProfile.objects.values_list('trigger', 'mode')), [('admin', 'cprofile')] * 2
+        )
+        self.assertEqual(ProfilingTrigger.objects.get(path_prefix='/api/subscriptions/').remaining, 0)
+
+    def test_sampled_requests_use_the_stack_sampler(self):
+        self.assertNotIn('X-Profile-Id', self.get())
+        with self.settings(PROFILING_SAMPLE_RATE=1.0):
+            response = self.get()
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.trigger, profile.mode), ('sample', 'sample'))
+
+    def test_old_profiles_are_pruned_in_one_batch(self):
+        for _ in range(4):
+            self.get(**{'X-Profile': 'profile-token'})
+        newest = list(RequestProfile.objects.order_by('-id')[:2])
+        paths = [profile.artefact_path for profile in RequestProfile.objects.all()]
+
+        self.assertEqual(profiling.prune_profiles(keep=2), 2)
+        self.assertEqual(list(RequestProfile.objects.order_by('-id')), newest)
+        self.assertEqual(sorted(path.exists() for path in paths), [False, False, True, True])
+        self.assertEqual(profiling.prune_profiles(keep=2), 0)
+
+    def test_disabled_middleware_is_not_loaded(self):
+        with self.settings(PROFILING_ENABLED=False), self.assertRaises(MiddlewareNotUsed):
+            profiling.ProfilingMiddleware(lambda request: None)
+
+
+class ThrottlingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member', password='password')
+
+    def setUp(self):
+        tiered_cache.clear()
+        self.addCleanup(tiered_cache.clear)
+
+    def login(self, address, forwarded_for=None):
+        headers = {'HTTP_X_FORWARDED_FOR': forwarded_for} if forwarded_for else {}
+        return self.client.post(
+            reverse('user-login'), {'username': 'Member', 'password': 'wrong'},
+            REMOTE_ADDR=address, **headers,
+        )
+
+    @mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, {'login': '100/min', 'login_username': '2/min'})
+    def test_login_attempts_per_username_and_address(self):
+        self.assertEqual([self.login('10.0.0.1').status_code for _ in range(2)], [401, 401])
+        throttled = self.login('10.0.0.1')
+        self.assertEqual(throttled.status_code, 429)
+        # Half a minute until the next token at 2/min.
+        self.assertEqual(throttled['Retry-After'], '30')
+        # A forged X-Forwarded-For is ignored without trusted proxies...
+        self.assertEqual(self.login('10.0.0.1', forwarded_for='192.0.2.1').status_code, 429)
+        # ... and the account is not locked for other addresses.
+        self.assertEqual(self.login('10.0.0.2').status_code, 401)
+
+    @mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, {'login': '100/min', 'login_username': '1/min'})
+    def test_forwarded_addresses_are_used_behind_trusted_proxies(self):
+        with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            self.assertEqual(self.login('10.0.0.1', forwarded_for='192.0.2.1').status_code, 401)
+            self.assertEqual(self.login('10.0.0.1', forwarded_for='192.0.2.1').status_code, 429)
+            self.assertEqual(self.login('10.0.0.1', forwarded_for='192.0.2.2').status_code, 401)
+
+    @override_settings(CONCURRENCY_LIMITS={'analytics': 1})
+    def test_concurrency_slot_is_held_while_the_response_is_rendered(self):
+        limiter = throttling.get_concurrency_limiter('analytics')
+        request = APIRequestFactory().get(reverse('analytics'))
+        force_authenticate(request, User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        view = AnalyticsDashboardView.as_view()
+
+        response = view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_rendered)
+
+        self.assertTrue(limiter.acquire())
+        busy = view(request)
+        self.assertEqual(busy.status_code, 503)
+        self.assertEqual(busy['Retry-After'], '1')
+        limiter.release()
+
+        with mock.patch.object(AnalyticsDashboardView, 'get', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                view(request)
+        self.assertTrue(limiter.acquire())
+        limiter.release()
+
+    @override_settings(CONCURRENCY_LIMITS={'analytics': 1})
+    def test_streaming_responses_hold_the_slot_until_closed(self):
+        class StreamingView(throttling.ConcurrencyLimitMixin, APIView):
+            concurrency_scope = 'analytics'
+            permission_classes = []
+
+            def get(self, request):
+                return StreamingHttpResponse(iter([b'chunk']))
+
+        limiter = throttling.get_concurrency_limiter('analytics')
+        response = StreamingView.as_view()(APIRequestFactory().get('/'))
+        self.assertEqual(b''.join(response), b'chunk')
+        self.assertFalse(limiter.acquire())
+
+        response.close()
+        self.assertTrue(limiter.acquire())
+        limiter.release()
+
+
+class ConditionalRequestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member')
+        cls.plan = SubscriptionPlan.objects.create(name='Base', price=10)
+        cls.subscription = UserSubscription.objects.create(
+            user=cls.user, plan=cls.plan, plan_cost=10, start_date=date(2026, 1, 1)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('usersubscription-detail', args=[self.subscription.pk])
+
+    def patch(self, cost, **headers):
+        return self.client.patch(self.url, {'plan_cost': cost}, format='json', headers=headers)
+
+    def test_etags_round_trip_and_stale_writes_fail(self):
+        tag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': tag}).status_code, 304)
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': f'W/{tag}'}).status_code, 304)
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': '*'}).status_code, 304)
+
+        updated = self.patch(12, **{'If-Match': tag})
+        self.assertEqual(updated.status_code, 200)
+        self.assertNotEqual(updated['ETag'], tag)
+        self.assertEqual(updated['ETag'], f'"{updated.data["version"]}"')
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': tag}).status_code, 200)
+
+        # Another writer got there first with the old tag.
+        stale = self.patch(13, **{'If-Match': tag})
+        self.assertEqual(stale.status_code, 412)
+        # Weak tags never match If-Match.
+        self.assertEqual(self.patch(13, **{'If-Match': f'W/{updated["ETag"]}'}).status_code, 412)
+        self.assertEqual(self.patch(13, **{'If-Match': f'"0", {updated["ETag"]}'}).status_code, 200)
+        self.assertEqual(UserSubscription.objects.get(pk=self.subscription.pk).plan_cost, 13)
+
+    def test_if_none_match_on_updates(self):
+        tag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.patch(12, **{'If-None-Match': '*'}).status_code, 412)
+        self.assertEqual(self.patch(12, **{'If-None-Match': tag}).status_code, 412)
+        self.assertEqual(UserSubscription.objects.get(pk=self.subscription.pk).plan_cost, 10)
+        self.assertEqual(self.patch(12, **{'If-None-Match': '"0"'}).status_code, 200)
+
+    @override_settings(SUBSCRIPTION_REQUIRE_IF_MATCH=True)
+    def test_updates_without_if_match_can_be_required(self):
+        self.assertEqual(self.patch(12).status_code, 428)
+        self.assertEqual(self.patch(12, **{'If-Match': '*'}).status_code, 200)
+
+
+class OverlapTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('member')
+        cls.plan, cls.other_plan = (
+            SubscriptionPlan.objects.create(name=name, price=10) for name in ('Base', 'Other')
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def subscribe(self, start_date, end_date=None, plan=None, status='active'):
+        return UserSubscription.objects.create(
+            user=self.user, plan=plan or self.plan, plan_cost=10,
+            start_date=start_date, end_date=end_date, status=status,
+        )
+
+    @skipUnless(connection.vendor != 'postgresql', 'The exclusion constraint rejects overlapping rows')
+    def test_sweep_reports_overlaps_and_cancels_all_but_the_earliest(self):
+        january = self.subscribe(date(2026, 1, 1), date(2026, 1, 31))
+        spanning = self.subscribe(date(2026, 1, 15), date(2026, 2, 15))
+        # Overlaps only the row above, which reaches further than January.
+        february = self.subscribe(date(2026, 2, 10), date(2026, 3, 1))
+        open_ended = self.subscribe(date(2026, 4, 1))
+        may = self.subscribe(date(2026, 5, 1), date(2026, 6, 1))
+        self.subscribe(date(2026, 1, 10), plan=self.other_plan)
+        cancelled = self.subscribe(date(2026, 1, 10), date(2026, 1, 20), status='cancelled')
+
+        self.assertEqual(
+            [(overlap.subscription_id, overlap.other_id) for overlap in overlaps.find_overlaps(chunk_size=2)],
+            [(spanning.pk, january.pk), (february.pk, spanning.pk), (may.pk, open_ended.pk)],
+        )
+        # The pre-check of the migration adding the constraints sweeps alike.
+        with self.assertRaises(RuntimeError) as raised:
+            OVERLAP_MIGRATION.check_existing_rows(django_apps, None)
+        self.assertEqual(
+            re.findall(r'Subscription (\d+) overlaps (\d+)', str(raised.exception)),
+            [
+                (str(spanning.pk), str(january.pk)),
+                (str(february.pk), str(spanning.pk)),
+                (str(may.pk), str(open_ended.pk)),
+            ],
+        )
+
+        self.assertEqual(overlaps.cancel_overlaps(), 2)
+        self.assertEqual(
+            set(UserSubscription.objects.filter(status='cancelled', plan=self.plan).values_list('pk', flat=True)),
+            {spanning.pk, may.pk, cancelled.pk},
+        )
+        self.assertEqual(list(overlaps.find_overlaps()), [])
+        OVERLAP_MIGRATION.check_existing_rows(django_apps, None)
+
+    def test_api_rejects_overlapping_subscriptions(self):
+        self.subscribe(date(2026, 1, 1), date(2026, 3, 31))
+        later = self.subscribe(date(2026, 6, 1))
+        payload = {'user_id': self.user.pk, 'plan_id': self.plan.pk, 'plan_cost': 10, 'status': 'active'}
+
+        response = self.client.post(
+            reverse('usersubscription-list'), {**payload, 'start_date': '2026-03-01'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'], [UserSubscriptionSerializer.OVERLAP_ERROR])
+
+        response = self.client.patch(
+            reverse('usersubscription-detail', args=[later.pk]), {'start_date': '2026-03-15'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            reverse('usersubscription-list'), {**payload, 'start_date': '2026-04-01', 'end_date': '2026-05-31'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(UserSubscription.objects.filter(plan=self.plan).count(), 3)
+
+    def test_constraint_violations_of_a_racing_write_are_validation_errors(self):
+        self.subscribe(date(2026, 1, 1))
+        payload = {
+            'user_id': self.user.pk, 'plan_id': self.plan.pk, 'plan_cost': 10,
+            'start_date': '2026-01-01', 'status': 'active',
+        }
+        # As if the duplicate had been committed after validate() ran.
+        with mock.patch.object(UserSubscriptionSerializer, 'validate', lambda serializer, data: data):
+            response = self.client.post(reverse('usersubscription-list'), payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['non_field_errors'], [UserSubscriptionSerializer.OVERLAP_ERROR])
+
+    def test_other_integrity_errors_are_not_overlaps(self):
+        with self.assertRaises(IntegrityError) as raised, transaction.atomic():
+            UserSubscription.objects.create(user=self.user, plan=self.plan, plan_cost=None, start_date=date(2026, 1, 1))
+        self.assertFalse(overlaps.is_overlap_violation(raised.exception))
+
+        self.subscribe(date(2026, 1, 1))
+        with self.assertRaises(IntegrityError) as raised, transaction.atomic():
+            self.subscribe(date(2026, 1, 1))
+        self.assertTrue(overlaps.is_overlap_violation(raised.exception))
+
+
+class PlanMigrationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.source = SubscriptionPlan.objects.create(name='Basic', price=30, billing_cycle='monthly')
+        cls.target = SubscriptionPlan.objects.create(name='Premium', price=60, billing_cycle='monthly')
+        cls.yearly = SubscriptionPlan.objects.create(name='Yearly', price=365, billing_cycle='yearly')
+        cls.subscriptions = [
+            UserSubscription.objects.create(
+                user=User.objects.create_user(f'member{index}'), plan=cls.source,
+                plan_cost=cost, start_date=start_date,
+            )
+            for index, (cost, start_date) in enumerate([
+                (30, date(2026, 1, 1)), (10, date(2026, 2, 20)), (30, date(2026, 3, 11)), (30, date(2026, 4, 1)),
+            ])
+        ]
+
+    def new_costs(self, target, prorate=True):
+        migration = PlanMigration(
+            source_plan=self.source, target_plan=target, effective_date=date(2026, 3, 11), prorate=prorate
+        )
+        return list(
+            UserSubscription.objects.order_by('id')
+            .annotate(new_cost=plan_migration.new_cost(migration))
+            .values_list('new_cost', flat=True)
+        )
+
+    def test_prorated_costs_match_hand_computed_values(self):
+        # 69 days from January 1st to March 11th, 9 into the current 30 day
+        # period: 30 * 9/30 + 60/30 * 21. From February 20th, 19 days in:
+        # 10 * 19/30 + 2 * 11. Starting on the effective date: 2 * 30.
+        # Starting after it: the target price.
+        self.assertEqual(self.new_costs(self.target), [51.0, 28.33, 60.0, 60.0])
+        # The period stays the source's 30 days, at 1 a day on the yearly
+        # plan, and the charge is scaled to a year: 30 -> 365, 17.33 -> 210.89.
+        self.assertEqual(self.new_costs(self.yearly), [365.0, 210.89, 365.0, 365.0])
+        self.assertEqual(self.new_costs(self.target, prorate=False), [60.0] * 4)
+
+    def test_yearly_to_monthly_costs_are_monthly(self):
+        yearly = UserSubscription.objects.create(
+            user=User.objects.create_user('yearly'), plan=self.yearly, plan_cost=365, start_date=date(2025, 6, 1)
+        )
+        migration = PlanMigration.objects.create(
+            source_plan=self.yearly, target_plan=self.target, effective_date=date(2026, 3, 11)
+        )
+        plan_migration.run_migration(migration)
+        yearly.refresh_from_db()
+        # 283 days into the year at 1 a day, 82 at the monthly plan's 2 a day:
+        # 447 for 365 days, 36.74 for a 30 day month.
+        self.assertEqual((yearly.plan_id, yearly.plan_cost), (self.target.pk, 36.74))
+
+    def test_api_queues_migrations_for_the_command(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post(
+            reverse('subscriptionplan-migrate', args=[self.source.pk]),
+            {'target_plan_id': self.target.pk, 'effective_date': '2026-03-11'},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(UserSubscription.objects.filter(plan=self.source).count(), 4)
+
+        call_command('migrate_plan', queued=True, batch_size=3, stdout=StringIO())
+        migration = PlanMigration.objects.get(pk=response.data['id'])
+        self.assertEqual((migration.status, migration.migrated, migration.skipped), ('completed', 4, 0))
+        self.assertEqual(
+            list(UserSubscription.objects.order_by('id').values_list('plan_id', 'plan_cost')),
+            [(self.target.pk, cost) for cost in (51.0, 28.33, 60.0, 60.0)],
+        )
+        self.assertIsNone(plan_migration.claim_pending())
+
+    def test_active_filter_skips_subscriptions_ended_by_the_effective_date(self):
+        ended, ending = self.subscriptions[:2]
+        ended.end_date = date(2026, 3, 10)
+        ended.save()
+        ending.end_date = date(2026, 3, 11)
+        ending.save()
+        migration = PlanMigration(
+            source_plan=self.source, target_plan=self.target, effective_date=date(2026, 3, 11),
+            filters={'status': 'active'},
+        )
+        self.assertEqual(
+            list(plan_migration.candidates(migration).order_by('id')), self.subscriptions[1:]
+        )
+
+
+@skipUnless(snapshot.np is not None, 'The analytics snapshot requires NumPy')
+class AnalyticsSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.plans = [SubscriptionPlan.objects.create(name=name, price=price) for name, price in (('A', 10), ('B', 25))]
+        cls.users = [User.objects.create_user(f'user{index}') for index in range(3)]
+        cls.subscriptions = [
+            UserSubscription.objects.create(
+                user=user, plan=plan, plan_cost=plan.price, start_date=date(2025, month, 1),
+                end_date=date(2025, month, 28) if month == 2 else None,
+            )
+            for month, (user, plan) in enumerate(
+                [(user, plan) for user in cls.users for plan in cls.plans], start=1
+            )
+        ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = snapshot.Snapshot(directory.name)
+        self.store.rebuild()
+
+    def assertMatchesSql(self):
+        today = timezone.localdate()
+        columnar = self.store.dashboard_metrics(today)
+        sql = analytics.dashboard_metrics(today)
+        self.assertAlmostEqual(columnar['total_recurring_revenue'], sql['total_recurring_revenue'])
+        self.assertAlmostEqual(columnar['average_subscription_cost'], sql['average_subscription_cost'])
+        self.assertEqual(
+            [(user['id'], user['total_subscription_value']) for user in columnar['top_users']],
+            [(user['id'], user['total_subscription_value']) for user in sql['top_users']],
+        )
+
+    def test_refresh_replays_cost_and_date_changes(self):
+        changed = self.subscriptions[0]
+        changed.plan_cost = 99
+        changed.save()
+        UserSubscription.objects.filter(pk=self.subscriptions[3].pk).update(
+            start_date=date(2024, 1, 1), user=self.users[2]
+        )
+        self.subscriptions[4].delete()
+        UserSubscription.objects.create(
+            user=self.users[0], plan=self.plans[0], plan_cost=5, start_date=date(2026, 1, 1)
+        )
+
+        self.assertEqual(self.store.refresh(), (1, 3))
+        self.assertMatchesSql()
+        columns = self.store.columns(self.store.read_meta())
+        position = list(columns['id']).index(self.subscriptions[3].pk)
+        self.assertEqual(columns['start_date'][position], snapshot.to_days(date(2024, 1, 1)))
+
+    def test_recurring_revenue_follows_end_date_changes(self):
+        today = timezone.localdate()
+        ended, reopened = self.subscriptions[0], self.subscriptions[1]
+        ended.end_date = today - timedelta(days=1)
+        ended.save()
+        reopened.end_date = None
+        reopened.save()
+
+        self.assertEqual(self.store.refresh(), (0, 2))
+        self.assertMatchesSql()
+        # Subscriptions 2 to 6; the second one no longer ends in 2025.
+        self.assertEqual(self.store.dashboard_metrics(today)['total_recurring_revenue'], 25 + 10 + 25 + 10 + 25)
+
+    def test_snapshots_of_another_format_are_rebuilt(self):
+        meta = self.store.read_meta()
+        self.store.meta_path.write_text(json.dumps({**meta, 'format': snapshot.FORMAT - 1}))
+        self.assertIsNone(self.store.read_meta())
+        self.assertEqual(self.store.refresh(), (len(self.subscriptions), 0))
+        self.assertMatchesSql()
+
+    def test_refresh_appends_rows_committed_out_of_id_order(self):
+        last_id = self.subscriptions[-1].pk
+        UserSubscription.objects.create(
+            id=last_id + 10, user=self.users[0], plan=self.plans[0], plan_cost=5, start_date=date(2026, 1, 1)
+        )
+        self.assertEqual(self.store.refresh(), (1, 0))
+        # A lower id whose transaction commits after the refresh above.
+        UserSubscription.objects.create(
+            id=last_id + 5, user=self.users[1], plan=self.plans[1], plan_cost=7, start_date=date(2026, 1, 1)
+        )
+        self.assertEqual(self.store.refresh(), (1, 0))
+        UserSubscription.objects.filter(pk=last_id + 5).update(plan_cost=8)
+        self.assertEqual(self.store.refresh(), (0, 1))
+
+        columns = self.store.columns(self.store.read_meta())
+        self.assertEqual(list(columns['id'][-2:]), [last_id + 10, last_id + 5])
+        self.assertEqual(columns['plan_cost'][-1], 8)
+        self.assertMatchesSql()
+
+    def test_rebuild_switches_to_a_new_generation(self):
+        meta = self.store.read_meta()
+        columns = self.store.columns(meta)
+        UserSubscription.objects.create(
+            user=self.users[0], plan=self.plans[0], plan_cost=5, start_date=date(2026, 1, 1)
+        )
+        self.assertEqual(self.store.rebuild(), len(self.subscriptions) + 1)
+
+        rebuilt = self.store.read_meta()
+        self.assertNotEqual(rebuilt['generation'], meta['generation'])
+        self.assertEqual(
+            sorted(path.name for path in self.store.directory.glob('*.bin')),
+            sorted(self.store.column_path(name, rebuilt['generation']).name for name in snapshot.COLUMNS),
+        )
+        # Readers of the previous generation keep a consistent view.
+        self.assertEqual(list(columns['id']), [subscription.pk for subscription in self.subscriptions])
+        self.assertMatchesSql()
+
+    def test_refresh_drops_rows_of_an_interrupted_refresh(self):
+        UserSubscription.objects.create(
+            user=self.users[1], plan=self.plans[1], plan_cost=40, start_date=date(2026, 1, 1)
+        )
+        generation = self.store.read_meta()['generation']
+        # Columns appended before meta.json was rewritten.
+        for name, dtype in snapshot.COLUMNS.items():
+            with open(self.store.column_path(name, generation), 'ab') as f:
+                f.write(snapshot.np.zeros(3, dtype=dtype).tobytes())
+
+        self.assertEqual(self.store.refresh(), (1, 0))
+        meta = self.store.read_meta()
+        self.assertEqual(meta['row_count'], len(self.subscriptions) + 1)
+        for name, dtype in snapshot.COLUMNS.items():
+            self.assertEqual(
+                self.store.column_path(name, generation).stat().st_size,
+                meta['row_count'] * snapshot.np.dtype(dtype).itemsize,
+            )
+        self.assertMatchesSql()
+
+
+class ReportJobTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        results = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(results.cleanup)
+        cls.enterClassContext(override_settings(REPORTS_DIR=results.name))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analyst', 'analyst@example.com')
+        cls.other = User.objects.create_user('other', 'other@example.com')
+        plan = SubscriptionPlan.objects.create(name='Basic', price=9.99)
+        UserSubscription.objects.bulk_create([
+            UserSubscription(
+                user=cls.user, plan=plan, plan_cost=9.99,
+                start_date=date(2020 + i, 1, 1), end_date=date(2020 + i, 12, 31),
+            )
+            for i in range(3)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_submitted_job_runs_and_result_is_downloadable(self):
+        response = self.client.post(reverse('reportjob-list'), {
+            'kind': 'revenue_breakdown',
+            'params': {'group_by': ['start_month'], 'metrics': ['count']},
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        url = reverse('reportjob-download', kwargs={'pk': response.data['id']})
+        self.assertEqual(self.client.get(url).status_code, 409)
+
+        # What a pool process does for each job claimed by the worker.
+        [job] = reports.claim(limit=2)
+        self.assertEqual(reports.run_job(job.pk, job.attempts), ReportJob.Status.COMPLETED)
+
+        detail = self.client.get(reverse('reportjob-detail', kwargs={'pk': job.pk})).data
+        self.assertEqual((detail['status'], detail['progress'], detail['total']), ('completed', 3, 3))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            b''.join(response.streaming_content).decode().splitlines(),
+            ['start_month,count', '2020-01-01,1', '2021-01-01,1', '2022-01-01,1'],
+        )
+        # Other users neither see nor download the job.
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(reverse('reportjob-list')).data['count'], 0)
+
+    @override_settings(REPORT_JOB_MAX_ATTEMPTS=2)
+    def test_abandoned_jobs_are_requeued_until_out_of_attempts(self):
+        job = ReportJob.objects.create(
+            kind='subscriptions_export', params={'include_archived': False}, requested_by=self.user
+        )
+        stale = timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_AFTER + 1)
+
+        for expected in ('queued', 'failed'):
+            reports.claim(limit=1)
+            ReportJob.objects.filter(pk=job.pk).update(updated_at=stale)
+            reports.requeue_abandoned()
+            job.refresh_from_db()
+            self.assertEqual(job.status, expected)
+        self.assertEqual(job.attempts, 2)
+        # A run that was given up on cannot complete the job afterwards.
+        self.assertIsNone(reports.run_job(job.pk, attempt=1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), ('failed', ''))
+
+
+class TieredCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.feature = Feature.objects.create(name='Reports')
+        cls.plan = SubscriptionPlan.objects.create(name='Base', price=10)
+        cls.plan.features.add(cls.feature)
+
+    def setUp(self):
+        tiered_cache.clear()
+
+    def test_invalidated_tags_reach_other_processes(self):
+        # Two caches over the same shared tier stand in for two processes;
+        # the second trusts its local tier for no time at all.
+        first, second = TieredCache(), TieredCache(local_timeout=0)
+        computed = []
+
+        def compute():
+            computed.append(True)
+            return len(computed)
+
+        self.assertEqual(first.get_or_set('key', compute, tags=['plan:1']), 1)
+        self.assertEqual(second.get_or_set('key', compute, tags=['plan:1']), 1)
+        first.invalidate_tags('plan:1')
+        self.assertEqual(second.get_or_set('key', compute, tags=['plan:1']), 2)
+        self.assertEqual(first.get_or_set('key', compute, tags=['plan:1']), 2)
+        self.assertEqual(len(computed), 2)
+        self.assertEqual(first.stats()['local_hits'], 0)
+        self.assertEqual(second.stats()['shared_hits'], 1)
+
+    def test_concurrent_misses_compute_once(self):
+        cache = TieredCache()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(True)
+            release.wait(5)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get_or_set('slow', compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        while cache.stats()['coalesced'] < 7:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_writes_invalidate_cached_reads(self):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        url = reverse('subscriptionplan-detail', kwargs={'pk': self.plan.pk})
+        self.assertEqual(client.get(url).data['features'][0]['name'], 'Reports')
+        with self.assertNumQueries(0):
+            client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.patch(
+                reverse('feature-detail', kwargs={'pk': self.feature.pk}), {'name': 'Exports'}, format='json'
+            )
+        self.assertEqual(client.get(url).data['features'][0]['name'], 'Exports')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plan.features.clear()
+        self.assertEqual(client.get(url).data['features'], [])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoadTestTests(LiveServerTestCase):
+
+    def setUp(self):
+        tiered_cache.clear()
+        plan = SubscriptionPlan.objects.create(name='Base', price=10)
+        for index in range(3):
+            user = User.objects.create_user(f'user{index}', f'user{index}@example.com')
+            UserSubscription.objects.create(
+                user=user, plan=plan, plan_cost=10, start_date=date.today() - timedelta(days=index), status='active'
+            )
+
+    def test_run_records_the_mix_and_compares_runs(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.yaml') as file:
+            file.write(
+                f'base_url: {self.live_server_url}\n'
+                'duration: 1\nwarmup: 0\nvirtual_users: 2\nthink_time: 0\nseed: 1\n'
+                'mix: {subscriptions_list: 1, subscription_retrieve: 1, plan_retrieve: 1, user_summary: 1}\n'
+            )
+            file.flush()
+            scenario = loadtest.load_scenario(file.name)
+
+        usernames = loadtest.prepare_accounts(scenario)
+        self.assertEqual(usernames, ['user0', 'user1', 'user2'])
+        results = loadtest.LoadTest(scenario, usernames).run()
+
+        self.assertEqual(
+            set(results['actions']),
+            {'login', 'subscriptions_list', 'subscription_retrieve', 'plan_retrieve', 'user_summary'},
+        )
+        self.assertGreater(results['total']['requests'], 10)
+        self.assertEqual(results['total']['errors'], 0)
+        self.assertEqual(sum(count for _, count in results['total']['histogram']), results['total']['requests'])
+        self.assertNotIn('accounts', results['scenario'])
+
+        slower = json.loads(json.dumps(results))
+        slower['total']['latency_ms']['p95'] *= 2
+        rows, regressions = loadtest.compare(results, slower)
+        self.assertEqual(rows[0]['p95'][2], 1.0)
+        self.assertEqual(regressions, ['total: p95 latency +100%'])
+
+    def test_rejects_unknown_actions(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.yaml') as file:
+            file.write('mix: {subscriptions_list: 1, checkout: 1}\n')
+            file.flush()
+            with self.assertRaisesMessage(loadtest.ScenarioError, 'Unknown actions in the mix: checkout'):
+                loadtest.load_scenario(file.name)
+
+
+# Query budget of a route: ``kwargs`` and ``data`` are callables taking the
+# test case, for URL arguments and the request payload (query string for GET).
+QueryCase = namedtuple('QueryCase', ['budget', 'status', 'kwargs', 'data'], defaults=[200, None, None])
+
+
+def member(test):
+    return {'pk': test.member.pk}
+
+
+def subscription(test):
+    return {'pk': test.subscription.pk}
+
+
+def plan(test):
+    return {'pk': test.plan.pk}
+
+
+def feature(test):
+    return {'pk': test.feature.pk}
+
+
+def profile(test):
+    return {'pk': test.profile.pk}
+
+
+def report_job(test):
+    return {'pk': test.report_job.pk}
+
+
+def subscription_payload(test):
+    return {
+        'user_id': test.member.pk,
+        'plan_id': test.spare_plan.pk,
+        'plan_cost': 5,
+        'start_date': '2026-02-01',
+        'status': 'active',
+    }
+
+
+QUERY_BUDGETS = {
+    ('api-root', 'get'): QueryCase(0),
+    ('analytics', 'get'): QueryCase(4),
+    ('analytics-revenue', 'get'): QueryCase(1, data=lambda test: {
+        'start_date_from': '2025-01-01', 'start_date_to': '2027-01-01', 'group_by': 'plan,feature',
+    }),
+    ('analytics-monthly-revenue', 'get'): QueryCase(1),
+    ('throttling-metrics', 'get'): QueryCase(0),
+    ('cache-stats', 'get'): QueryCase(0),
+    ('user-list', 'get'): QueryCase(2),
+    ('user-list', 'post'): QueryCase(4, 201, data=lambda test: {
+        'username': 'newcomer', 'email': 'newcomer@example.com',
+        'password': 'Sup3r-secret!', 'password_confirm': 'Sup3r-secret!',
+    }),
+    ('user-bulk-provision', 'post'): QueryCase(6, 201, data=lambda test: {
+        'users': [
+            {'username': f'partner{i}', 'email': f'partner{i}@example.com', 'password': 'Sup3r-secret!'}
+            for i in range(3)
+        ],
+    }),
+    ('user-bulk-summaries', 'get'): QueryCase(1, data=lambda test: {
+        'ids': ','.join(str(pk) for pk in User.objects.values_list('pk', flat=True)),
+    }),
+    ('user-login', 'post'): QueryCase(2, data=lambda test: {'username': 'member', 'password': 'password'}),
+    ('user-logout', 'post'): QueryCase(2),
+    ('user-detail', 'get'): QueryCase(1, kwargs=member),
+    ('user-detail', 'put'): QueryCase(4, kwargs=member, data=lambda test: {
+        'username': 'member', 'email': 'member@example.org',
+    }),
+    ('user-detail', 'patch'): QueryCase(2, kwargs=member, data=lambda test: {'first_name': 'Ada'}),
+    ('user-detail', 'delete'): QueryCase(13, 204, kwargs=member),
+    ('user-summary', 'get'): QueryCase(1, kwargs=member),
+    ('feature-list', 'get'): QueryCase(2),
+    ('feature-list', 'post'): QueryCase(2, 201, data=lambda test: {'name': 'Priority support'}),
+    ('feature-detail', 'get'): QueryCase(1, kwargs=feature),
+    ('feature-detail', 'put'): QueryCase(4, kwargs=feature, data=lambda test: {'name': 'Renamed'}),
+    ('feature-detail', 'patch'): QueryCase(3, kwargs=feature, data=lambda test: {'is_active': False}),
+    ('feature-detail', 'delete'): QueryCase(4, 204, kwargs=lambda test: {'pk': test.spare_feature.pk}),
+    ('subscriptionplan-list', 'get'): QueryCase(3),
+    ('subscriptionplan-list', 'post'): QueryCase(7, 201, data=lambda test: {
+        'name': 'Enterprise', 'price': 99, 'billing_cycle': 'yearly', 'feature_ids': [test.feature.pk],
+    }),
+    ('subscriptionplan-migration', 'get'): QueryCase(1, kwargs=lambda test: {'migration_id': test.migration.pk}),
+    ('subscriptionplan-detail', 'get'): QueryCase(2, kwargs=plan),
+    ('subscriptionplan-detail', 'put'): QueryCase(7, kwargs=plan, data=lambda test: {
+        'name': 'Base', 'price': 12, 'billing_cycle': 'monthly', 'feature_ids': [test.feature.pk],
+    }),
+    ('subscriptionplan-detail', 'patch'): QueryCase(4, kwargs=plan, data=lambda test: {'price': 11}),
+    ('subscriptionplan-detail', 'delete'): QueryCase(7, 204, kwargs=lambda test: {'pk': test.spare_plan.pk}),
+    ('subscriptionplan-migrate', 'post'): QueryCase(5, kwargs=plan, data=lambda test: {
+        'target_plan_id': test.spare_plan.pk, 'dry_run': True,
+    }),
+    ('usersubscription-list', 'get'): QueryCase(2),
+    ('usersubscription-list', 'post'): QueryCase(12, 201, data=subscription_payload),
+    ('usersubscription-changes', 'get'): QueryCase(1),
+    ('usersubscription-detail', 'get'): QueryCase(2, kwargs=subscription),
+    ('usersubscription-detail', 'put'): QueryCase(15, kwargs=subscription, data=subscription_payload),
+    ('usersubscription-detail', 'patch'): QueryCase(11, kwargs=subscription, data=lambda test: {'plan_cost': 7}),
+    ('usersubscription-detail', 'delete'): QueryCase(5, 204, kwargs=subscription),
+    ('requestprofile-list', 'get'): QueryCase(2),
+    ('requestprofile-detail', 'get'): QueryCase(1, kwargs=profile),
+    ('requestprofile-download', 'get'): QueryCase(1, kwargs=profile),
+    ('reportjob-list', 'get'): QueryCase(2),
+    ('reportjob-list', 'post'): QueryCase(1, 202, data=lambda test: {
+        'kind': 'subscriptions_export', 'params': {'status': 'active'},
+    }),
+    ('reportjob-detail', 'get'): QueryCase(1, kwargs=report_job),
+    ('reportjob-detail', 'delete'): QueryCase(2, 204, kwargs=lambda test: {'pk': test.spare_report_job.pk}),
+    ('reportjob-download', 'get'): QueryCase(1, kwargs=report_job),
+}
+
+
+def registered_routes():
+    """``(url name, HTTP method)`` of every route in subscriptions/urls.py."""
+    routes = set()
+    for pattern in urls.urlpatterns:
+        callback = pattern.callback
+        actions = getattr(callback, 'actions', None)
+        if actions:
+            # DRF adds 'head' to the actions once the view has served a GET.
+            methods = [method for method in actions if method != 'head']
+        else:
+            methods = [
+                method for method in callback.view_class.http_method_names
+                if method not in ('head', 'options') and hasattr(callback.view_class, method)
+            ]
+        routes.update((pattern.name, method) for method in methods)
+    return routes
+
+
+def describe_queries(queries):
+    """The SQL of ``queries``, statements repeated with other values first."""
+    shapes = Counter(re.sub(r"'[^']*'|\b\d+(\.\d+)?\b", '?', query['sql']) for query in queries)
+    lines = [f'  {count}x {shape}' for shape, count in shapes.most_common() if count > 1]
+    lines += [f'  {query["sql"]}' for query in queries]
+    return '\n'.join(lines)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    MONTHLY_REVENUE_SLOTS=1,
+)
+class QueryBudgetTests(TestCase):
+    """
+    Every route in subscriptions/urls.py is requested after seeding each of
+    SIZES units of data (a user, a plan with features, subscriptions and a
+    profile and a report job). Its query count must be the same at every size, so no N+1
+    slips in, and within the route's budget in QUERY_BUDGETS. Writes are
+    rolled back after each request. One monthly revenue slot, so whether a
+    write creates its slot row does not depend on the slot picked.
+    """
+
+    SIZES = (2, 10)
+
+    @classmethod
+    def setUpClass(cls):
+        profiles = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(profiles.cleanup)
+        cls.enterClassContext(override_settings(PROFILING_DIR=profiles.name, REPORTS_DIR=profiles.name))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.member = User.objects.create_user('member', 'member@example.com', 'password')
+        cls.feature = Feature.objects.create(name='Reports')
+        cls.spare_feature = Feature.objects.create(name='Unused')
+        cls.plan = SubscriptionPlan.objects.create(name='Base', price=10)
+        cls.plan.features.add(cls.feature)
+        cls.spare_plan = SubscriptionPlan.objects.create(name='Spare', price=5)
+        cls.subscription = UserSubscription.objects.create(
+            user=cls.member, plan=cls.plan, plan_cost=10, start_date=date(2026, 1, 1)
+        )
+        cls.migration = PlanMigration.objects.create(
+            source_plan=cls.plan,
+            target_plan=SubscriptionPlan.objects.create(name='Premium', price=20),
+            effective_date=date(2026, 1, 1),
+        )
+        cls.profile = cls.create_profile('fixture')
+        cls.report_job = cls.create_report_job('fixture')
+        cls.spare_report_job = ReportJob.objects.create(kind='subscriptions_export', requested_by=cls.admin)
+
+    @staticmethod
+    def create_profile(name):
+        profile = RequestProfile.objects.create(
+            method='GET', path='/api/', status_code=200, trigger='header', mode='cprofile',
+            duration_ms=1, query_count=0, sql_time_ms=0, artefact=f'{name}.zip',
+        )
+        profile.artefact_path.write_bytes(b'')
+        return profile
+
+    @classmethod
+    def create_report_job(cls, name):
+        job = ReportJob.objects.create(
+            kind='subscriptions_export', requested_by=cls.admin,
+            status='completed', result=f'{name}.csv',
+        )
+        job.result_path.write_bytes(b'')
+        return job
+
+    def setUp(self):
+        self.client = APIClient()
+        self.seeded = 0
+
+    def seed(self, count):
+        units = range(self.seeded, self.seeded + count)
+        features = Feature.objects.bulk_create([
+            Feature(name=f'seed-feature-{i}-{j}') for i in units for j in range(2)
+        ])
+        plans = SubscriptionPlan.objects.bulk_create([
+            SubscriptionPlan(name=f'seed-plan-{i}', price=10 + i) for i in units
+        ])
+        SubscriptionPlan.features.through.objects.bulk_create([
+            SubscriptionPlan.features.through(subscriptionplan=plan, feature=feature)
+            for index, plan in enumerate(plans)
+            for feature in features[2 * index:2 * index + 2]
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'seed-user-{i}', email=f'seed-user-{i}@example.com') for i in units
+        ])
+        UserSubscription.objects.bulk_create([
+            UserSubscription(
+                user=user, plan=plan, plan_cost=plan.price,
+                start_date=date(2025, 1 + index % 12, 1), end_date=date(2026, 12, 31),
+            )
+            for index, (user, plan) in enumerate(zip(users, plans))
+        ] + [
+            UserSubscription(user=user, plan=self.plan, plan_cost=10, start_date=date(2026, 1, 1))
+            for user in users
+        ])
+        for i in units:
+            self.create_profile(f'seed-{i}')
+            self.create_report_job(f'seed-{i}')
+        self.seeded += count
+
+    def measure(self, route, case):
+        name, method = route
+        url = reverse(name, kwargs=case.kwargs(self) if case.kwargs else None)
+        data = case.data(self) if case.data else None
+        # A fresh user, as logout deletes the token cached on it.
+        self.client.force_authenticate(User.objects.get(pk=self.admin.pk))
+        # Throttle buckets and cached results live in the cache; reads
+        # cached in the local tier are measured uncached too.
+        tiered_cache.clear()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as context:
+                if method == 'get':
+                    response = self.client.get(url, data)
+                else:
+                    response = getattr(self.client, method)(url, data, format='json')
+            transaction.set_rollback(True)
+        self.assertEqual(
+            response.status_code, case.status,
+            f'{method.upper()} {url}: {getattr(response, "data", response)}'
+        )
+        return context.captured_queries
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(
+            sorted(registered_routes() - set(QUERY_BUDGETS)), [],
+            'Add a QueryCase to QUERY_BUDGETS for new routes.'
+        )
+        self.assertEqual(sorted(set(QUERY_BUDGETS) - registered_routes()), [])
+
+    def test_query_counts_are_constant_and_within_budget(self):
+        for route, case in QUERY_BUDGETS.items():
+            self.measure(route, case)  # warm up per-process caches
+
+        counts = {}
+        for size in self.SIZES:
+            self.seed(size - self.seeded)
+            for route, case in QUERY_BUDGETS.items():
+                counts.setdefault(route, []).append(self.measure(route, case))
+
+        for route, runs in counts.items():
+            with self.subTest(route=route):
+                sizes = [len(queries) for queries in runs]
+                budget = QUERY_BUDGETS[route].budget
+                if len(set(sizes)) > 1 or sizes[-1] > budget:
+                    self.fail(
+                        f'{route[1].upper()} {route[0]}: {sizes} queries at {list(self.SIZES)} '
+                        f'seeded units (budget {budget}). Queries at {self.SIZES[-1]}:\n'
+                        + describe_queries(runs[-1])
+                    )
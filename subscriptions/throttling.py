@@ -0,0 +1,291 @@
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.template.response import SimpleTemplateResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.throttling import SimpleRateThrottle
+
+
+logger = logging.getLogger(__name__)
+
+
+class ShedMetrics:
+    """Thread-safe counters for requests rejected by throttles and caps."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, scope, reason):
+        with self._lock:
+            self._counts[(scope, reason)] += 1
+        logger.warning("Shed request: scope=%s reason=%s", scope, reason)
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                {'scope': scope, 'reason': reason, 'count': count}
+                for (scope, reason), count in sorted(self._counts.items())
+            ]
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+shed_metrics = ShedMetrics()
+
+
+class LocalBucketStore:
+    """In-process token bucket storage, for single-worker and test setups."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key, capacity, refill_rate, now):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens, allowed = _refill_and_take(tokens, updated, capacity, refill_rate, now)
+            self._buckets[key] = (tokens, now)
+            return allowed, tokens
+
+
+class CacheBucketStore:
+    """
+    Token bucket storage backed by Django's cache. Buckets are shared between
+    workers only when the cache is (Redis, Memcached, database); with the
+    default LocMemCache every process has its own.
+
+    The read-modify-write is not atomic, so concurrent requests for the same
+    key may occasionally both take the last token; this is acceptable for
+    load shedding and avoids a lock round-trip per request.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or default_cache
+
+    def consume(self, key, capacity, refill_rate, now):
+        tokens, updated = self.cache.get(key, (capacity, now))
+        tokens, allowed = _refill_and_take(tokens, updated, capacity, refill_rate, now)
+        # Keep the entry only as long as it takes to refill completely.
+        self.cache.set(key, (tokens, now), int(capacity / refill_rate) + 1)
+        return allowed, tokens
+
+
+def _refill_and_take(tokens, updated, capacity, refill_rate, now):
+    tokens = min(capacity, tokens + max(0.0, now - updated) * refill_rate)
+    if tokens >= 1:
+        return tokens - 1, True
+    return tokens, False
+
+
+_local_store = LocalBucketStore()
+
+
+def get_bucket_store():
+    """Return the bucket store selected by ``THROTTLE_BUCKET_STORE``."""
+    if getattr(settings, 'THROTTLE_BUCKET_STORE', 'cache') == 'local':
+        return _local_store
+    return CacheBucketStore()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket throttle using DRF rate strings ("10/min").
+
+    The rate numerator is the bucket capacity (allowed burst) and tokens
+    refill continuously over the period, so clients are not locked out for
+    a full window after a burst as with the sliding-log ``SimpleRateThrottle``.
+    """
+
+    cache_format = 'throttle_bucket_%(scope)s_%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.refill_rate = self.num_requests / self.duration
+        allowed, self.tokens = get_bucket_store().consume(
+            self.key, self.num_requests, self.refill_rate, self.timer()
+        )
+        if allowed:
+            return True
+        return self.throttle_failure()
+
+    def throttle_failure(self):
+        shed_metrics.record(self.scope, 'rate_limited')
+        return False
+
+    def wait(self):
+        return (1 - self.tokens) / self.refill_rate
+
+
+class IPRateThrottle(TokenBucketThrottle):
+    """Token bucket keyed by client IP address and scope."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class UserRateThrottle(TokenBucketThrottle):
+    """Token bucket keyed by authenticated user, falling back to IP."""
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user_{request.user.pk}'
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class LoginRateThrottle(IPRateThrottle):
+    """Limits login attempts per client IP."""
+
+    scope = 'login'
+
+
+class LoginUsernameRateThrottle(TokenBucketThrottle):
+    """
+    Limits login attempts per target username from one client IP. Keyed on
+    the pair rather than the username alone, so that guessing someone's
+    password from one address cannot lock them out everywhere.
+    """
+
+    scope = 'login_username'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not username:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': f'{str(username).lower()}_{self.get_ident(request)}',
+        }
+
+
+class AnalyticsRateThrottle(UserRateThrottle):
+    """Limits analytics dashboard requests per user."""
+
+    scope = 'analytics'
+
+
+class ServiceOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Server is busy, please retry shortly.'
+    default_code = 'overloaded'
+
+
+class ConcurrencyLimiter:
+    """Non-blocking per-process cap on in-flight requests for a scope."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        return self._semaphore.acquire(blocking=False)
+
+    def release(self):
+        self._semaphore.release()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(scope):
+    """Return the shared limiter for ``scope`` or ``None`` when uncapped."""
+    limit = getattr(settings, 'CONCURRENCY_LIMITS', {}).get(scope)
+    if not limit:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get(scope)
+        if limiter is None or limiter.limit != limit:
+            limiter = _limiters[scope] = ConcurrencyLimiter(limit)
+        return limiter
+
+
+class _ReleasingContent:
+    """
+    Streaming content that releases a concurrency slot when the response
+    closes it, which the handler does once the content has been sent.
+    """
+
+    def __init__(self, content, release):
+        self._content = content
+        self._release = release
+
+    def __iter__(self):
+        return iter(self._content)
+
+    def close(self):
+        self._release()
+
+
+class _AsyncReleasingContent(_ReleasingContent):
+
+    def __aiter__(self):
+        return aiter(self._content)
+
+
+class ConcurrencyLimitMixin:
+    """
+    View mixin that rejects requests with 503 once ``concurrency_scope`` has
+    too many requests in flight, instead of letting them queue for a worker.
+
+    A request holds its slot until its response is rendered (and lazy
+    querysets evaluated), which happens within dispatch() rather than
+    after the view returns; a streaming response holds it until it has
+    been sent.
+    """
+
+    concurrency_scope = None
+    concurrency_retry_after = 1
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        limiter = get_concurrency_limiter(self.concurrency_scope)
+        if limiter is None:
+            return
+        if not limiter.acquire():
+            shed_metrics.record(self.concurrency_scope, 'concurrency_limited')
+            raise ServiceOverloaded()
+        self._concurrency_limiter = limiter
+
+    def dispatch(self, request, *args, **kwargs):
+        self._concurrency_limiter = None
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            limiter = self._concurrency_limiter
+            if limiter is None:
+                return response
+            if response.streaming:
+                content_class = _AsyncReleasingContent if response.is_async else _ReleasingContent
+                response.streaming_content = content_class(response.streaming_content, limiter.release)
+                self._concurrency_limiter = None
+            elif isinstance(response, SimpleTemplateResponse):
+                response.render()
+            return response
+        finally:
+            if self._concurrency_limiter is not None:
+                self._concurrency_limiter.release()
+                self._concurrency_limiter = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE:
+            response['Retry-After'] = str(self.concurrency_retry_after)
+        return response
@@ -6,6 +6,12 @@ from .views import (
     SubscriptionPlanViewSet,
     UserSubscriptionViewSet,
     AnalyticsDashboardView,
+    RevenueBreakdownView,
+    MonthlyRevenueView,
+    ThrottleMetricsView,
+    CacheStatsView,
+    RequestProfileViewSet,
+    ReportJobViewSet,
 )
 
 router = DefaultRouter()
@@ -17,7 +23,37 @@ router.register(
     UserSubscriptionViewSet,
     basename='usersubscription'
 )
+router.register(
+    r'profiling/profiles',
+    RequestProfileViewSet,
+    basename='requestprofile'
+)
+router.register(
+    r'reports/jobs',
+    ReportJobViewSet,
+    basename='reportjob'
+)
 
 urlpatterns = [
     path('analytics/', AnalyticsDashboardView.as_view(), name='analytics'),
+    path(
+        'analytics/revenue/',
+        RevenueBreakdownView.as_view(),
+        name='analytics-revenue'
+    ),
+    path(
+        'analytics/monthly-revenue/',
+        MonthlyRevenueView.as_view(),
+        name='analytics-monthly-revenue'
+    ),
+    path(
+        'throttling/metrics/',
+        ThrottleMetricsView.as_view(),
+        name='throttling-metrics'
+    ),
+    path(
+        'cache/stats/',
+        CacheStatsView.as_view(),
+        name='cache-stats'
+    ),
 ] + router.urls
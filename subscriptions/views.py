@@ -1,26 +1,64 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import mixins, viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAdminUser
+from rest_framework.authentication import SessionAuthentication, TokenAuthentication
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
-from django.db.models import Sum, Avg, Q, FloatField
-from django.db.models.functions import Coalesce, TruncMonth
+from django.conf import settings
 from datetime import datetime
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiResponse, inline_serializer
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
 from rest_framework import serializers as drf_serializers
-from .models import Feature, SubscriptionPlan, UserSubscription
+from .models import (
+    Feature,
+    PlanMigration,
+    ReportJob,
+    RequestProfile,
+    SubscriptionPlan,
+    UserSubscription,
+    SubscriptionEvent,
+)
+from .analytics import TooManyGroups, dashboard_metrics, monthly_revenue_series, revenue_breakdown
+from .caching import CachedReadMixin, tiered_cache
+from . import openapi
+from .concurrency import PreconditionFailed, PreconditionRequired, etag, matches, parse_etags
+from .plan_migration import candidates, conflicting
+from .provisioning import provision_users
+from .summaries import day_remaining, summaries
 from .serializers import (
     SignInInputSerializer,
     SignUpInputSerializer,
+    BulkProvisionUsersSerializer,
     UserSerializer,
+    UserSubscriptionSummarySerializer,
+    UserSummaryQuerySerializer,
     FeatureSerializer,
     SubscriptionPlanSerializer,
     SubscriptionPlanListSerializer,
     UserSubscriptionSerializer,
     UserSubscriptionListSerializer,
+    SubscriptionEventSerializer,
+    SubscriptionChangesQuerySerializer,
+    RevenueBreakdownQuerySerializer,
+    MonthlyRevenueQuerySerializer,
+    PlanMigrationRequestSerializer,
+    PlanMigrationSerializer,
+    RequestProfileSerializer,
+    ReportJobRequestSerializer,
+    ReportJobSerializer,
+)
+from .throttling import (
+    AnalyticsRateThrottle,
+    ConcurrencyLimitMixin,
+    LoginRateThrottle,
+    LoginUsernameRateThrottle,
+    shed_metrics,
 )
 
 
@@ -56,7 +94,7 @@ class UserViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action == 'create':
             return []
-        elif self.action == 'destroy':
+        elif self.action in ('destroy', 'bulk_provision', 'bulk_summaries'):
             return [IsAdminUser()]
         return super().get_permissions()
 
@@ -84,6 +122,7 @@ class UserViewSet(viewsets.ModelViewSet):
             ),
             401: OpenApiResponse(description="Invalid credentials."),
             400: OpenApiResponse(description="Invalid input data."),
+            429: OpenApiResponse(description="Too many login attempts."),
         },
         tags=["Users"],
     )
@@ -92,7 +131,8 @@ class UserViewSet(viewsets.ModelViewSet):
         methods=['post'],
         url_path='login',
         authentication_classes=[],
-        permission_classes=[]
+        permission_classes=[],
+        throttle_classes=[LoginRateThrottle, LoginUsernameRateThrottle]
     )
     def login(self, request):
         """
@@ -123,6 +163,107 @@ class UserViewSet(viewsets.ModelViewSet):
             }
         )
 
+    @extend_schema(
+        summary="Bulk provision users",
+        description="Create up to 10,000 users in one call for partner onboarding. Each row carries either a raw "
+                    "`password` or an already encoded `password_hash`. Usernames and emails are checked against "
+                    "existing users with set-based queries; conflicting rows are skipped and reported by index. "
+                    "Auth tokens are created in bulk unless `issue_tokens` is false, in which case they are "
+                    "issued on first login.",
+        request=BulkProvisionUsersSerializer,
+        responses={
+            201: inline_serializer(
+                name="BulkProvisionUsersResponse",
+                fields={
+                    "created": drf_serializers.IntegerField(),
+                    "errors": drf_serializers.DictField(),
+                }
+            ),
+            400: OpenApiResponse(description="Invalid input data."),
+        },
+        tags=["Users"],
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='bulk',
+    )
+    def bulk_provision(self, request):
+        """
+        Bulk provisioning action for partner account onboarding.
+        """
+        serializer = BulkProvisionUsersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        created, errors = provision_users(
+            serializer.validated_data['users'],
+            issue_tokens=serializer.validated_data['issue_tokens'],
+        )
+
+        return Response(
+            {
+                'created': created,
+                'errors': errors,
+            },
+            status=status.HTTP_201_CREATED
+        )
+
+    @extend_schema(
+        summary="User subscription summary",
+        description="Active subscription count, total spend (archived subscriptions included) and the next "
+                    "expiry date of an active subscription, read from a summary row maintained on every "
+                    "subscription write. Users may read their own summary; staff may read anyone's.",
+        responses={
+            200: UserSubscriptionSummarySerializer,
+            403: OpenApiResponse(description="Not your summary."),
+            404: OpenApiResponse(description="User not found."),
+        },
+        tags=["Users"],
+    )
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        try:
+            user_id = int(pk)
+        except ValueError:
+            raise Http404
+        if not request.user.is_staff and request.user.pk != user_id:
+            raise PermissionDenied("You can only read your own summary.")
+
+        def serialize():
+            summary = summaries([user_id])[user_id]
+            # Only users who never subscribed have no summary row.
+            if summary._state.adding and not User.objects.filter(pk=user_id).exists():
+                raise Http404
+            return UserSubscriptionSummarySerializer(summary).data
+
+        return Response(tiered_cache.get_or_set(
+            f'user-summary:{user_id}',
+            serialize,
+            timeout=min(settings.CACHE_TIMEOUT, day_remaining()),
+            tags=[f'user:{user_id}', 'user-summaries'],
+        ))
+
+    @extend_schema(
+        summary="Bulk user subscription summaries",
+        description="Subscription summaries of many users in one query, in id order. Users without "
+                    "subscriptions, and unknown ids, have zero totals. Admin only.",
+        parameters=[UserSummaryQuerySerializer],
+        responses={
+            200: inline_serializer(
+                name="UserSummariesResponse",
+                fields={"results": UserSubscriptionSummarySerializer(many=True)}
+            ),
+            400: OpenApiResponse(description="Invalid or too many ids."),
+        },
+        tags=["Users"],
+    )
+    @action(detail=False, methods=['get'], url_path='summaries')
+    def bulk_summaries(self, request):
+        query = UserSummaryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        rows = summaries(query.validated_data['ids'])
+        return Response({'results': UserSubscriptionSummarySerializer(rows.values(), many=True).data})
+
     @extend_schema(
         summary="User Logout",
         description="Invalidate the authentication token for the current user. This endpoint requires authentication.",
@@ -157,9 +298,10 @@ class UserViewSet(viewsets.ModelViewSet):
     partial_update=extend_schema(tags=["Features"]),
     destroy=extend_schema(tags=["Features"]),
 )
-class FeatureViewSet(viewsets.ModelViewSet):
-    """ViewSet for Feature CRUD operations."""
+class FeatureViewSet(CachedReadMixin, viewsets.ModelViewSet):
+    """ViewSet for Feature CRUD operations; reads are cached."""
 
+    cache_tag = 'feature'
     queryset = Feature.objects.all()
     permission_classes = [IsAdminUser]
     serializer_class = FeatureSerializer
@@ -175,9 +317,10 @@ class FeatureViewSet(viewsets.ModelViewSet):
     partial_update=extend_schema(tags=["Subscription Plans"]),
     destroy=extend_schema(tags=["Subscription Plans"]),
 )
-class SubscriptionPlanViewSet(viewsets.ModelViewSet):
-    """ViewSet for SubscriptionPlan CRUD operations."""
+class SubscriptionPlanViewSet(CachedReadMixin, viewsets.ModelViewSet):
+    """ViewSet for SubscriptionPlan CRUD operations; reads are cached."""
 
+    cache_tag = 'plan'
     queryset = SubscriptionPlan.objects.prefetch_related('features').all()
     permission_classes = [IsAdminUser]
     filter_backends = [filters.SearchFilter]
@@ -188,17 +331,111 @@ class SubscriptionPlanViewSet(viewsets.ModelViewSet):
             return SubscriptionPlanListSerializer
         return SubscriptionPlanSerializer
 
+    @extend_schema(
+        summary="Migrate subscribers to another plan",
+        description="Move this plan's subscriptions (optionally filtered by `status` and a "
+                    "[`start_date_from`, `start_date_to`) range) to `target_plan_id`. The new `plan_cost` is "
+                    "computed in SQL: with `prorate`, the current billing period is charged at the old cost up "
+                    "to `effective_date` (default: today) and at the target plan's daily rate afterwards, "
+                    "scaled to the target plan's billing period; otherwise it is the target price. Active rows that would overlap an active subscription "
+                    "to the target plan are skipped. `status=active` only matches subscriptions that have not "
+                    "ended by `effective_date`. The migration is queued as `pending` and run in chunked "
+                    "transactions by `manage.py migrate_plan --queued`; poll `/api/plans/migrations/{id}/` "
+                    "for progress. `dry_run` only counts the matching rows.",
+        request=PlanMigrationRequestSerializer,
+        responses={
+            202: PlanMigrationSerializer,
+            200: inline_serializer(
+                name="PlanMigrationDryRunResponse",
+                fields={
+                    "matching": drf_serializers.IntegerField(),
+                    "conflicting": drf_serializers.IntegerField(),
+                }
+            ),
+            400: OpenApiResponse(description="Invalid input data."),
+        },
+        tags=["Subscription Plans"],
+    )
+    @action(detail=True, methods=['post'])
+    def migrate(self, request, pk=None):
+        source_plan = self.get_object()
+        serializer = PlanMigrationRequestSerializer(
+            data=request.data,
+            context={'source_plan': source_plan, 'today': datetime.now().date()}
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        dry_run = data.pop('dry_run')
+        migration = PlanMigration(source_plan=source_plan, **data)
+
+        if dry_run:
+            matching = candidates(migration)
+            return Response({
+                'matching': matching.count(),
+                'conflicting': matching.filter(conflicting(migration.target_plan_id)).count(),
+            })
+
+        migration.save()
+        return Response(
+            PlanMigrationSerializer(migration).data,
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @extend_schema(
+        summary="Plan migration progress",
+        responses={200: PlanMigrationSerializer},
+        tags=["Subscription Plans"],
+    )
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path=r'migrations/(?P<migration_id>[0-9]+)',
+    )
+    def migration(self, request, migration_id=None):
+        migration = get_object_or_404(PlanMigration, pk=migration_id)
+        return Response(PlanMigrationSerializer(migration).data)
+
 
 @extend_schema_view(
     list=extend_schema(tags=["User Subscriptions"]),
-    retrieve=extend_schema(tags=["User Subscriptions"]),
+    retrieve=extend_schema(
+        description="Returns the subscription version as a strong `ETag`; with a matching `If-None-Match` "
+                    "(or `*`) the response is `304 Not Modified`.",
+        tags=["User Subscriptions"],
+    ),
     create=extend_schema(tags=["User Subscriptions"]),
-    update=extend_schema(tags=["User Subscriptions"]),
-    partial_update=extend_schema(tags=["User Subscriptions"]),
+    update=extend_schema(
+        description="Send the `ETag` from a previous read in `If-Match` to apply the update only if the "
+                    "subscription is unchanged; otherwise `412 Precondition Failed` is returned. "
+                    "`If-None-Match` is honoured too: `*` always fails, as the subscription exists.",
+        responses={
+            200: UserSubscriptionSerializer,
+            412: OpenApiResponse(description="The subscription was modified since it was read."),
+            428: OpenApiResponse(description="If-Match is required."),
+        },
+        tags=["User Subscriptions"],
+    ),
+    partial_update=extend_schema(
+        description="Send the `ETag` from a previous read in `If-Match` to apply the update only if the "
+                    "subscription is unchanged; otherwise `412 Precondition Failed` is returned. "
+                    "`If-None-Match` is honoured too: `*` always fails, as the subscription exists.",
+        responses={
+            200: UserSubscriptionSerializer,
+            412: OpenApiResponse(description="The subscription was modified since it was read."),
+            428: OpenApiResponse(description="If-Match is required."),
+        },
+        tags=["User Subscriptions"],
+    ),
     destroy=extend_schema(tags=["User Subscriptions"]),
 )
 class UserSubscriptionViewSet(viewsets.ModelViewSet):
-    """ViewSet for UserSubscription CRUD operations."""
+    """
+    ViewSet for UserSubscription CRUD operations.
+
+    Updates use optimistic locking: the version is exposed as the ETag and
+    an If-Match update is conditional on it in the UPDATE itself, so
+    concurrent writers get 412 instead of overwriting each other.
+    """
 
     queryset = UserSubscription.objects.select_related('user', 'plan').all()
     serializer_class = UserSubscriptionListSerializer
@@ -206,70 +443,408 @@ class UserSubscriptionViewSet(viewsets.ModelViewSet):
     search_fields = ['user__username', 'user__email', 'plan__name']
 
     def get_serializer_class(self):
-        if self.action == 'retrieve':
+        # Writes go through the full serializer, which validates overlaps.
+        if self.action in ('retrieve', 'create', 'update', 'partial_update'):
             return UserSubscriptionSerializer
         return super().get_serializer_class()
 
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response['ETag'] = etag(response.data['version'])
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        tag = etag(instance.version)
+        if matches(request.headers.get('If-None-Match'), instance.version, weak=True):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': tag})
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data, headers={'ETag': tag})
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        header = request.headers.get('If-Match')
+        if header is None and settings.SUBSCRIPTION_REQUIRE_IF_MATCH:
+            raise PreconditionRequired()
+        none_match = request.headers.get('If-None-Match')
+        if none_match is not None and none_match.strip() == '*':
+            # Only "create if absent", and the subscription exists.
+            raise PreconditionFailed()
+        instance = self.get_object()
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(
+            expected_versions=parse_etags(header),
+            excluded_versions=parse_etags(none_match, weak=True),
+        )
+        return Response(serializer.data, headers={'ETag': etag(instance.version)})
+
+    @extend_schema(
+        summary="Subscription change feed",
+        description="Incremental feed of subscription events (created, status_changed, plan_changed, updated, "
+                    "cancelled, deleted, archived) with an id greater than `since`, oldest first. Pass the returned "
+                    "`next_cursor` as `since` on the next call to resume. Events whose ids follow a gap are held "
+                    "back until the writes that may fill the gap have committed, for at most "
+                    "`SUBSCRIPTION_EVENT_SETTLE_SECONDS`.",
+        parameters=[SubscriptionChangesQuerySerializer],
+        responses={
+            200: inline_serializer(
+                name="SubscriptionChangesResponse",
+                fields={
+                    "results": SubscriptionEventSerializer(many=True),
+                    "next_cursor": drf_serializers.IntegerField(),
+                    "has_more": drf_serializers.BooleanField(),
+                }
+            ),
+        },
+        tags=["User Subscriptions"],
+    )
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='changes',
+        pagination_class=None,
+    )
+    def changes(self, request):
+        """
+        Cursor-based change feed over the subscription event log.
+        """
+        query = SubscriptionChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        since = query.validated_data['since']
+        limit = query.validated_data['limit']
+
+        events, has_more = SubscriptionEvent.read(since, limit)
+
+        return Response(
+            {
+                'results': SubscriptionEventSerializer(events, many=True).data,
+                'next_cursor': events[-1].id if events else since,
+                'has_more': has_more,
+            }
+        )
+
 
 @extend_schema_view(
     get=extend_schema(tags=["Analytics"]),
 )
-class AnalyticsDashboardView(APIView):
+class AnalyticsDashboardView(ConcurrencyLimitMixin, APIView):
     """
 
     Returns comprehensive analytics data:
-    - Total Recurring Revenue (sum of plan_cost for active subscriptions)
+    - Total Recurring Revenue (sum of plan_cost for active subscriptions
+      that have not ended)
     - Average Subscription Cost
-    - Monthly Revenue History (last 12 months)
+    - Monthly Revenue History (the 12 months before the current one, from
+      the precomputed monthly revenue series)
     - Top 5 Users by subscription value
+
+    Archived subscriptions are included through their revenue rollups.
+    With ANALYTICS_ENGINE = "snapshot" the metrics are computed from the
+    columnar snapshot instead of SQL while it is fresh.
+    Requests are rate limited per user and capped in concurrency per worker.
     """
 
+    throttle_classes = [AnalyticsRateThrottle]
+    concurrency_scope = 'analytics'
+
     def get(self, request):
         today = datetime.now().date()
-        twelve_months_ago = today.replace(year=today.year - 1)
-        start_of_current_month = today.replace(day=1)
-
-        revenue_stats = UserSubscription.objects.aggregate(
-            total_recurring_revenue=Coalesce(
-                Sum(
-                    'plan_cost',
-                    filter=Q(status='active')
-                ),
-                0,
-                output_field=FloatField(),
+
+        metrics = None
+        if settings.ANALYTICS_ENGINE == 'snapshot':
+            # Imported on use, so NumPy stays off the startup path of the
+            # SQL engine.
+            from .snapshot import dashboard_metrics as snapshot_dashboard_metrics
+
+            # None when the snapshot is missing, stale or NumPy is absent.
+            metrics = snapshot_dashboard_metrics(today)
+        if metrics is None:
+            metrics = dashboard_metrics(today)
+
+        return Response(metrics)
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="Revenue breakdown",
+        description="Ad-hoc revenue aggregation over subscriptions starting in [start_date_from, start_date_to). "
+                    "`group_by` accepts plan, billing_cycle, status, start_month and feature; `metrics` accepts "
+                    "sum, avg and count of plan_cost (default: sum). Both accept repeated or comma-separated "
+                    "values. Only live subscriptions are aggregated: archived ones (see `archive_subscriptions`) "
+                    "are excluded, as their rollups keep neither plans nor features. Queries returning more "
+                    "groups than the configured maximum are rejected, and results are cached briefly per "
+                    "normalized query.",
+        parameters=[RevenueBreakdownQuerySerializer],
+        responses={
+            200: inline_serializer(
+                name="RevenueBreakdownResponse",
+                fields={
+                    "group_by": drf_serializers.ListField(child=drf_serializers.CharField()),
+                    "metrics": drf_serializers.ListField(child=drf_serializers.CharField()),
+                    "results": drf_serializers.ListField(child=drf_serializers.DictField()),
+                    "cached": drf_serializers.BooleanField(),
+                }
             ),
-            average_subscription_cost=Coalesce(
-                Avg('plan_cost'),
-                0,
-                output_field=FloatField(),
+            400: OpenApiResponse(description="Invalid query or too many groups."),
+        },
+        tags=["Analytics"],
+    ),
+)
+class RevenueBreakdownView(ConcurrencyLimitMixin, APIView):
+    """
+    Whitelisted revenue aggregation compiled to a single GROUP BY query.
+
+    Shares the analytics rate limit and concurrency cap.
+    """
+
+    throttle_classes = [AnalyticsRateThrottle]
+    concurrency_scope = 'analytics'
+
+    def get(self, request):
+        query = RevenueBreakdownQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        try:
+            results, cached = revenue_breakdown(
+                params['group_by'],
+                params['metrics'],
+                params['start_date_from'],
+                params['start_date_to'],
+                filters={
+                    name: params.get(name)
+                    for name in ('status', 'plan_id', 'billing_cycle', 'feature_id')
+                },
+            )
+        except TooManyGroups as exc:
+            return Response(
+                {'error': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST
             )
+
+        return Response(
+            {
+                'group_by': sorted(set(params['group_by'])),
+                'metrics': sorted(set(params['metrics'])),
+                'results': results,
+                'cached': cached,
+            }
         )
 
-        total_recurring_revenue = revenue_stats['total_recurring_revenue']
-        average_subscription_cost = revenue_stats['average_subscription_cost']
 
-        monthly_revenue = (
-            UserSubscription.objects
-            .filter(start_date__gte=twelve_months_ago, start_date__lt=start_of_current_month)
-            .annotate(month=TruncMonth('start_date'))
-            .values('month')
-            .annotate(total_revenue=Sum('plan_cost'))
-            .order_by('month')
-        )
+@extend_schema_view(
+    get=extend_schema(
+        summary="Monthly revenue series",
+        description="Revenue of subscriptions by start month, from `start_month` to `end_month` inclusive "
+                    "(YYYY-MM, default: the last 12 months including the current one). Every month in the "
+                    "range is returned; months without subscriptions have zero revenue, and the current "
+                    "month reflects subscriptions created so far. Archived subscriptions are included.",
+        parameters=[MonthlyRevenueQuerySerializer],
+        responses={
+            200: inline_serializer(
+                name="MonthlyRevenueResponse",
+                fields={
+                    "month": drf_serializers.DateField(),
+                    "total_revenue": drf_serializers.FloatField(),
+                    "subscription_count": drf_serializers.IntegerField(),
+                },
+                many=True,
+            ),
+            400: OpenApiResponse(description="Invalid or too long range."),
+        },
+        tags=["Analytics"],
+    ),
+)
+class MonthlyRevenueView(ConcurrencyLimitMixin, APIView):
+    """
+    Contiguous monthly revenue series read from the precomputed table.
 
-        top_users = (
-            User.objects
-            .annotate(total_subscription_value=Sum('user_subscriptions__plan_cost'))
-            .filter(total_subscription_value__isnull=False)
-            .order_by('-total_subscription_value')
-            .values('id', 'username', 'email', 'total_subscription_value')[:5]
+    Shares the analytics rate limit and concurrency cap.
+    """
+
+    throttle_classes = [AnalyticsRateThrottle]
+    concurrency_scope = 'analytics'
+
+    def get(self, request):
+        query = MonthlyRevenueQuerySerializer(
+            data=request.query_params, context={'today': datetime.now().date()}
         )
+        query.is_valid(raise_exception=True)
+        return Response(monthly_revenue_series(
+            query.validated_data['start_month'], query.validated_data['end_month']
+        ))
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="Shed request metrics",
+        description="Counts of requests rejected by rate limits (429) and concurrency caps (503) "
+                    "in this worker process since it started.",
+        tags=["Throttling"],
+    ),
+)
+class ThrottleMetricsView(APIView):
+    """Admin-only view exposing shed request counters."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'shed_requests': shed_metrics.snapshot()})
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary="Tiered cache statistics",
+        description="Hits per tier, coalesced lookups, misses and invalidations of the tiered cache in "
+                    "this worker process since it started, with the local tier size and hit rate.",
+        tags=["Caching"],
+    ),
+)
+class CacheStatsView(APIView):
+    """Admin-only view exposing tiered cache counters."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(tiered_cache.stats())
+
+
+@extend_schema_view(
+    list=extend_schema(
+        summary="Request profiles",
+        description="Requests profiled on demand (X-Profile header, admin triggers or sampling), newest first.",
+        tags=["Profiling"],
+    ),
+    retrieve=extend_schema(tags=["Profiling"]),
+)
+class RequestProfileViewSet(viewsets.ReadOnlyModelViewSet):
+    """Admin-only access to profiled requests and their artefacts."""
+
+    queryset = RequestProfile.objects.order_by('-id')
+    serializer_class = RequestProfileSerializer
+    permission_classes = [IsAdminUser]
+    # Sessions let staff download artefacts from the Django admin.
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+
+    @extend_schema(
+        summary="Download profile artefact",
+        description="Zip with the raw profile (`profile.prof` for cProfile, `stacks.txt` in collapsed-stack "
+                    "format for sampling), `summary.txt` and the request's SQL queries with timings "
+                    "(`queries.json`).",
+        responses={200: OpenApiResponse(description="Zip archive.")},
+        tags=["Profiling"],
+    )
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        profile = self.get_object()
+        try:
+            artefact = open(profile.artefact_path, 'rb')
+        except FileNotFoundError:
+            raise Http404("Profile artefact is missing.")
+        return FileResponse(artefact, as_attachment=True, filename=f'profile-{profile.pk}.zip')
+
 
+@extend_schema_view(
+    list=extend_schema(
+        summary="Report jobs",
+        description="Report jobs submitted by the current user (by anyone for staff), newest first.",
+        tags=["Reports"],
+    ),
+    retrieve=extend_schema(
+        summary="Report job progress",
+        description="`progress` counts the rows written so far, out of `total` once it is known.",
+        tags=["Reports"],
+    ),
+    create=extend_schema(
+        summary="Submit a report job",
+        description="Queue a heavy report (`revenue_breakdown` over any date range, or "
+                    "`subscriptions_export`) for `manage.py run_report_jobs`. Poll the returned job for "
+                    "progress and download the CSV once it is `completed`.",
+        request=ReportJobRequestSerializer,
+        responses={
+            202: ReportJobSerializer,
+            400: OpenApiResponse(description="Invalid input data."),
+        },
+        tags=["Reports"],
+    ),
+    destroy=extend_schema(
+        summary="Delete a report job",
+        description="Deletes the job and its result file; a running job's result is discarded.",
+        tags=["Reports"],
+    ),
+)
+class ReportJobViewSet(mixins.CreateModelMixin,
+                       mixins.RetrieveModelMixin,
+                       mixins.DestroyModelMixin,
+                       mixins.ListModelMixin,
+                       viewsets.GenericViewSet):
+    """Submit report jobs, follow their progress and download their results."""
+
+    queryset = ReportJob.objects.order_by('-id')
+    serializer_class = ReportJobSerializer
+    # Sessions let staff download results from the Django admin.
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+
+    def get_queryset(self):
+        jobs = super().get_queryset()
+        if not self.request.user.is_staff:
+            jobs = jobs.filter(requested_by=self.request.user)
+        return jobs
+
+    def create(self, request, *args, **kwargs):
+        serializer = ReportJobRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = ReportJob.objects.create(requested_by=request.user, **serializer.validated_data)
         return Response(
-            {
-                'total_recurring_revenue': total_recurring_revenue,
-                'average_subscription_cost': average_subscription_cost,
-                'monthly_revenue_history': monthly_revenue,
-                'top_users': top_users,
-            }
+            ReportJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED
         )
+
+    @extend_schema(
+        summary="Download report result",
+        responses={
+            200: OpenApiResponse(description="CSV file."),
+            409: OpenApiResponse(description="The job has not completed."),
+        },
+        tags=["Reports"],
+    )
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ReportJob.Status.COMPLETED:
+            return Response(
+                {'error': f'Report job is {job.status}.'},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            result = open(job.result_path, 'rb')
+        except FileNotFoundError:
+            raise Http404("Report result is missing.")
+        return FileResponse(
+            result, as_attachment=True, filename=f'{job.kind}-{job.pk}.csv', content_type='text/csv'
+        )
+
+
+class SchemaView(SpectacularAPIView):
+    """
+    OpenAPI schema served from the artefacts built by
+    `manage.py build_openapi_schema`; generated live when they are missing,
+    disabled, or a language or version is requested.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        content = None
+        if settings.OPENAPI_SCHEMA_CACHED and not (request.GET.get('lang') or request.GET.get('version')):
+            content = openapi.load('json' if 'json' in renderer.format else 'yaml')
+        if content is None:
+            return super().get(request, *args, **kwargs)
+
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'inline; filename="{self._get_filename(request, None)}"'
+        return response
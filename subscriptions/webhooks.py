@@ -0,0 +1,146 @@
+import hashlib
+import hmac
+import http.client
+import json
+import logging
+import random
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SubscriptionEvent, WebhookEndpoint
+from .serializers import SubscriptionEventSerializer
+
+
+logger = logging.getLogger(__name__)
+
+
+def sign_payload(secret, body):
+    """Return the ``X-Webhook-Signature`` header value for ``body``."""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return f'sha256={digest}'
+
+
+class WebhookDispatcher:
+    """
+    Delivers pending subscription events to webhook endpoints.
+
+    Each pass reads up to ``max_concurrency`` batches per endpoint from the
+    event log (see ``SubscriptionEvent.read``) and posts them through a
+    shared, bounded thread pool, so batches to one endpoint may arrive out of
+    order unless its ``max_concurrency`` is 1. The endpoint cursor advances
+    past every batch acknowledged before the first failure; a failure defers
+    the endpoint with exponential backoff and the remaining batches are
+    retried on a later pass. Database access stays on the calling thread,
+    worker threads only do HTTP.
+    """
+
+    def __init__(self, workers=8, batch_size=100, timeout=10,
+                 backoff_base=5, backoff_max=600):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def run_once(self):
+        """Run one delivery pass and return delivery counters."""
+        now = timezone.now()
+        endpoints = WebhookEndpoint.objects.filter(is_active=True).filter(
+            Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)
+        )
+        stats = {'delivered': 0, 'batches': 0, 'failed_batches': 0}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = []
+            for endpoint in endpoints:
+                batches, read_until = self.pending_batches(endpoint)
+                futures = [
+                    pool.submit(self.post, endpoint, batch) for batch in batches
+                ]
+                pending.append((endpoint, read_until, list(zip(batches, futures))))
+
+            for endpoint, read_until, deliveries in pending:
+                self.settle(endpoint, deliveries, read_until, stats)
+
+        return stats
+
+    def pending_batches(self, endpoint):
+        """
+        Batches of the events to deliver to ``endpoint`` and the id of the
+        last event read, which the cursor moves to once all are delivered.
+        """
+        cursor = endpoint.last_event_id or 0
+        events, _ = SubscriptionEvent.read(cursor, self.batch_size * max(1, endpoint.max_concurrency))
+        read_until = events[-1].id if events else cursor
+        if endpoint.event_types:
+            # Filtered after reading, so skipped events still move the cursor.
+            events = [event for event in events if event.event_type in endpoint.event_types]
+        batches = [
+            events[i:i + self.batch_size]
+            for i in range(0, len(events), self.batch_size)
+        ]
+        return batches, read_until
+
+    def post(self, endpoint, batch):
+        """POST one batch; return ``None`` on success or an error message."""
+        body = json.dumps(
+            {'events': SubscriptionEventSerializer(batch, many=True).data},
+            cls=DjangoJSONEncoder,
+        ).encode()
+        request = urllib.request.Request(
+            endpoint.url,
+            data=body,
+            method='POST',
+            headers={'Content-Type': 'application/json'},
+        )
+        if endpoint.secret:
+            request.add_header('X-Webhook-Signature', sign_payload(endpoint.secret, body))
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as exc:
+            # HTTPException covers broken responses (RemoteDisconnected,
+            # IncompleteRead...), which would otherwise abort the whole pass.
+            return str(exc) or type(exc).__name__
+        return None
+
+    def settle(self, endpoint, deliveries, read_until, stats):
+        cursor = endpoint.last_event_id
+        error = None
+        for batch, future in deliveries:
+            error = future.result()
+            if error:
+                stats['failed_batches'] += 1
+                break
+            cursor = batch[-1].id
+            stats['batches'] += 1
+            stats['delivered'] += len(batch)
+        else:
+            cursor = read_until
+
+        updates = {'last_event_id': cursor}
+        if error:
+            failures = endpoint.consecutive_failures + 1
+            updates.update(
+                consecutive_failures=failures,
+                next_attempt_at=timezone.now() + self.backoff(failures),
+                last_error=error,
+            )
+            logger.warning(
+                "Webhook delivery to %s failed (%d in a row): %s",
+                endpoint.name, failures, error
+            )
+        elif deliveries:
+            updates.update(consecutive_failures=0, next_attempt_at=None, last_error='')
+        # Update only dispatcher-owned columns so admin edits are kept.
+        WebhookEndpoint.objects.filter(pk=endpoint.pk).update(**updates)
+
+    def backoff(self, failures):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+        return timedelta(seconds=delay + random.uniform(0, self.backoff_base))